@@ -1,15 +1,24 @@
 # OR_simulator.py
+import copy
+import functools
 import json
+import time
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
 
 from pyshacl import validate
 from rdflib import Graph, Namespace, RDF, RDFS, Literal, OWL
 from rdflib.namespace import XSD
 
 import queries
+from allocation_planner import AllocationPlanner
+from property_hierarchy import HIERARCHY_PREDICATES, PropertyHierarchy
+from query_cache import QueryCache
+from requirements_index import REQUIREMENT_PREDICATES, RequirementsIndex
 from ontology_utils import (
+    copy_graph,
     load_and_materialize_ontology,
+    parse_cached,
     parse_json_to_rdflib,
     get_label_from_uri,
 )
@@ -17,11 +26,53 @@ from ontology_utils import (
 OR = Namespace("http://www.semanticweb.org/Twin_OR/")
 PROV = Namespace("http://www.w3.org/ns/prov#")
 
+STEP_SEQUENCES = {
+    "LegoAssembly": [
+        ["Step_A1_1"], ["Step_A1_2"], ["Step_A2_1"], ["Step_A2_2"],
+        ["Step_A2_3"], ["Step_A3_1"], ["Step_A3_2"], ["Step_A4_1"],
+        ["Step_A4_2"], ["Step_A4_3"], ["Step_A4_4"], ["Step_A5_1"], ["Step_A5_2"]
+    ],
+    "LaparoscopicProcedure": [
+        ["Step_L1_1"], ["Step_L1_2"], ["Step_L2_1"], ["Step_L2_2"],
+        ["Step_L3_1"], ["Step_L3_2"], ["Step_L3_3"]
+    ],
+    "MicrosurgicalProcedure": [
+        ["Step_M1_1"], ["Step_M1_2"], ["Step_M2_1"], ["Step_M2_2"],
+        ["Step_M3_1"], ["Step_M3_2"]
+    ],
+    "RoboticProcedure": [
+        ["Step_R1_1"], ["Step_R1_2"], ["Step_R2_1"], ["Step_R2_2"],
+        ["Step_R2_3"], ["Step_R3_1"]
+    ]
+}
+
+
+def _stage(name: str):
+    """Report the wrapped method's duration to ``ORSimulator.stage_observer``.
+
+    With no observer installed the only overhead is one attribute check.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            observer = type(self).stage_observer
+            if observer is None:
+                return method(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                observer(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
 
 
 class ORSimulator:
     """Digital‑Twin of an OR procedure driven by an ontology + SHACL."""
 
+    # Called as ``observer(stage, seconds)`` after each instrumented stage
+    stage_observer: Optional[Callable[[str, float], None]] = None
+
     def __init__(
             self,
             ontology_path: str,
@@ -29,7 +80,9 @@ class ORSimulator:
             sensor_data_path: str = "sensor_data.json",
             *,
             show_validation_report: bool = False,
-            initial_procedure: str = "LegoAssembly"
+            initial_procedure: str = "LegoAssembly",
+            reasoner: Optional[str] = None,
+            imports: bool = False
     ) -> None:
         self.input_ontology_path = ontology_path
         self.prefix = "twin"
@@ -43,14 +96,23 @@ class ORSimulator:
         self.ongoing_procedure = True
         self.violation_occurred = False
         self.step_counter = 0  # Track progression
-
+        self.state_version = 0  # Bumped by every mutation
+        self.graph_version = 0  # Bumped only when or_graph changes
+        # graph_version of the last change per predicate, and of the last change without a delta
+        self._predicate_changes: Dict = {}
+        self._unscoped_change = 0
+
+        # reasoner: "rdfs" / "owlrl" load the ontology's cached closure;
+        # imports: merge owl:imports resolved from the local catalog
+        self.reasoner = reasoner
         self.or_graph: Graph = load_and_materialize_ontology(
-            ontology_path, OR, self.prefix
+            ontology_path, OR, self.prefix, reasoner=reasoner, imports=imports
         )
 
         self._ensure_default_actors()
 
-        self.shacl_shapes_graph = Graph().parse(shacl_shape_path)
+        # Shapes are only read, so every simulator shares one parsed graph
+        self.shacl_shapes_graph = parse_cached(shacl_shape_path)
 
         with open(sensor_data_path, encoding="utf-8") as fp:
             sensor_data_full = json.load(fp)
@@ -65,6 +127,35 @@ class ORSimulator:
 
         self._set_initial_steps()
 
+        self.last_delta: Dict[str, list] = {"added": [], "removed": []}
+        self.property_hierarchy = PropertyHierarchy(self.or_graph)
+        self.requirements_index = RequirementsIndex(self.or_graph, self._requirement_predicates())
+        self.allocation_planner: Optional[AllocationPlanner] = None
+        self.query_cache = QueryCache()
+
+    @_stage("clone")
+    def clone(self) -> "ORSimulator":
+        """Independent simulator in this simulator's current state.
+
+        Read-only parts (SHACL shapes, scenario data, the last validation
+        report) are shared; the RDF graph, step state and requirements index
+        are copied. Cloning an initialised, validated template costs
+        milliseconds where construction costs a parse and a SHACL run.
+        """
+        clone = copy.copy(self)
+        clone.or_graph = copy_graph(self.or_graph)
+        clone.current_steps = list(self.current_steps)
+        clone.last_valid_steps = list(self.last_valid_steps)
+        clone.graph_checkpoint = None
+        clone.last_delta = {"added": [], "removed": []}
+        if hasattr(self, "validation_violations"):
+            clone.validation_violations = [dict(v) for v in self.validation_violations]
+        clone.requirements_index = self.requirements_index.copy(clone.or_graph)
+        clone.allocation_planner = None
+        clone.query_cache = QueryCache(self.query_cache.maxsize)
+        clone._predicate_changes = dict(self._predicate_changes)
+        return clone
+
     def _ensure_default_actors(self):
         """Ensure required actors exist in the graph."""
         actors_to_check = [
@@ -82,6 +173,35 @@ class ORSimulator:
                 if capability:
                     self.or_graph.add((actor_uri, OR.hasCapability, capability))
 
+    def _bump_version(self, graph_changed: bool = False, predicates=None) -> None:
+        """Mark the simulator state (and with ``graph_changed`` the graph) as changed.
+
+        ``predicates`` are those of the changed triples; cached query results
+        reading none of them stay valid. Without them the whole cache is dropped.
+        """
+        self.state_version += 1
+        if graph_changed:
+            self.graph_version += 1
+            if predicates is None:
+                self.query_cache.clear()
+                self._unscoped_change = self.graph_version
+            else:
+                self.query_cache.invalidate(predicates)
+                for predicate in predicates:
+                    self._predicate_changes[predicate] = self.graph_version
+
+    def changed_since(self, graph_version: int, predicates=None) -> bool:
+        """True if a graph change after ``graph_version`` touched one of ``predicates``.
+
+        ``predicates=None`` stands for a reader of every predicate, which any
+        graph change affects.
+        """
+        if predicates is None:
+            return self.graph_version > graph_version
+        if self._unscoped_change > graph_version:
+            return True
+        return any(self._predicate_changes.get(p, 0) > graph_version for p in predicates)
+
     def _initialize_procedure(self):
         """Initialize the current procedure in the graph."""
         proc_uri = OR[self.current_procedure]
@@ -89,14 +209,9 @@ class ORSimulator:
         self.or_graph.add((proc_uri, RDFS.label, Literal(self.current_procedure)))
 
     def _set_initial_steps(self):
-        """Set initial steps based on procedure type."""
-        initial_steps_map = {
-            "LegoAssembly": ["Step_A1_1"],
-            "LaparoscopicProcedure": ["Step_L1_1"],
-            "MicrosurgicalProcedure": ["Step_M1_1"],
-            "RoboticProcedure": ["Step_R1_1"]
-        }
-        self.current_steps = initial_steps_map.get(self.current_procedure, ["Step_A1_1"])
+        """Set initial steps to the first entry of the procedure's step sequence."""
+        sequence = STEP_SEQUENCES.get(self.current_procedure)
+        self.current_steps = list(sequence[0]) if sequence else ["Step_A1_1"]
         self.step_counter = 0
 
     def switch_procedure(self, procedure_name: str) -> bool:
@@ -113,11 +228,15 @@ class ORSimulator:
 
         self._set_initial_steps()
         self._initialize_procedure()
+        self._bump_version(graph_changed=True, predicates=(RDF.type, RDFS.label))
 
         return True
 
+    @_stage("validation")
     def validate_current_state_with_shacl(self) -> bool:
         """Validate current state and capture detailed error information."""
+        # RDFS inference runs per call even on a materialised graph: step triples
+        # are asserted after the closure, so their entailments are not in it
         conforms, results_graph, results_text = validate(
             data_graph=self.or_graph,
             shacl_graph=self.shacl_shapes_graph,
@@ -158,6 +277,7 @@ class ORSimulator:
         if self.show_validation_report and not conforms:
             self._display_validation_errors()
 
+        self._bump_version()
         return bool(conforms)
 
     def _display_validation_errors(self):
@@ -186,12 +306,14 @@ class ORSimulator:
             "report": self.last_validation_report if hasattr(self, 'last_validation_report') else ""
         }
 
+    @_stage("sensors")
     def simulate_robotic_sensor_output_and_update_ontology(self) -> None:
         """Apply sensor triples for current steps."""
         self.graph_checkpoint = Graph()
         for s, p, o in self.or_graph:
             self.graph_checkpoint.add((s, p, o))
 
+        added, removed = [], []
         for step_id in self.current_steps:
             step_data = self.sensor_data.get(step_id)
             if not step_data:
@@ -200,33 +322,148 @@ class ORSimulator:
             for triple_data in step_data.get("triples", []):
                 triple = parse_json_to_rdflib(triple_data, OR)
                 if step_data.get("action", "add") == "add":
-                    self.or_graph.add(triple)
+                    if triple not in self.or_graph:
+                        self.or_graph.add(triple)
+                        added.append(triple)
                 else:
-                    self.or_graph.remove(triple)
+                    if triple in self.or_graph:
+                        self.or_graph.remove(triple)
+                        removed.append(triple)
+
+        self.last_delta = {"added": added, "removed": removed}
+        self._bump_version(graph_changed=bool(added or removed), predicates={p for _, p, _ in added + removed})
+        if PropertyHierarchy.affected_by(added + removed):
+            self.property_hierarchy = PropertyHierarchy(self.or_graph)
+            self.requirements_index = RequirementsIndex(self.or_graph, self._requirement_predicates())
+        else:
+            self.requirements_index.apply_delta(added, removed)
+        if self.allocation_planner is not None:
+            self._update_planner_resources(added + removed)
+
+    def _requirement_predicates(self) -> Dict[str, tuple]:
+        """Requirement categories with the predicates the property hierarchy expands them to."""
+        expanded = queries.step_predicates(self.property_hierarchy)
+        return {category: expanded[category] for category in REQUIREMENT_PREDICATES}
+
+    def get_requirements(self, category: str) -> List[str]:
+        """Instruments / actors / tissues / capabilities needed by the current steps."""
+        return self.requirements_index.lookup(category, self.current_steps)
+
+    def step_query(self, name: str, limit: Optional[int] = None) -> List:
+        """Results of one ``queries.STEP_PROPERTIES`` lookup for the current steps.
+
+        Runs through this simulator's property hierarchy and query cache, so a
+        repeated lookup is answered from the cache until a step changes one of
+        the predicates it reads.
+        """
+        return queries.run_step_query(
+            self.or_graph, name, self.current_steps, limit,
+            hierarchy=self.property_hierarchy, cache=self.query_cache
+        )
 
-    def get_next_steps(self) -> List[str]:
-        """Get next steps based on current procedure and progression."""
-        step_sequences = {
-            "LegoAssembly": [
-                ["Step_A1_1"], ["Step_A1_2"], ["Step_A2_1"], ["Step_A2_2"],
-                ["Step_A2_3"], ["Step_A3_1"], ["Step_A3_2"], ["Step_A4_1"],
-                ["Step_A4_2"], ["Step_A4_3"], ["Step_A4_4"], ["Step_A5_1"], ["Step_A5_2"]
-            ],
-            "LaparoscopicProcedure": [
-                ["Step_L1_1"], ["Step_L1_2"], ["Step_L2_1"], ["Step_L2_2"],
-                ["Step_L3_1"], ["Step_L3_2"], ["Step_L3_3"]
-            ],
-            "MicrosurgicalProcedure": [
-                ["Step_M1_1"], ["Step_M1_2"], ["Step_M2_1"], ["Step_M2_2"],
-                ["Step_M3_1"], ["Step_M3_2"]
-            ],
-            "RoboticProcedure": [
-                ["Step_R1_1"], ["Step_R1_2"], ["Step_R2_1"], ["Step_R2_2"],
-                ["Step_R2_3"], ["Step_R3_1"]
-            ]
+    def get_briefing(self) -> Dict[str, object]:
+        """Requirements, action groups, force and motion of the current steps.
+
+        Built from a single pass over the steps' triples and cached until a
+        step changes one of the predicates it reads. Resources are reported
+        by label; force and motion as the first value found, or None.
+        """
+        key = ("briefing", tuple(self.current_steps))
+        briefing = self.query_cache.get(key)
+        if briefing is not None:
+            return briefing
+
+        found = queries.step_briefing(self.or_graph, self.current_steps, self.property_hierarchy)
+        labels = {
+            name: [get_label_from_uri(term) for term in found[name]]
+            for name in ("instruments", "actors", "tissues", "capabilities", "materials", "action_group")
+        }
+        briefing = {
+            "instruments": labels["instruments"],
+            "actors": labels["actors"],
+            "tissues": labels["tissues"],
+            "capabilities": labels["capabilities"],
+            "materials": labels["materials"],
+            "actionGroups": labels["action_group"],
+            "force": found["force"][0].toPython() if found["force"] else None,
+            "motion": str(found["motion"][0]) if found["motion"] else None,
         }
+        predicates = {p for expanded in queries.step_predicates(self.property_hierarchy).values() for p in expanded}
+        self.query_cache.put(key, briefing, predicates | set(HIERARCHY_PREDICATES))
+        return briefing
+
+    def resource_demands(self, lookahead: int = 0) -> Dict[str, dict]:
+        """Capabilities and instruments needed by the current and next ``lookahead`` steps.
+
+        Requirements come from the graph and from the scenario triples of steps
+        that have not been applied yet, over the same property hierarchy as the
+        step queries.
+        """
+        sequence = STEP_SEQUENCES.get(self.current_procedure, [])
+        steps = list(self.current_steps)
+        for upcoming in sequence[self.step_counter + 1:self.step_counter + 1 + lookahead]:
+            steps.extend(s for s in upcoming if s not in steps)
+
+        expanded = queries.step_predicates(self.property_hierarchy)
+        capability_predicates = expanded["capabilities"]
+        instrument_predicates = expanded["instruments"]
+
+        demands = {}
+        for step_id in steps:
+            step_uri = OR[step_id]
+            capabilities, instruments = [], []
+            for predicates, found in ((capability_predicates, capabilities), (instrument_predicates, instruments)):
+                for predicate in predicates:
+                    for o in self.or_graph.objects(step_uri, predicate):
+                        if o not in found:
+                            found.append(o)
+
+            step_data = self.sensor_data.get(step_id, {})
+            if step_data.get("action", "add") == "add":
+                for triple_data in step_data.get("triples", []):
+                    _, p, o = parse_json_to_rdflib(triple_data, OR)
+                    if p in capability_predicates and o not in capabilities:
+                        capabilities.append(o)
+                    elif p in instrument_predicates and o not in instruments:
+                        instruments.append(o)
+
+            demands[step_id] = {"capabilities": capabilities, "instruments": instruments}
+        return demands
+
+    def plan_allocation(self, lookahead: int = 0, demands: Optional[Dict] = None) -> dict:
+        """Assign actors and instruments to upcoming steps by capability.
+
+        The planner is built from the graph on first use and kept, so later
+        calls only re-plan the demands and resources that changed.
+        """
+        if self.allocation_planner is None:
+            self.allocation_planner = AllocationPlanner.from_graph(self.or_graph)
+        if demands is None:
+            demands = self.resource_demands(lookahead)
+
+        self.allocation_planner.sync_demands(demands)
+        return self.allocation_planner.plan()
+
+    def _update_planner_resources(self, changed) -> None:
+        """Refresh planner actors / instruments whose capabilities or types changed."""
+        planner = self.allocation_planner
+        for s, p, o in changed:
+            if p == OR.hasCapability:
+                capabilities = list(self.or_graph.objects(s, OR.hasCapability))
+                if capabilities:
+                    planner.set_actor(s, capabilities)
+                else:
+                    planner.remove_actor(s)
+            elif p == RDF.type and (o in (OR.Instrument, OR.Tool) or s in planner.instrument_types):
+                types = set(self.or_graph.objects(s, RDF.type))
+                if types & {OR.Instrument, OR.Tool}:
+                    planner.set_instrument(s, types)
+                else:
+                    planner.remove_instrument(s)
 
-        sequence = step_sequences.get(self.current_procedure, [])
+    def get_next_steps(self) -> List[str]:
+        """Get next steps based on current procedure and progression."""
+        sequence = STEP_SEQUENCES.get(self.current_procedure, [])
 
         self.step_counter += 1
 
@@ -235,6 +472,88 @@ class ORSimulator:
 
         return []
 
+    def is_sequence_complete(self) -> bool:
+        """True once every step of the current procedure has been executed."""
+        return self.step_counter >= len(STEP_SEQUENCES.get(self.current_procedure, []))
+
+    def step_duration(self, step_id: str, default: float = 5.0) -> float:
+        """Duration of a step in minutes, as given by the scenario data."""
+        return float(self.sensor_data.get(step_id, {}).get("duration", default))
+
+    @_stage("step")
+    def execute_step(self, *, validate: bool = True, force_advance: bool = False) -> bool:
+        """Apply sensor updates, validate and advance, as one `/step` call does.
+
+        With ``validate=False`` the SHACL run is skipped and the step is
+        treated as conforming; ``force_advance`` moves on even after a
+        violation (the CLI's "continue anyway").
+        """
+        self.simulate_robotic_sensor_output_and_update_ontology()
+
+        conforms = True
+        if validate:
+            conforms = self.validate_current_state_with_shacl()
+            for violation in self.validation_violations:
+                focus_node = violation.get('focusNode', '')
+                if focus_node in self.sensor_data:
+                    violation['sensor_message'] = self.sensor_data[focus_node].get('message', '')
+
+        self.violation_occurred = not conforms
+
+        if conforms or force_advance:
+            next_steps = self.get_next_steps()
+            if next_steps:
+                self.current_steps = next_steps
+            else:
+                if not self.advance_to_next_phase():
+                    self.ongoing_procedure = False
+            self._bump_version()
+
+        return conforms
+
+    def run_steps(
+            self,
+            max_steps: Optional[int] = None,
+            *,
+            until: str = "steps",
+            validate: bool = True,
+            force_advance: bool = False,
+            step_limit: int = 1000
+    ) -> Dict:
+        """Execute several steps in one loop and return a compact per-step summary.
+
+        ``until`` is ``"steps"`` (stop after ``max_steps``), ``"violation"``
+        (stop at the first failing step) or ``"end"`` (stop when the procedure
+        is complete). A violation always stops the run unless ``force_advance``
+        is set, because the step would otherwise be retried forever.
+        """
+        if until not in ("steps", "violation", "end"):
+            raise ValueError(f"Unknown run mode: {until}")
+        if until == "steps" and max_steps is None:
+            max_steps = 1
+        limit = min(max_steps, step_limit) if max_steps is not None else step_limit
+
+        summary = []
+        stopped_by = None
+        while stopped_by is None:
+            if not self.ongoing_procedure or self.is_sequence_complete():
+                stopped_by = "end"
+            elif len(summary) >= limit:
+                stopped_by = "steps" if max_steps is not None and len(summary) >= max_steps else "limit"
+            else:
+                steps = list(self.current_steps)
+                conforms = self.execute_step(validate=validate, force_advance=force_advance)
+                summary.append({
+                    "steps": steps,
+                    "conforms": conforms,
+                    "violations": len(self.validation_violations) if validate else 0,
+                    "phase": self.current_phase,
+                })
+                if not conforms and (until == "violation" or not force_advance):
+                    stopped_by = "violation"
+
+        return {"executed": len(summary), "stoppedBy": stopped_by, "summary": summary}
+
     def advance_to_next_phase(self) -> bool:
         """Advance to next phase based on procedure type."""
         phase_map = {
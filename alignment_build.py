@@ -0,0 +1,158 @@
+# alignment_build.py
+"""
+Incremental alignment builds, used by ``alignment_engine``.
+
+A build records the SHA-256 of its inputs (base ontology, prov-o.ttl,
+hi.ttl and the mapping files) and of every file it wrote in
+``<out>.build.json``. When neither has changed, the next build is
+skipped without parsing anything.
+
+Outputs are selected by format name. N-Triples (``nt``) parses several
+times faster than RDF/XML and is written sorted, so rebuilds diff cleanly.
+Companions start with the hash of the RDF/XML file written with them, which
+``ontology_utils.find_companion`` checks before loading them in its place.
+"""
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+from rdflib import Graph
+
+from ontology_utils import SOURCE_HASH_PREFIX, file_sha256, write_atomic
+
+# format name -> (suffix, rdflib serializer)
+OUTPUT_FORMATS = {
+    "nt": (".nt", "nt"),
+    "ttl": (".ttl", "turtle"),
+    "xml": (".owl", "xml"),
+    "pretty-xml": (".owl", "pretty-xml"),
+}
+DEFAULT_FORMATS = ("nt", "xml")
+XML_FORMATS = ("xml", "pretty-xml")
+
+
+def parse_formats(value: str) -> Sequence[str]:
+    """Comma-separated format names, validated, for ``--formats``."""
+    formats = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in OUTPUT_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(OUTPUT_FORMATS)}")
+    if not formats:
+        raise argparse.ArgumentTypeError("no output format given")
+    if all(name in formats for name in XML_FORMATS):
+        raise argparse.ArgumentTypeError("xml and pretty-xml both write the .owl file; pick one")
+    return formats
+
+
+def manifest_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".build.json")
+
+
+def output_paths(out_path: Path, formats: Iterable[str]) -> Dict[str, Path]:
+    """format name -> file written for it; the RDF/XML file is ``out_path`` itself."""
+    return {
+        name: out_path if name in XML_FORMATS else out_path.with_suffix(OUTPUT_FORMATS[name][0])
+        for name in formats
+    }
+
+
+def _key(path: Path, out_path: Path) -> str:
+    # Relative to the output folder, so a checkout can move as a whole
+    return os.path.relpath(path, out_path.parent)
+
+
+def input_hashes(paths: Iterable[Path], out_path: Path) -> Dict[str, str]:
+    return {_key(path, out_path): file_sha256(path) for path in paths}
+
+
+def read_manifest(out_path: Path) -> Optional[dict]:
+    try:
+        with open(manifest_path(out_path), encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(out_path: Path, inputs: Dict[str, str], formats: Sequence[str]) -> bool:
+    """True if the last build used the same inputs and formats and its outputs are untouched."""
+    manifest = read_manifest(out_path)
+    if not manifest or manifest.get("inputs") != inputs or manifest.get("formats") != list(formats):
+        return False
+    outputs = manifest.get("outputs", {})
+    for path in output_paths(out_path, formats).values():
+        if not path.is_file() or outputs.get(_key(path, out_path)) != file_sha256(path):
+            return False
+    return True
+
+
+def _write_companion(graph: Graph, path: Path, name: str, header: str, base: Optional[str]) -> None:
+    if name == "nt":
+        data = graph.serialize(format="nt", encoding="utf-8").decode("utf-8")
+        data = "".join(sorted(line + "\n" for line in data.splitlines() if line))
+    else:
+        data = graph.serialize(format=OUTPUT_FORMATS[name][1], base=base, encoding="utf-8").decode("utf-8")
+    write_atomic(path, header + data)
+
+
+def write_companions(xml_path: Path, formats: Sequence[str] = ("nt",)) -> Dict[str, Path]:
+    """Companions for an existing RDF/XML file, e.g. after editing it by hand."""
+    graph = Graph().parse(xml_path, format="xml")
+    header = f"{SOURCE_HASH_PREFIX}{file_sha256(xml_path)}\n"
+    paths = output_paths(xml_path, [name for name in formats if name not in XML_FORMATS])
+    for name, path in paths.items():
+        _write_companion(graph, path, name, header, None)
+    return paths
+
+
+def write_outputs(graph: Graph, out_path: Path, formats: Sequence[str], inputs: Dict[str, str],
+                  base: Optional[str] = None, extra: Optional[dict] = None) -> Dict[str, Path]:
+    """Serialize ``graph`` in every format and record the build; returns the files written.
+
+    ``extra`` is stored in the manifest along with the hashes.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    paths = output_paths(out_path, formats)
+    previous = read_manifest(out_path) or {}
+
+    # RDF/XML first: the companions carry its hash
+    header = ""
+    xml = next((name for name in formats if name in XML_FORMATS), None)
+    if xml:
+        graph.serialize(destination=out_path, format=xml, base=base)
+        header = f"{SOURCE_HASH_PREFIX}{file_sha256(out_path)}\n"
+    elif out_path.exists() and _key(out_path, out_path) in previous.get("outputs", {}):
+        # An RDF/XML file from an earlier build would shadow the new companions
+        out_path.unlink()
+        logging.info("Removed stale RDF/XML output %s", out_path)
+
+    for name, path in paths.items():
+        if name not in XML_FORMATS:
+            _write_companion(graph, path, name, header, base)
+
+    manifest = {
+        "inputs": inputs,
+        "formats": list(formats),
+        "outputs": {_key(path, out_path): file_sha256(path) for path in paths.values()},
+        "triples": len(graph),
+        **(extra or {}),
+    }
+    with open(manifest_path(out_path), "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=2)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write N-Triples/Turtle companions of RDF/XML files")
+    parser.add_argument("files", nargs="+", type=Path, help="RDF/XML files")
+    parser.add_argument("--formats", type=parse_formats, default=("nt",), help="companion formats (default: nt)")
+    args = parser.parse_args()
+    for xml_path in args.files:
+        for path in write_companions(xml_path, args.formats).values():
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
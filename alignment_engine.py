@@ -0,0 +1,304 @@
+# alignment_engine.py
+"""
+Alignment ontology built from declarative mapping tables.
+
+Mapping files (``alignments/mappings/*.json``) hold named tables. Each table
+has a triple template and, optionally, rows substituted into it:
+
+    "actionGroups": {
+      "template": [["or:{0}", "rdfs:subClassOf", "or:{1}"]],
+      "rows": [["SkinIncisionAG", "IncisionCore"]]
+    }
+
+Terms are CURIEs over ``PREFIXES`` (or ``<full IRIs>``), ``{n}`` is the
+row's n-th value and ``{"literal": ..., "datatype": ...}`` makes a literal.
+A table without rows is used as it stands. ``run.py`` and ``align_or.py``
+both build through ``build``.
+
+The base ontology (only needed when individuals are copied), PROV-O and HI
+are parsed in worker processes at the same time. PROV-O and HI are used to
+warn about mapped terms they do not declare. Individuals copied from the
+base are kept in ``<out stem>.individuals.nt`` with the base's hash, so a
+mapping change does not re-parse an unchanged base. Each build stores its
+tables in the build manifest and reports which ones changed.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from rdflib import Graph, Literal, Namespace, OWL, RDF, RDFS, URIRef, XSD
+from rdflib.util import guess_format
+
+import alignment_build
+from ontology_utils import HI, OR, PROV, SOURCE_HASH_PREFIX, file_sha256, find_companion, write_atomic
+
+MAPPINGS_DIR = Path(__file__).resolve().parent / "alignments" / "mappings"
+
+ALIGN_BASE = "http://www.semanticweb.org/Twin_OR_2_alignment"
+ALIGN_NS = Namespace(ALIGN_BASE + "#")
+ALIGN_IRI = URIRef(ALIGN_BASE)
+# Ontology IRIs, resolved to ontologies/ through catalog.json
+PROV_IRI = URIRef("http://www.w3.org/ns/prov-o#")
+HI_IRI = URIRef("http://www.semanticweb.org/vbr240/ontologies/2022/4/untitled-ontology-51")
+
+PREFIXES = {
+    "or": OR,
+    "prov": PROV,
+    "hi": HI,
+    "owl": OWL,
+    "rdf": RDF,
+    "rdfs": RDFS,
+    "xsd": XSD,
+}
+
+
+class MappingError(ValueError):
+    """A mapping file or table that cannot be turned into triples."""
+
+
+def load_mappings(paths: Iterable[Path]) -> Dict[str, dict]:
+    """Tables of every mapping file, by name; names must be unique across files."""
+    tables: Dict[str, dict] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as fp:
+            document = json.load(fp)
+        for name, table in document.get("mappings", {}).items():
+            if name in tables:
+                raise MappingError(f"{path}: mapping {name!r} is already defined")
+            if not isinstance(table.get("template"), list) or not table["template"]:
+                raise MappingError(f"{path}: mapping {name!r} has no template")
+            tables[name] = table
+    return tables
+
+
+def _iri(text: str, name: str) -> URIRef:
+    if text.startswith("<") and text.endswith(">"):
+        return URIRef(text[1:-1])
+    prefix, sep, local = text.partition(":")
+    if not sep or prefix not in PREFIXES:
+        raise MappingError(f"mapping {name!r}: {text!r} is not a known CURIE")
+    return PREFIXES[prefix][local]
+
+
+def _term(term, row: Sequence[str], name: str):
+    try:
+        if isinstance(term, dict):
+            value = term["literal"].format(*row)
+            datatype = term.get("datatype")
+            return Literal(value, datatype=_iri(datatype, name) if datatype else None)
+        return _iri(term.format(*row), name)
+    except (IndexError, KeyError) as exc:
+        raise MappingError(f"mapping {name!r}: bad term {term!r} for row {list(row)}") from exc
+
+
+def generate(tables: Dict[str, dict]) -> Iterator[Tuple]:
+    """Triples of every table, in table order."""
+    for name, table in tables.items():
+        for row in table.get("rows", [[]]):
+            for template in table["template"]:
+                if len(template) != 3:
+                    raise MappingError(f"mapping {name!r}: template {template!r} is not a triple")
+                yield tuple(_term(term, row, name) for term in template)
+
+
+def fingerprint(tables: Dict[str, dict]) -> Dict[str, dict]:
+    """Per table: its template and rows as canonical JSON, for the manifest."""
+    return {
+        name: {
+            "template": json.dumps(table["template"], sort_keys=True),
+            "rows": [json.dumps(row) for row in table.get("rows", [])],
+        }
+        for name, table in tables.items()
+    }
+
+
+def diff_mappings(previous: Optional[Dict[str, dict]], current: Dict[str, dict]) -> Dict[str, dict]:
+    """Tables that differ from the previous build: added, removed or changed rows."""
+    if previous is None:
+        return {}
+    changes = {}
+    for name in current.keys() - previous.keys():
+        changes[name] = {"status": "added", "rows": len(current[name]["rows"])}
+    for name in previous.keys() - current.keys():
+        changes[name] = {"status": "removed", "rows": len(previous[name]["rows"])}
+    for name in current.keys() & previous.keys():
+        before, after = previous[name], current[name]
+        if before == after:
+            continue
+        old_rows, new_rows = set(before["rows"]), set(after["rows"])
+        changes[name] = {
+            "status": "changed",
+            "template": before["template"] != after["template"],
+            "added": [json.loads(row) for row in after["rows"] if row not in old_rows],
+            "removed": [json.loads(row) for row in before["rows"] if row not in new_rows],
+        }
+    return dict(sorted(changes.items()))
+
+
+def copy_individuals_from_base(g_base: Graph, g_align: Graph) -> set:
+    """Copy all individuals from base ontology to alignment ontology.
+
+    Named individuals come from one ``rdf:type`` index lookup. The triples
+    touching them are streamed from the subject and object indexes into a
+    single bulk ``addN``, which also drops the duplicates.
+    """
+    individuals = set(g_base.subjects(RDF.type, OWL.NamedIndividual))
+
+    def touching():
+        for ind in individuals:
+            for p, o in g_base.predicate_objects(ind):
+                yield ind, p, o, g_align
+            for s, p in g_base.subject_predicates(ind):
+                yield s, p, ind, g_align
+
+    g_align.addN(touching())
+    return individuals
+
+
+def _parse(path: str) -> Graph:
+    companion = find_companion(path)
+    if companion:
+        return Graph().parse(companion[0], format=companion[1])
+    return Graph().parse(path, format=guess_format(path) or "xml")
+
+
+def _individuals(base_path: str, base_hash: str, cache_path: str) -> List[Tuple]:
+    """Worker: triples of the base's individuals, from the cache if it matches the base."""
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as fp:
+            if fp.readline().strip() == SOURCE_HASH_PREFIX + base_hash:
+                return list(Graph().parse(cache_path, format="nt"))
+
+    copied = Graph()
+    copy_individuals_from_base(_parse(base_path), copied)
+    data = copied.serialize(format="nt", encoding="utf-8").decode("utf-8")
+    write_atomic(cache_path, f"{SOURCE_HASH_PREFIX}{base_hash}\n{data}")
+    return list(copied)
+
+
+def _declared(path: str) -> frozenset:
+    """Worker: IRIs a reference ontology describes."""
+    return frozenset(str(s) for s in _parse(path).subjects() if isinstance(s, URIRef))
+
+
+def _run(calls: List[Tuple], jobs: int) -> list:
+    if jobs <= 1 or len(calls) <= 1:
+        return [fn(*args) for fn, *args in calls]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(calls))) as pool:
+        futures = [pool.submit(fn, *args) for fn, *args in calls]
+        return [future.result() for future in futures]
+
+
+def _curie(term: URIRef) -> str:
+    for prefix, namespace in PREFIXES.items():
+        if term.startswith(namespace):
+            return f"{prefix}:{term[len(namespace):]}"
+    return term.n3()
+
+
+def _undeclared(triples: Iterable[Tuple], references: Dict[str, frozenset]) -> List[str]:
+    missing = set()
+    for triple in triples:
+        for term in triple:
+            if not isinstance(term, URIRef):
+                continue
+            for namespace, declared in references.items():
+                if term.startswith(namespace) and str(term) not in declared:
+                    missing.add(_curie(term))
+    return sorted(missing)
+
+
+def _new_graph(comment: str) -> Graph:
+    g_align = Graph()
+    g_align.bind("", ALIGN_NS)
+    g_align.bind("align", ALIGN_NS)
+    for prefix, namespace in PREFIXES.items():
+        g_align.bind(prefix, namespace)
+
+    g_align.add((ALIGN_IRI, RDF.type, OWL.Ontology))
+    g_align.add((ALIGN_IRI, RDFS.label, Literal("Twin-OR Alignment Ontology")))
+    g_align.add((ALIGN_IRI, RDFS.comment, Literal(comment)))
+    g_align.add((ALIGN_IRI, OWL.imports, PROV_IRI))
+    g_align.add((ALIGN_IRI, OWL.imports, HI_IRI))
+    return g_align
+
+
+def build(
+        base_path: Path,
+        refdir: Path,
+        out_path: Path,
+        mapping_paths: Sequence[Path],
+        *,
+        comment: str,
+        copy_individuals: bool,
+        formats: Sequence[str] = alignment_build.DEFAULT_FORMATS,
+        force: bool = False,
+        jobs: int = 3,
+) -> Optional[dict]:
+    """Build the alignment ontology; returns the build report, or None if it was up to date.
+
+    Raises ``FileNotFoundError`` for a missing input and ``MappingError``
+    for a malformed mapping table.
+    """
+    prov_file = refdir / "prov-o.ttl"
+    hi_file = refdir / "hi.ttl"
+    for path in (base_path, prov_file, hi_file, *mapping_paths):
+        if not path.exists():
+            raise FileNotFoundError(path)
+
+    # Mapping files and this module decide the output; copy_individuals too
+    inputs = alignment_build.input_hashes(
+        [base_path, prov_file, hi_file, *mapping_paths, Path(__file__).resolve()], out_path
+    )
+    inputs["copyIndividuals"] = str(copy_individuals)
+    if not force and alignment_build.is_current(out_path, inputs, formats):
+        logging.info("Inputs unchanged, %s is up to date (use --force to rebuild)", out_path)
+        return None
+
+    tables = load_mappings(mapping_paths)
+    mappings = fingerprint(tables)
+    previous = (alignment_build.read_manifest(out_path) or {}).get("mappings")
+    changes = diff_mappings(previous, mappings)
+    for name, change in changes.items():
+        if change["status"] == "changed":
+            logging.info("Mapping %s changed: +%d -%d rows%s", name, len(change["added"]),
+                         len(change["removed"]), ", new template" if change["template"] else "")
+        else:
+            logging.info("Mapping %s %s (%d rows)", name, change["status"], change["rows"])
+
+    calls = [(_declared, str(prov_file)), (_declared, str(hi_file))]
+    if copy_individuals:
+        cache_path = out_path.with_name(out_path.stem + ".individuals.nt")
+        calls.append((_individuals, str(base_path), file_sha256(base_path), str(cache_path)))
+    results = _run(calls, jobs)
+    logging.info("Parsed reference ontologies%s", " and base individuals" if copy_individuals else "")
+
+    g_align = _new_graph(comment)
+    axioms = list(generate(tables))
+    g_align.addN((s, p, o, g_align) for s, p, o in axioms)
+    copied = 0
+    if copy_individuals:
+        before = len(g_align)
+        g_align.addN((s, p, o, g_align) for s, p, o in results[2])
+        copied = len(g_align) - before
+
+    undeclared = _undeclared(axioms, {str(PROV): results[0], str(HI): results[1]})
+    if undeclared:
+        logging.warning("Mapped terms not declared by PROV-O / HI: %s", ", ".join(undeclared))
+
+    report = {
+        "triples": len(g_align),
+        "axioms": len(axioms),
+        "copiedTriples": copied,
+        "changedMappings": changes,
+        "undeclaredTerms": undeclared,
+    }
+    written = alignment_build.write_outputs(
+        g_align, out_path, formats, inputs, base=ALIGN_BASE,
+        extra={"mappings": mappings, "report": report},
+    )
+    report["outputs"] = [str(path) for path in written.values()]
+    return report
@@ -2,158 +2,236 @@
 """
 verify_alignment.py
 Verify that the aligned ontology contains all expected individuals and relationships
-"""
-
-from rdflib import Graph, Namespace, RDF, OWL
-from pathlib import Path
-import sys
-
-
-def verify_alignment(ontology_path):
-    """Verify the aligned ontology has all expected content."""
-
-    OR = Namespace("http://www.semanticweb.org/Twin_OR/")
-
-    print(f"Loading ontology from: {ontology_path}")
-    g = Graph()
-    g.parse(ontology_path, format="xml")
-
-    print(f"Total triples: {len(g)}")
-
-    print("\n=== Checking Base Ontology Individuals ===")
-
-    base_individuals = [
-        "Surgeon", "Nurse", "Scribe", "Robotic_Arm", "TableSurface",
-        "Step_A1_1", "Step_A1_2", "Step_A1_3", "Step_A1_4",
-        "Step_A2_1", "Step_A2_2", "Step_A2_3", "Step_A2_4",
-        "A_Phase1", "A_Phase2", "A_Phase3", "A_Phase4", "A_Phase5",
-        "PlanA", "PlanB", "PlanC",
-        "Lego_1", "Lego_2", "Lego_3", "Lego_4", "Lego_5", "Lego_Platform",
-        "Pen", "Forceps",
-        "Standard_Vision", "Micro_Vision", "Grasping", "Turning", "Manipulation",
-    ]
-
-    found = 0
-    missing = []
-
-    for ind_name in base_individuals:
-        ind = OR[ind_name]
-        if (ind, RDF.type, OWL.NamedIndividual) in g:
-            found += 1
-        else:
-            if any(g.triples((ind, RDF.type, None))):
-                found += 1
-            else:
-                missing.append(ind_name)
-
-    print(f"Found {found}/{len(base_individuals)} base individuals")
-    if missing:
-        print(f"Missing: {', '.join(missing)}")
-
-    print("\n=== Checking Surgical Individuals ===")
-
-    surgical_individuals = [
-        "ChiefSurgeon", "AssistantSurgeon", "ScrubNurse", "SurgicalRobot",
-        "Scalpel", "Retractor", "Electrocautery", "NeedleHolder", "Microscope",
-        "Skin", "Fascia", "Muscle", "BloodVessel", "RetinalMembrane",
-        "MicroManipulationSkill", "AssistSkill",
-    ]
-
-    found_surgical = 0
-    missing_surgical = []
-
-    for ind_name in surgical_individuals:
-        ind = OR[ind_name]
-        if (ind, RDF.type, OWL.NamedIndividual) in g:
-            found_surgical += 1
-        else:
-            if any(g.triples((ind, RDF.type, None))):
-                found_surgical += 1
-            else:
-                missing_surgical.append(ind_name)
 
-    print(f"Found {found_surgical}/{len(surgical_individuals)} surgical individuals")
-    if missing_surgical:
-        print(f"Missing: {', '.join(missing_surgical)}")
+The expected individuals, classes and properties come from a declarative
+file (default: expectations.json next to this script). The ontology is
+streamed once: each triple is checked against sets of the expected names
+and then dropped, so memory stays bounded by the expectations rather than
+the ontology. An .owl path is read from its N-Triples/Turtle companion when
+one is up to date. Pass --report to write the results as JSON:
 
-    print("\n=== Checking New Classes ===")
-
-    new_classes = [
-        "ActionCore", "ActionGroup",
-        "IncisionCore", "SuturingCore", "CoagulationCore",
-        "TissueGripCore", "IrrigationCore", "ImagingCore",
-        "SkinIncisionAG", "ContinuousSutureAG", "InterruptedSutureAG",
-        "TissueRetractionAG", "TissueApproxAG",
-        "Surgeon", "Nurse", "Robot", "Instrument", "Tissue"
-    ]
+    python alignments/verify_alignment.py alignments/twin_or_2_aligned.owl --report report.json
+"""
 
-    found_classes = 0
-    missing_classes = []
+import argparse
+import bisect
+import json
+import sys
+import time
+from pathlib import Path
 
-    for class_name in new_classes:
-        cls = OR[class_name]
-        if (cls, RDF.type, OWL.Class) in g:
-            found_classes += 1
-        else:
-            missing_classes.append(class_name)
+from rdflib import Graph, OWL, RDF, URIRef
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from rdflib.store import Store
+from rdflib.util import guess_format
 
-    print(f"Found {found_classes}/{len(new_classes)} new classes")
-    if missing_classes:
-        print(f"Missing: {', '.join(missing_classes)}")
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
 
-    print("\n=== Checking Key Relationships ===")
+from ontology_utils import find_companion  # noqa: E402
 
-    step = OR.Step_A1_2
-    relationships = []
+DEFAULT_EXPECTATIONS = Path(__file__).resolve().parent / "expectations.json"
+DEFAULT_ONTOLOGY = Path(__file__).resolve().parent / "twin_or_2_aligned.owl"
 
-    for p, o in g.predicate_objects(step):
-        pred_name = str(p).split('/')[-1]
-        obj_name = str(o).split('/')[-1]
-        relationships.append(f"{pred_name}: {obj_name}")
+# kind -> rdf:type objects that satisfy it; None: any rdf:type
+KIND_TYPES = {
+    "individual": None,
+    "class": frozenset({OWL.Class}),
+    "property": frozenset({OWL.ObjectProperty, OWL.DatatypeProperty}),
+}
 
-    print(f"\nStep_A1_2 relationships ({len(relationships)}):")
-    for rel in sorted(relationships)[:10]:  
-        print(f"  - {rel}")
+# Relationships listed per described subject
+DESCRIBE_LIMIT = 10
 
 
-    print("\n=== Checking Properties ===")
+class _Sink:
+    def __init__(self, on_triple):
+        self.triple = on_triple
 
-    properties = [
-        "hasInstrument", "targetTissue", "implementsGroup",
-        "forceValue", "motionParam"
-    ]
 
-    found_props = 0
-    for prop_name in properties:
-        prop = OR[prop_name]
-        if (prop, RDF.type, OWL.ObjectProperty) in g or (prop, RDF.type, OWL.DatatypeProperty) in g:
-            found_props += 1
+class _StreamingStore(Store):
+    """Store that hands each parsed triple to a callback and keeps nothing."""
 
-    print(f"Found {found_props}/{len(properties)} new properties")
+    def __init__(self, on_triple):
+        super().__init__()
+        self.on_triple = on_triple
+
+    def add(self, triple, context, quoted=False):
+        self.on_triple(*triple)
+
+    def bind(self, prefix, namespace, override=True):
+        pass
+
+    def namespace(self, prefix):
+        return None
+
+    def prefix(self, namespace):
+        return None
+
+    def namespaces(self):
+        return iter(())
+
+
+def _local(term):
+    return str(term).split('/')[-1].split('#')[-1]
+
+
+def _stream_ntriples(path, on_triple, subjects):
+    """N-Triples, one line at a time; only lines about ``subjects`` are parsed."""
+    wanted = {str(subject) for subject in subjects}
+    total = 0
+    parser = W3CNTriplesParser(sink=_Sink(on_triple))
+    with open(path, encoding="utf-8") as fp:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            total += 1
+            # Subject IRIs are compared as text; escaped ones are parsed to be safe
+            if line.startswith("<"):
+                iri = line[1:line.find(">")]
+                if iri in wanted or "\\" in iri:
+                    parser.parsestring(line)
+    return total
+
+
+def stream_triples(ontology_path, on_triple, subjects=None):
+    """Parse ``ontology_path`` once, calling ``on_triple(s, p, o)``.
+
+    With ``subjects``, N-Triples lines about other subjects are counted but
+    not parsed, and ``on_triple`` may only see triples about ``subjects``.
+    Returns the file and format read and the number of triples.
+    """
+    companion = find_companion(ontology_path)
+    path, fmt = companion or (str(ontology_path), guess_format(str(ontology_path)) or "xml")
+    if fmt == "nt" and subjects is not None:
+        return path, fmt, _stream_ntriples(path, on_triple, subjects)
+
+    total = 0
+
+    def counted(s, p, o):
+        nonlocal total
+        total += 1
+        on_triple(s, p, o)
+
+    Graph(store=_StreamingStore(counted)).parse(path, format=fmt)
+    return path, fmt, total
+
+
+def verify_alignment(ontology_path, expectations_path=DEFAULT_EXPECTATIONS):
+    """Check the ontology against the expectations; returns the report dict."""
+    with open(expectations_path, encoding="utf-8") as fp:
+        expectations = json.load(fp)
+    namespace = expectations["namespace"]
+    checks = expectations["checks"]
+    for name, check in checks.items():
+        if check["kind"] not in KIND_TYPES:
+            raise ValueError(f"check {name!r}: unknown kind {check['kind']!r}")
+
+    wanted = {URIRef(namespace + n) for check in checks.values() for n in check["names"]}
+    tracked_types = frozenset().union(*(t for t in KIND_TYPES.values() if t))
+    described = {URIRef(namespace + n): {"count": 0, "first": []} for n in expectations.get("describe", [])}
+
+    typed = set()
+    typed_as = set()
+
+    def on_triple(s, p, o):
+        if p == RDF.type and s in wanted:
+            typed.add(s)
+            if o in tracked_types:
+                typed_as.add((s, o))
+        relations = described.get(s)
+        if relations is not None:
+            relations["count"] += 1
+            first = relations["first"]
+            bisect.insort(first, f"{_local(p)}: {_local(o)}")
+            del first[DESCRIBE_LIMIT:]
+
+    started = time.perf_counter()
+    path, fmt, total = stream_triples(ontology_path, on_triple, wanted | described.keys())
+
+    results = {}
+    for name, check in checks.items():
+        types = KIND_TYPES[check["kind"]]
+        missing = []
+        for local in check["names"]:
+            subject = URIRef(namespace + local)
+            if types is None:
+                found = subject in typed
+            else:
+                found = any((subject, t) in typed_as for t in types)
+            if not found:
+                missing.append(local)
+        results[name] = {
+            "kind": check["kind"],
+            "expected": len(check["names"]),
+            "found": len(check["names"]) - len(missing),
+            "missing": missing,
+        }
+
+    rule = expectations.get("pass", {"checks": list(checks), "minFraction": 1.0})
+    expected = sum(results[name]["expected"] for name in rule["checks"])
+    found = sum(results[name]["found"] for name in rule["checks"])
+
+    return {
+        "ontology": str(ontology_path),
+        "parsed": path,
+        "format": fmt,
+        "triples": total,
+        "seconds": round(time.perf_counter() - started, 3),
+        "checks": results,
+        "relationships": {_local(s): r for s, r in described.items()},
+        "pass": {**rule, "expected": expected, "found": found},
+        "passed": found >= expected * rule["minFraction"],
+    }
+
+
+def print_report(report):
+    print(f"Loading ontology from: {report['ontology']}")
+    if report["parsed"] != report["ontology"]:
+        print(f"  (read {report['parsed']} as {report['format']})")
+    print(f"Total triples: {report['triples']}")
+
+    for name, result in report["checks"].items():
+        print(f"\n=== Checking {name} ===")
+        print(f"Found {result['found']}/{result['expected']} ({result['kind']})")
+        if result["missing"]:
+            print(f"Missing: {', '.join(result['missing'])}")
+
+    for subject, relations in report["relationships"].items():
+        print(f"\n{subject} relationships ({relations['count']}):")
+        for rel in relations["first"]:
+            print(f"  - {rel}")
 
     print("\n=== SUMMARY ===")
-    total_expected = len(base_individuals) + len(surgical_individuals)
-    total_found = found + found_surgical
-
-    if total_found >= total_expected * 0.9:  
+    rule = report["pass"]
+    if report["passed"]:
         print("✅ Alignment verification PASSED")
-        print(f"   Found {total_found}/{total_expected} expected individuals")
-        return True
+        print(f"   Found {rule['found']}/{rule['expected']} expected individuals")
     else:
         print("❌ Alignment verification FAILED")
-        print(f"   Only found {total_found}/{total_expected} expected individuals")
-        return False
+        print(f"   Only found {rule['found']}/{rule['expected']} expected individuals")
 
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        ontology_path = sys.argv[1]
-    else:
-        ontology_path = "../twin_or_2_aligned.owl"
+def main():
+    parser = argparse.ArgumentParser(description="Verify the aligned ontology")
+    parser.add_argument("ontology", nargs="?", type=Path, default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--expectations", type=Path, default=DEFAULT_EXPECTATIONS)
+    parser.add_argument("--report", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
 
-    if not Path(ontology_path).exists():
-        print(f"Error: Ontology file not found: {ontology_path}")
-        sys.exit(1)
+    if not args.ontology.exists() and not find_companion(args.ontology):
+        print(f"Error: Ontology file not found: {args.ontology}")
+        return 1
 
-    success = verify_alignment(ontology_path)
-    sys.exit(0 if success else 1)
+    report = verify_alignment(args.ontology, args.expectations)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=2)
+        print(f"Report written to {args.report}")
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
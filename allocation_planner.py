@@ -0,0 +1,274 @@
+# allocation_planner.py
+"""
+Capability-based assignment of actors and instruments to upcoming steps.
+
+Capabilities are interned as bit positions, so an actor's skills and a step's
+requirements are plain integers and feasibility is ``actor & need == need``.
+Actors sharing a capability mask are grouped, which keeps candidate lookup
+proportional to the number of distinct masks rather than actors.
+
+Assignments are maximum bipartite matchings (augmenting paths). The matching
+survives between calls to ``plan()``: only pairs touched by a change are
+released and only free demands are re-augmented, which keeps re-planning
+incremental when a few actors, instruments or steps change.
+"""
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Set
+
+from rdflib import Graph, Namespace, RDF, URIRef
+
+from ontology_utils import get_label_from_uri
+
+OR = Namespace("http://www.semanticweb.org/Twin_OR/")
+
+
+class CapabilityEncoder:
+    """Interns capability URIs as bit positions."""
+
+    def __init__(self) -> None:
+        self._bits: Dict[Hashable, int] = {}
+
+    def bit(self, capability: Hashable) -> int:
+        if capability not in self._bits:
+            self._bits[capability] = len(self._bits)
+        return self._bits[capability]
+
+    def mask(self, capabilities: Iterable[Hashable]) -> int:
+        mask = 0
+        for capability in capabilities:
+            mask |= 1 << self.bit(capability)
+        return mask
+
+    def decode(self, mask: int) -> List[Hashable]:
+        return [c for c, bit in self._bits.items() if mask >> bit & 1]
+
+
+class _Matcher:
+    """Incremental maximum bipartite matching of left keys to right keys."""
+
+    def __init__(self) -> None:
+        self.left_to_right: Dict[Hashable, Hashable] = {}
+        self.right_to_left: Dict[Hashable, Hashable] = {}
+
+    def release_left(self, left) -> None:
+        right = self.left_to_right.pop(left, None)
+        if right is not None:
+            del self.right_to_left[right]
+
+    def release_right(self, right) -> None:
+        left = self.right_to_left.pop(right, None)
+        if left is not None:
+            del self.left_to_right[left]
+
+    def augment(self, free_lefts: List, candidates) -> None:
+        """Grow the matching from ``free_lefts`` until no augmenting path remains."""
+        pending = [left for left in free_lefts if left not in self.left_to_right]
+
+        while pending:
+            visited: Set = set()
+            still_free = []
+            for left in pending:
+                if not self._try(left, candidates, visited):
+                    still_free.append(left)
+            if len(still_free) == len(pending):
+                break
+            pending = still_free
+
+    def _try(self, root, candidates, visited) -> bool:
+        # Iterative DFS for an augmenting path, avoiding recursion limits
+        stack = [(root, iter(candidates(root)))]
+        parents = {}
+        while stack:
+            left, options = stack[-1]
+            advanced = False
+            for right in options:
+                if right in visited:
+                    continue
+                visited.add(right)
+                owner = self.right_to_left.get(right)
+                parents[right] = left
+                if owner is None:
+                    # Flip the path back to the root
+                    while True:
+                        prev = self.left_to_right.get(left)
+                        self.left_to_right[left] = right
+                        self.right_to_left[right] = left
+                        if left == root:
+                            return True
+                        right = prev
+                        left = parents[right]
+                stack.append((owner, iter(candidates(owner))))
+                advanced = True
+                break
+            if not advanced:
+                stack.pop()
+        return False
+
+
+class AllocationPlanner:
+    """Assigns capable actors and free instruments to step demands."""
+
+    def __init__(self) -> None:
+        self.capabilities = CapabilityEncoder()
+
+        self.actor_masks: Dict[Hashable, int] = {}
+        self._actors_by_mask: Dict[int, List[Hashable]] = defaultdict(list)
+        self._candidate_cache: Dict[int, List[Hashable]] = {}
+
+        self.instrument_types: Dict[Hashable, Set[Hashable]] = {}
+        self._instruments_by_type: Dict[Hashable, List[Hashable]] = defaultdict(list)
+
+        self.demand_masks: Dict[Hashable, int] = {}
+        self.demand_instruments: Dict[Hashable, List[Hashable]] = {}
+
+        self._actor_matching = _Matcher()
+        self._instrument_matching = _Matcher()
+
+    # -- actors ------------------------------------------------------------
+    def set_actor(self, actor: Hashable, capabilities: Iterable[Hashable]) -> None:
+        mask = self.capabilities.mask(capabilities)
+        old = self.actor_masks.get(actor)
+        if old == mask:
+            return
+        if old is not None:
+            self._actors_by_mask[old].remove(actor)
+        self.actor_masks[actor] = mask
+        self._actors_by_mask[mask].append(actor)
+        self._candidate_cache.clear()
+
+        demand = self._actor_matching.right_to_left.get(actor)
+        if demand is not None and mask & self.demand_masks[demand] != self.demand_masks[demand]:
+            self._actor_matching.release_right(actor)
+
+    def remove_actor(self, actor: Hashable) -> None:
+        mask = self.actor_masks.pop(actor, None)
+        if mask is None:
+            return
+        self._actors_by_mask[mask].remove(actor)
+        self._candidate_cache.clear()
+        self._actor_matching.release_right(actor)
+
+    # -- instruments -------------------------------------------------------
+    def set_instrument(self, instrument: Hashable, types: Iterable[Hashable] = ()) -> None:
+        """Register an instrument; it satisfies requests for itself or any of ``types``."""
+        self.remove_instrument(instrument)
+        kinds = {instrument, *types}
+        self.instrument_types[instrument] = kinds
+        for kind in kinds:
+            self._instruments_by_type[kind].append(instrument)
+
+    def remove_instrument(self, instrument: Hashable) -> None:
+        kinds = self.instrument_types.pop(instrument, None)
+        if kinds is None:
+            return
+        for kind in kinds:
+            self._instruments_by_type[kind].remove(instrument)
+        self._instrument_matching.release_right(instrument)
+
+    # -- demands -----------------------------------------------------------
+    def set_demand(
+            self,
+            demand: Hashable,
+            capabilities: Iterable[Hashable] = (),
+            instruments: Iterable[Hashable] = ()
+    ) -> None:
+        """Declare that ``demand`` needs one actor with ``capabilities`` plus ``instruments``."""
+        mask = self.capabilities.mask(capabilities)
+        instruments = list(instruments)
+
+        if self.demand_masks.get(demand) != mask:
+            self._actor_matching.release_left(demand)
+        if self.demand_instruments.get(demand) != instruments:
+            for slot in self._slots(demand):
+                self._instrument_matching.release_left(slot)
+
+        self.demand_masks[demand] = mask
+        self.demand_instruments[demand] = instruments
+
+    def remove_demand(self, demand: Hashable) -> None:
+        if demand not in self.demand_masks:
+            return
+        self._actor_matching.release_left(demand)
+        for slot in self._slots(demand):
+            self._instrument_matching.release_left(slot)
+        del self.demand_masks[demand]
+        del self.demand_instruments[demand]
+
+    def sync_demands(self, demands: Dict[Hashable, dict]) -> None:
+        """Replace the demand set, touching only demands that were added, changed or dropped."""
+        for demand in [d for d in self.demand_masks if d not in demands]:
+            self.remove_demand(demand)
+        for demand, need in demands.items():
+            self.set_demand(demand, need.get("capabilities", ()), need.get("instruments", ()))
+
+    def _slots(self, demand) -> List[tuple]:
+        return [(demand, i) for i in range(len(self.demand_instruments.get(demand, ())))]
+
+    # -- planning ----------------------------------------------------------
+    def _capable_actors(self, demand) -> List[Hashable]:
+        need = self.demand_masks[demand]
+        actors = self._candidate_cache.get(need)
+        if actors is None:
+            actors = [
+                actor
+                for mask, group in self._actors_by_mask.items()
+                if mask & need == need
+                for actor in group
+            ]
+            self._candidate_cache[need] = actors
+        return actors
+
+    def _matching_instruments(self, slot) -> List[Hashable]:
+        demand, i = slot
+        return self._instruments_by_type.get(self.demand_instruments[demand][i], [])
+
+    def plan(self) -> dict:
+        """Re-augment the matchings and return assignments plus unmet demands."""
+        self._actor_matching.augment(list(self.demand_masks), self._capable_actors)
+        slots = [slot for demand in self.demand_masks for slot in self._slots(demand)]
+        self._instrument_matching.augment(slots, self._matching_instruments)
+
+        assignments = {}
+        unassigned = []
+        for demand in self.demand_masks:
+            actor = self._actor_matching.left_to_right.get(demand)
+            instruments = [self._instrument_matching.left_to_right.get(slot) for slot in self._slots(demand)]
+            assignments[demand] = {"actor": actor, "instruments": instruments}
+            if actor is None or None in instruments:
+                unassigned.append(demand)
+
+        return {"assignments": assignments, "unassigned": unassigned}
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "AllocationPlanner":
+        """Load actors (``hasCapability``) and instruments (``rdf:type Instrument``/``Tool``)."""
+        planner = cls()
+
+        actor_caps: Dict[URIRef, Set[URIRef]] = defaultdict(set)
+        for actor, capability in graph.subject_objects(OR.hasCapability):
+            actor_caps[actor].add(capability)
+        for actor, caps in actor_caps.items():
+            planner.set_actor(actor, caps)
+
+        instruments: Set[URIRef] = set()
+        for instrument_class in (OR.Instrument, OR.Tool):
+            instruments.update(graph.subjects(RDF.type, instrument_class))
+        for instrument in instruments:
+            planner.set_instrument(instrument, set(graph.objects(instrument, RDF.type)))
+
+        return planner
+
+
+def describe_plan(plan: dict, demand_label=str) -> dict:
+    """JSON-friendly view of ``AllocationPlanner.plan()`` output using local names."""
+    return {
+        "assignments": [
+            {
+                "demand": demand_label(demand),
+                "actor": get_label_from_uri(entry["actor"]) if entry["actor"] else None,
+                "instruments": [get_label_from_uri(i) if i else None for i in entry["instruments"]],
+            }
+            for demand, entry in plan["assignments"].items()
+        ],
+        "unassigned": [demand_label(d) for d in plan["unassigned"]],
+    }
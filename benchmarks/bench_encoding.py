@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+bench_encoding.py
+Payload size and serialisation time of a violating snapshot per encoding.
+
+Removes every ``stepAction`` triple so that each step violates the SHACL
+shapes, validates, and builds the ``/state`` snapshot. It then encodes the
+snapshot as the server would: JSON with the full text report (the old
+default), JSON without it, and the negotiated MessagePack / gzip / brotli
+variants that are installed.
+
+    python benchmarks/bench_encoding.py --repeat 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from OR_simulator import ORSimulator, OR  # noqa: E402
+import response_encoding  # noqa: E402
+from response_encoding import JSON, MSGPACK, compress, encode  # noqa: E402
+
+
+def violating_snapshot():
+    sim = ORSimulator(
+        str(ROOT / "alignments" / "twin_or_2_aligned.owl"),
+        str(ROOT / "ontologies" / "SHACL_constraints.ttl"),
+        str(ROOT / "data" / "sensor_data.json"),
+        initial_procedure="LaparoscopicProcedure",
+    )
+    for triple in list(sim.or_graph.triples((None, OR.stepAction, None))):
+        sim.or_graph.remove(triple)
+    sim.validate_current_state_with_shacl()
+    details = sim.get_validation_details()
+
+    return {
+        "session": "bench",
+        "version": sim.state_version,
+        "plan": sim.current_plan,
+        "phase": sim.current_phase,
+        "steps": sim.current_steps,
+        "procedure": sim.current_procedure,
+        "violation": True,
+        "timestamp": "2025-01-01T00:00:00Z",
+        "validationDetails": details,
+        "ongoing": sim.ongoing_procedure,
+        "availableProcedures": list(sim.procedures.keys()),
+    }
+
+
+def measure(payload, media_type, coding, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body, applied = compress(encode(payload, media_type), coding)
+    elapsed = (time.perf_counter() - started) / repeat
+    return len(body), elapsed
+
+
+def main():
+    """Print size and encode time per representation."""
+    parser = argparse.ArgumentParser(description="Compare snapshot encodings")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with_report = violating_snapshot()
+    details = {k: v for k, v in with_report["validationDetails"].items() if k != "report"}
+    compact = dict(with_report, validationDetails=details)
+
+    variants = [
+        ("json + report (old default)", with_report, JSON, None),
+        ("json", compact, JSON, None),
+        ("json + gzip", compact, JSON, "gzip"),
+    ]
+    if response_encoding.brotli is not None:
+        variants.append(("json + br", compact, JSON, "br"))
+    if response_encoding.msgpack is not None:
+        variants.append(("msgpack", compact, MSGPACK, None))
+        variants.append(("msgpack + gzip", compact, MSGPACK, "gzip"))
+        if response_encoding.brotli is not None:
+            variants.append(("msgpack + br", compact, MSGPACK, "br"))
+
+    print(f"{len(details['violations'])} violations, "
+          f"report {len(with_report['validationDetails']['report'])} chars")
+    print(f"{'encoding':30s} {'bytes':>8s} {'vs old':>7s} {'encode ms':>10s}")
+    baseline = None
+    for name, payload, media_type, coding in variants:
+        size, seconds = measure(payload, media_type, coding, args.repeat)
+        baseline = baseline or size
+        print(f"{name:30s} {size:8d} {size / baseline:7.1%} {seconds * 1000:10.3f}")
+
+    missing = [name for name, module in (("msgpack", response_encoding.msgpack),
+                                         ("brotli", response_encoding.brotli)) if module is None]
+    if missing:
+        print(f"Not installed, skipped: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+bench_queries.py
+Per-call cost of SPARQL query text versus ``queries.run_step_query``.
+
+For each per-step lookup the text path builds the query string, lets rdflib
+parse and translate it and evaluates it. This is what every call did
+originally. ``run_step_query`` looks the predicate set expanded by the
+simulator's property hierarchy up directly. Both run on a graph with every
+step of the procedure applied, for one current step and for all steps.
+
+    python benchmarks/bench_queries.py --repeat 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import queries  # noqa: E402
+from OR_simulator import ORSimulator, STEP_SEQUENCES  # noqa: E402
+
+TEXT_BUILDERS = {
+    "instruments": queries.get_instruments_for_steps,
+    "actors": queries.get_actors_for_steps,
+    "tissues": queries.get_target_tissues_for_steps,
+    "capabilities": queries.get_capabilities_for_steps,
+}
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    """Print microseconds per call for query text and run_step_query."""
+    parser = argparse.ArgumentParser(description="Compare SPARQL text and step lookups per call")
+    parser.add_argument("--procedure", default="LaparoscopicProcedure")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    sim = ORSimulator(
+        str(ROOT / "alignments" / "twin_or_2_aligned.owl"),
+        str(ROOT / "ontologies" / "SHACL_constraints.ttl"),
+        str(ROOT / "data" / "sensor_data.json"),
+        initial_procedure=args.procedure,
+    )
+    sim.run_steps(until="end", validate=False, force_advance=True)
+    graph = sim.or_graph
+    hierarchy = sim.property_hierarchy
+    all_steps = [step for group in STEP_SEQUENCES[args.procedure] for step in group]
+
+    print(f"{'query':14s} {'steps':>5s} {'text us':>9s} {'lookup us':>12s} {'speed-up':>9s}")
+    for name, build in TEXT_BUILDERS.items():
+        for steps in (all_steps[:1], all_steps):
+            text = timed(lambda: list(graph.query(build(steps))), args.repeat)
+            lookup = timed(lambda: queries.run_step_query(graph, name, steps, hierarchy=hierarchy), args.repeat)
+            print(f"{name:14s} {len(steps):5d} {text * 1e6:9.0f} {lookup * 1e6:12.0f} {text / lookup:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+bench_scale.py
+Ontology loading, sensor updates, SHACL validation and queries at scale.
+
+Runs against a synthetic ontology and procedure from ``synthetic.py``. It
+measures:
+
+* ``load``: ``load_and_materialize_ontology`` with a cold parse cache
+* ``sensors``: ``simulate_robotic_sensor_output_and_update_ontology``, per step
+* ``validation``: ``validate_current_state_with_shacl``
+* ``query.<template>``: every query text builder in ``queries.py``, run with
+  ``Graph.query``
+* ``lookup.<category>``: ``queries.run_step_query``
+
+Results are written as a JSON baseline. ``--compare`` checks a run against a
+baseline and exits with status 1 when any measurement is slower than the
+baseline by more than ``--threshold``. The comparison uses the fastest run
+of each measurement, which is less noisy than the mean.
+``benchmarks/baselines/small.json`` is the committed baseline of the small
+preset; timings depend on the machine, so save a local one to compare
+against on other hardware:
+
+    python benchmarks/bench_scale.py --preset small --save benchmarks/baselines/small.json
+    python benchmarks/bench_scale.py --preset small --compare benchmarks/baselines/small.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import rdflib  # noqa: E402
+
+import queries  # noqa: E402
+import synthetic  # noqa: E402
+from OR_simulator import ORSimulator, OR, STEP_SEQUENCES  # noqa: E402
+from ontology_utils import clear_parse_cache, load_and_materialize_ontology  # noqa: E402
+
+# name -> (triples, steps)
+PRESETS = {
+    "small": (10_000, 10),
+    "medium": (100_000, 1_000),
+    "large": (1_000_000, 10_000),
+}
+
+# query.<name> -> builder called with the sampled steps
+TEMPLATES = {
+    "instruments_for_steps": queries.get_instruments_for_steps,
+    "target_tissues_for_steps": queries.get_target_tissues_for_steps,
+    "actors_for_steps": queries.get_actors_for_steps,
+    "capabilities_for_steps": queries.get_capabilities_for_steps,
+    "materials_for_steps": queries.get_materials_for_steps,
+    "tools_for_steps": queries.get_tools_for_steps,
+    "action_group_for_step": lambda steps: queries.get_action_group_for_step(steps[0]),
+    "force_value_for_step": lambda steps: queries.get_force_value_for_step(steps[0]),
+    "motion_params_for_step": lambda steps: queries.get_motion_params_for_step(steps[0]),
+    "all_instruments": lambda steps: queries.get_all_instruments(),
+    "all_steps": lambda steps: queries.get_all_steps(),
+    "actors_with_capability": lambda steps: queries.get_actors_with_capability("SynSkill_0"),
+    "action_groups_for_core": lambda steps: queries.get_action_groups_for_core("ActionCore"),
+}
+
+
+def measure(fn, repeat):
+    """``fn`` run ``repeat`` times; returns the timing summary in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {"mean": statistics.fmean(samples), "min": min(samples), "repeat": repeat}
+
+
+def run(args):
+    ontology_path, sensor_path = synthetic.generate(args.triples, args.steps, args.seed)
+    names = synthetic.step_names(args.steps)
+    STEP_SEQUENCES[synthetic.PROCEDURE] = [[step] for step in names]
+    results = {}
+
+    def cold_load():
+        clear_parse_cache()
+        load_and_materialize_ontology(str(ontology_path), OR, "twin")
+    results["load"] = measure(cold_load, args.load_repeat)
+    print(f"load: {results['load']['mean']:.3f} s", flush=True)
+
+    sim = ORSimulator(
+        str(ontology_path),
+        str(ROOT / "ontologies" / "SHACL_constraints.ttl"),
+        str(sensor_path),
+        initial_procedure=synthetic.PROCEDURE,
+    )
+
+    sample = min(args.sample_steps, args.steps)
+    samples = []
+    for _ in range(sample):
+        started = time.perf_counter()
+        sim.simulate_robotic_sensor_output_and_update_ontology()
+        samples.append(time.perf_counter() - started)
+        next_steps = sim.get_next_steps()
+        if next_steps:
+            sim.current_steps = next_steps
+    results["sensors"] = {"mean": statistics.fmean(samples), "min": min(samples), "repeat": sample}
+    print(f"sensors: {results['sensors']['mean'] * 1000:.1f} ms/step", flush=True)
+
+    if not args.skip_validation:
+        results["validation"] = measure(sim.validate_current_state_with_shacl, args.validation_repeat)
+        print(f"validation: {results['validation']['mean']:.3f} s", flush=True)
+
+    graph = sim.or_graph
+    applied = names[:sample]
+    for name, build in TEMPLATES.items():
+        text = build(applied)
+        results[f"query.{name}"] = measure(lambda: list(graph.query(text)), args.repeat)
+    for name in queries.STEP_PROPERTIES:
+        results[f"lookup.{name}"] = measure(
+            lambda: queries.run_step_query(graph, name, applied, hierarchy=sim.property_hierarchy), args.repeat
+        )
+    for key in results:
+        if key.startswith(("query.", "lookup.")):
+            print(f"{key}: {results[key]['mean'] * 1000:.3f} ms")
+
+    return {
+        "meta": {
+            "triples": args.triples,
+            "steps": args.steps,
+            "graphTriples": len(graph),
+            "sampleSteps": sample,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "rdflib": rdflib.__version__,
+            "machine": platform.machine(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print current vs. baseline best times; returns the names that regressed."""
+    if baseline["meta"]["triples"] != current["meta"]["triples"] or \
+            baseline["meta"]["steps"] != current["meta"]["steps"]:
+        print("warning: baseline was recorded at a different size")
+
+    regressions = []
+    print(f"{'measurement':34s} {'baseline':>11s} {'current':>11s} {'change':>8s}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:34s} {'-':>11s} {result['min'] * 1000:9.3f}ms {'new':>8s}")
+            continue
+        change = result["min"] / base["min"] - 1 if base["min"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:34s} {base['min'] * 1000:9.3f}ms {result['min'] * 1000:9.3f}ms {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale benchmarks on a synthetic ontology")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--triples", type=int, help="Overrides the preset")
+    parser.add_argument("--steps", type=int, help="Overrides the preset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query measurement")
+    parser.add_argument("--load-repeat", type=int, default=3)
+    parser.add_argument("--validation-repeat", type=int, default=3)
+    parser.add_argument("--sample-steps", type=int, default=20, help="Steps applied for the sensor measurement")
+    parser.add_argument("--skip-validation", action="store_true")
+    parser.add_argument("--save", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    preset_triples, preset_steps = PRESETS[args.preset]
+    args.triples = args.triples or preset_triples
+    args.steps = args.steps or preset_steps
+
+    current = run(args)
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as fp:
+            json.dump(current, fp, indent=2)
+        print(f"Saved {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+bench_serving.py
+Throughput of the development server versus the multi-worker serving mode.
+
+Starts each server in a subprocess, then runs ``--clients`` client processes,
+each driving its own room in a closed loop of ``/step``, ``/state`` and
+``/question`` requests for ``--duration`` seconds. Reports requests per
+second and latency percentiles for each mode.
+
+    python benchmarks/bench_serving.py --workers 4 --clients 8 --duration 30
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PROCEDURES = ["LaparoscopicProcedure", "MicrosurgicalProcedure", "RoboticProcedure"]
+
+
+def _wait_for_server(port: int, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/sessions")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _start_server(mode: str, port: int, workers: int, store: str) -> subprocess.Popen:
+    if mode == "dev":
+        # app.run() without the reloader, as `python flask_server.py` serves requests
+        code = f"from flask_server import get_app; get_app().run(host='127.0.0.1', port={port}, threaded=True)"
+        cmd = [sys.executable, "-c", code]
+    else:
+        cmd = [sys.executable, str(ROOT / "serve.py"), "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--worker-port", str(port + 100), "--store", store]
+    return subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+REQUESTS = [("POST", "/step"), ("GET", "/state"), ("GET", "/question?question=instrument")]
+
+
+def _client(args) -> list:
+    """Drive one room for ``duration`` seconds; returns request latencies in seconds."""
+    port, index, duration, barrier = args
+    session = f"bench-{index}"
+    procedure = PROCEDURES[index % len(PROCEDURES)]
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    headers = {"Content-Type": "application/json", "X-Session-ID": session}
+
+    def call(method, path, body=None):
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        data = conn.getresponse().read()
+        return json.loads(data) if data else {}
+
+    call("POST", "/init", {"procedure": procedure})
+    # Inits are excluded: the clock starts once every room exists
+    barrier.wait()
+
+    latencies = []
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        for method, path in REQUESTS:
+            started = time.perf_counter()
+            body = call(method, path)
+            latencies.append(time.perf_counter() - started)
+            if path == "/step" and not body.get("ongoing", True):
+                # Restart finished rooms so every client keeps stepping
+                call("POST", "/switch-procedure", {"procedure": procedure})
+    return latencies
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run_mode(mode: str, port: int, workers: int, clients: int, duration: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _start_server(mode, port, workers, os.path.join(tmp, "sessions.db"))
+        try:
+            _wait_for_server(port)
+            with multiprocessing.Manager() as manager, multiprocessing.Pool(clients) as pool:
+                barrier = manager.Barrier(clients)
+                results = pool.map(_client, [(port, i, duration, barrier) for i in range(clients)])
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies = [latency for result in results for latency in result]
+    return {
+        "mode": mode,
+        "workers": workers if mode == "serve" else 1,
+        "clients": clients,
+        "requests": len(latencies),
+        "requestsPerSecond": len(latencies) / duration,
+        "p50Ms": _percentile(latencies, 0.50) * 1000,
+        "p95Ms": _percentile(latencies, 0.95) * 1000,
+    }
+
+
+def main():
+    """Benchmark the selected serving modes and print a comparison."""
+    parser = argparse.ArgumentParser(description="Compare dev-server and multi-worker throughput")
+    parser.add_argument("--mode", choices=["dev", "serve", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client processes, one room each")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load per mode")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    modes = ["dev", "serve"] if args.mode == "both" else [args.mode]
+    results = [run_mode(mode, args.port, args.workers, args.clients, args.duration) for mode in modes]
+
+    print(f"{'mode':6s} {'workers':>7s} {'requests':>9s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    for r in results:
+        print(f"{r['mode']:6s} {r['workers']:7d} {r['requests']:9d} {r['requestsPerSecond']:8.1f} "
+              f"{r['p50Ms']:8.1f} {r['p95Ms']:8.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+synthetic.py
+Scaled copies of the aligned ontology and the scenario data for benchmarks.
+
+``generate(triples, steps)`` adds a synthetic procedure of ``steps`` steps to
+``alignments/twin_or_2_aligned.owl``, together with a pool of actors,
+instruments, tissues and capabilities for them. It then pads the graph with
+observation entities until it holds ``triples`` triples. The matching
+scenario file holds the procedure ``SyntheticProcedure``. Each step's sensor
+triples name a capability, an actor, an instrument, a tissue and a force, as
+the real procedures do.
+
+Files are written once per (triples, steps, seed) and reused:
+
+    python benchmarks/synthetic.py --triples 100000 --steps 1000
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+from rdflib import Graph, Literal, Namespace, OWL, RDF, RDFS
+from rdflib.namespace import XSD
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(__file__).resolve().parent / ".synthetic"
+
+OR = Namespace("http://www.semanticweb.org/Twin_OR/")
+PROV = Namespace("http://www.w3.org/ns/prov#")
+
+PROCEDURE = "SyntheticProcedure"
+
+
+def step_names(steps: int) -> List[str]:
+    return [f"Step_S{i:05d}" for i in range(steps)]
+
+
+def _pools(steps: int) -> dict:
+    size = max(5, steps // 10)
+    return {
+        "actors": [f"SynActor_{i}" for i in range(size)],
+        "instruments": [f"SynInstrument_{i}" for i in range(size)],
+        "tissues": [f"SynTissue_{i}" for i in range(max(3, size // 4))],
+        "capabilities": [f"SynSkill_{i}" for i in range(max(3, size // 10))],
+    }
+
+
+def build(triples: int, steps: int, seed: int = 0) -> Tuple[Graph, dict]:
+    """Synthetic ontology graph and scenario data, without writing them."""
+    rng = random.Random(seed)
+    g = Graph().parse(ROOT / "alignments" / "twin_or_2_aligned.owl", format="xml")
+    pools = _pools(steps)
+
+    for capability in pools["capabilities"]:
+        g.add((OR[capability], RDF.type, OR.Capability))
+    for i, actor in enumerate(pools["actors"]):
+        g.add((OR[actor], RDF.type, OR.Surgeon if i % 2 else OR.Nurse))
+        g.add((OR[actor], RDF.type, OWL.NamedIndividual))
+        g.add((OR[actor], OR.hasCapability, OR[rng.choice(pools["capabilities"])]))
+    for instrument in pools["instruments"]:
+        g.add((OR[instrument], RDF.type, OR.Instrument))
+        g.add((OR[instrument], RDF.type, OWL.NamedIndividual))
+    for tissue in pools["tissues"]:
+        g.add((OR[tissue], RDF.type, OR.Tissue))
+
+    phases = max(1, steps // 100)
+    for i in range(phases):
+        g.add((OR[f"SynPhase_{i}"], RDF.type, OR.Phase))
+    names = step_names(steps)
+    for i, step in enumerate(names):
+        g.add((OR[step], RDF.type, OR.Step))
+        g.add((OR[step], RDF.type, OWL.NamedIndividual))
+        g.add((OR[step], RDFS.label, Literal(step)))
+        g.add((OR[step], OR.stepAction, OR[f"SynAction_{i % 50}"]))
+        g.add((OR[step], OR.inPhase, OR[f"SynPhase_{i * phases // steps}"]))
+
+    i = 0
+    while len(g) < triples:
+        observation = OR[f"SynObservation_{i}"]
+        g.add((observation, RDF.type, PROV.Entity))
+        g.add((observation, PROV.wasGeneratedBy, OR[names[i % steps]]))
+        g.add((observation, OR.hasParameter, Literal(rng.random(), datatype=XSD.float)))
+        g.add((observation, RDFS.label, Literal(f"observation {i}")))
+        i += 1
+
+    procedure = {}
+    for step in names:
+        procedure[step] = {
+            "message": f"Synthetic step {step}",
+            "duration": rng.randint(1, 20),
+            "triples": [
+                {"subject": step, "predicate": "requiresCapability", "object": rng.choice(pools["capabilities"])},
+                {"subject": step, "predicate": "prov:wasAssociatedWith", "object": rng.choice(pools["actors"])},
+                {"subject": step, "predicate": "hasInstrument", "object": rng.choice(pools["instruments"])},
+                {"subject": step, "predicate": "targetTissue", "object": rng.choice(pools["tissues"])},
+                {"subject": step, "predicate": "forceValue", "object": round(rng.uniform(0.1, 2.0), 2)},
+            ],
+        }
+    return g, {"procedures": {PROCEDURE: procedure}}
+
+
+def generate(triples: int, steps: int, seed: int = 0, data_dir: Path = DATA_DIR) -> Tuple[Path, Path]:
+    """Paths of the synthetic ontology (RDF/XML) and scenario JSON, writing them if missing."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"synthetic_{triples}t_{steps}s_{seed}"
+    ontology_path = data_dir / f"{stem}.owl"
+    sensor_path = data_dir / f"{stem}.json"
+    if not (ontology_path.exists() and sensor_path.exists()):
+        g, scenario = build(triples, steps, seed)
+        g.serialize(ontology_path, format="xml")
+        with open(sensor_path, "w", encoding="utf-8") as fp:
+            json.dump(scenario, fp)
+    return ontology_path, sensor_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic ontology and scenario")
+    parser.add_argument("--triples", type=int, default=10_000)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    args = parser.parse_args()
+
+    ontology_path, sensor_path = generate(args.triples, args.steps, args.seed, args.data_dir)
+    print(ontology_path)
+    print(sensor_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# conftest.py
+# Keeps the repository root importable when the tests are run as plain `pytest`.
@@ -0,0 +1,58 @@
+# event_stream.py
+import json
+import queue
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, List
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Events message."""
+    payload = json.dumps(data, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class EventBroker:
+    """Per-session fan-out of state events to any number of stream subscribers.
+
+    Each subscriber owns a bounded queue; a slow client drops its oldest
+    events instead of blocking the simulator.
+    """
+
+    def __init__(self, max_queue: int = 64) -> None:
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, List[queue.Queue]] = defaultdict(list)
+        self._lock = Lock()
+
+    def subscribe(self, session_id: str) -> queue.Queue:
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[session_id].append(q)
+        return q
+
+    def unsubscribe(self, session_id: str, q: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(session_id, [])
+            if q in subscribers:
+                subscribers.remove(q)
+            if not subscribers:
+                self._subscribers.pop(session_id, None)
+
+    def subscriber_count(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(session_id, []))
+
+    def publish(self, session_id: str, event: str, data) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, []))
+
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait((event, data))
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
@@ -1,20 +1,111 @@
+import hashlib
+import json
+import math
 import os
+import queue
+import re
+import time
 import traceback
-from threading import Lock
 from datetime import datetime
+from threading import Event, Lock, Thread
 
-from flask import Flask, request, jsonify, send_file
+from flask import Blueprint, Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
 
-from OR_simulator import ORSimulator
-import queries
+from OR_simulator import ORSimulator, STEP_SEQUENCES
+from allocation_planner import describe_plan
+from event_stream import EventBroker, format_sse
+from jobs import JobManager, JobLimitError
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, resident_memory_bytes
+from ontology_utils import get_label_from_uri
+from query_cache import query_predicates
+from requirements_index import REQUIREMENT_PREDICATES
+from response_encoding import compress, encode, negotiate, variant_tag
+from session_manager import SessionManager, SimulatorTemplates, TimedLock, DEFAULT_SESSION_ID
+from session_store import SessionStore, replay
+from sparql_endpoint import SparqlEndpoint, SparqlError, SparqlTimeout, decode_cursor, normalize_query
 
-app = Flask(__name__)
-CORS(app)
+api = Blueprint("api", __name__)
 
-_sim_lock = Lock()
-_sim = None
-_validation_details = {"conforms": True, "violations": [], "report": ""}
+_sessions = SessionManager(
+    max_sessions=int(os.environ.get("OR_TWIN_MAX_SESSIONS", "64")),
+    idle_timeout=float(os.environ.get("OR_TWIN_SESSION_IDLE_TIMEOUT", "1800")),
+    max_triples=int(os.environ["OR_TWIN_MAX_TRIPLES"]) if os.environ.get("OR_TWIN_MAX_TRIPLES") else None,
+)
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_.:-]{1,64}$")
+
+# Shared operation log used to rebuild sessions in any worker process; set by create_app()
+_store = None
+_restore_lock = Lock()
+
+
+def _publish_job(job):
+    """Fan a job update out to its session stream and its own job stream."""
+    payload = job.to_dict()
+    _sessions.events.publish(job.session_id, "job", payload)
+    _job_events.publish(job.job_id, "job", payload)
+
+
+_job_events = EventBroker()
+_jobs = JobManager(
+    max_workers=int(os.environ.get("OR_TWIN_JOB_WORKERS", "4")),
+    max_jobs_per_session=int(os.environ.get("OR_TWIN_MAX_JOBS_PER_SESSION", "2")),
+    on_update=_publish_job,
+)
+
+_metrics = MetricsRegistry()
+_request_latency = _metrics.register(Histogram(
+    "or_twin_request_duration_seconds", "HTTP request latency by route", ["method", "route"]))
+_requests_total = _metrics.register(Counter(
+    "or_twin_requests_total", "HTTP requests by route and status", ["method", "route", "status"]))
+_stage_latency = _metrics.register(Histogram(
+    "or_twin_stage_duration_seconds", "Simulator stage latency (sensors, validation, step, snapshot, serialize, clone)",
+    ["stage"]))
+_lock_wait = _metrics.register(Histogram(
+    "or_twin_session_lock_wait_seconds", "Time spent waiting for a session lock",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)))
+_violating_states = _metrics.register(Counter(
+    "or_twin_violating_states_total", "State changes published with SHACL violations, over all sessions"))
+_metrics.register(Gauge(
+    "or_twin_sessions", "Live sessions in this process", lambda: [((), len(_sessions))]))
+_metrics.register(Gauge(
+    "or_twin_graph_triples", "Triples in each session graph",
+    lambda: [((s.session_id,), s.triple_count()) for s in _sessions.sessions()], ["session"]))
+_metrics.register(Gauge(
+    "or_twin_session_violations", "Current SHACL violations of each session",
+    lambda: [((s.session_id,), len(s.validation_details["violations"])) for s in _sessions.sessions()],
+    ["session"]))
+_metrics.register(Gauge(
+    "or_twin_active_jobs", "Queued or running background jobs",
+    lambda: [((), sum(1 for j in _jobs.jobs() if j.status in ("queued", "running")))]))
+_metrics.register(Gauge(
+    "process_resident_memory_bytes", "Resident memory of this process",
+    lambda: [((), rss)] if (rss := resident_memory_bytes()) is not None else []))
+
+
+_sparql_queries = _metrics.register(Counter(
+    "or_twin_sparql_queries_total", "/sparql queries by outcome (hit, miss, error, timeout)", ["result"]))
+
+_sparql = SparqlEndpoint(
+    default_timeout=float(os.environ.get("OR_TWIN_SPARQL_TIMEOUT", "5")),
+    max_rows=int(os.environ.get("OR_TWIN_SPARQL_MAX_ROWS", "10000")),
+    max_offset=int(os.environ.get("OR_TWIN_SPARQL_MAX_OFFSET", "100000")),
+)
+
+
+def _observe_stage(stage, seconds):
+    _stage_latency.observe(seconds, stage)
+
+
+# session ID -> stop flag of its server-side autoplay thread
+_autoplay = {}
+_autoplay_lock = Lock()
+# Seconds between autoplay steps; requested intervals are clamped to this range
+AUTOPLAY_MIN_INTERVAL = 0.05
+AUTOPLAY_MAX_INTERVAL = 3600.0
+# Longest /sessions waits for one room's lock before listing it as busy
+SESSION_LIST_LOCK_TIMEOUT = 0.25
 
 
 def find_file(filename, search_paths):
@@ -25,25 +116,174 @@ def find_file(filename, search_paths):
     return None
 
 
-def _snapshot():
-    """Return complete simulator state."""
-    if _sim is None:
-        return {"error": "Simulator not initialized"}
+def _session_id():
+    """Resolve the session / room ID from header, query string or JSON body."""
+    session_id = request.headers.get("X-Session-ID") or request.args.get("session")
+    if not session_id and request.is_json:
+        session_id = (request.get_json(silent=True) or {}).get("session")
+    return session_id or DEFAULT_SESSION_ID
 
-    return {
-        "plan": _sim.current_plan,
-        "phase": _sim.current_phase,
-        "steps": _sim.current_steps,
-        "procedure": _sim.current_procedure,
-        "violation": _sim.violation_occurred,
+
+def _get_session():
+    """Return ``(session, None)`` or ``(None, error_response)``."""
+    session_id = _session_id()
+    if not _SESSION_ID_RE.match(session_id):
+        return None, (jsonify({"error": f"Invalid session ID: {session_id!r}"}), 400)
+
+    session = _sessions.get(session_id)
+    if session is None and _store is not None:
+        session = _restore_session(session_id)
+    if session is None:
+        return None, (jsonify({"error": "Simulator not initialized", "session": session_id}), 400)
+    return session, None
+
+
+def _restore_session(session_id):
+    """Rebuild a session this process does not hold by replaying the shared store."""
+    with _restore_lock:
+        # Another request may have restored it while we waited
+        session = _sessions.get(session_id)
+        if session is not None:
+            return session
+
+        record = _store.load(session_id)
+        if record is None:
+            return None
+        procedure, ops = record
+
+        _, missing = _resource_paths()
+        if missing:
+            return None
+
+        def build():
+            return replay(_templates.clone(procedure), ops)
+
+        session = _sessions.create(session_id, build)
+        with session.lock:
+            session.validation_details = session.sim.get_validation_details()
+        print(f"Restored session {session_id} from store ({len(ops)} operations)")
+        return session
+
+
+def _record(session, op):
+    """Log a state mutation to the shared store (call with the session lock held)."""
+    if _store is not None:
+        _store.append(session.session_id, op)
+
+
+def _snapshot(session):
+    """Return complete simulator state for one session, cached per state version."""
+    sim = session.sim
+    key = (sim.state_version, session.validation_version)
+    if session.snapshot_cache is not None and session.snapshot_cache[0] == key:
+        return session.snapshot_cache[1]
+
+    started = time.perf_counter()
+    snapshot = {
+        "session": session.session_id,
+        "version": sim.state_version,
+        "plan": sim.current_plan,
+        "phase": sim.current_phase,
+        "steps": sim.current_steps,
+        "procedure": sim.current_procedure,
+        "violation": sim.violation_occurred,
         "timestamp": datetime.utcnow().isoformat() + "Z",
-        "validationDetails": _validation_details,
-        "ongoing": _sim.ongoing_procedure,
-        "availableProcedures": list(_sim.procedures.keys()) if _sim else []
+        # The SHACL text report is only sent on request, see _with_report()
+        "validationDetails": {k: v for k, v in session.validation_details.items() if k != "report"},
+        "ongoing": sim.ongoing_procedure,
+        "availableProcedures": list(sim.procedures.keys())
     }
+    session.snapshot_cache = (key, snapshot)
+    if ORSimulator.stage_observer is not None:
+        ORSimulator.stage_observer("snapshot", time.perf_counter() - started)
+    return snapshot
 
 
-@app.route('/')
+def _wants_report():
+    """True when the client asked for the full SHACL text report (``?report=1``)."""
+    value = request.args.get("report")
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get("report")
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def _with_report(session, snapshot):
+    """``snapshot`` plus the SHACL text report if the client asked for it."""
+    if session is None or not _wants_report():
+        return snapshot
+    details = dict(snapshot["validationDetails"], report=session.validation_details.get("report", ""))
+    return dict(snapshot, validationDetails=details)
+
+
+def _representation_etag(session, *parts):
+    """ETag of the current state as encoded for this request."""
+    media_type, coding = negotiate(request.accept_mimetypes, request.accept_encodings)
+    report = ("report",) if _wants_report() else ()
+    return session.etag(*parts, *report, variant_tag(media_type, coding))
+
+
+def _serialize(payload):
+    """Encode ``payload`` as negotiated: JSON or MessagePack, brotli / gzip above 1 KiB.
+
+    Timed as the "serialize" stage when metrics are enabled.
+    """
+    started = time.perf_counter()
+    media_type, coding = negotiate(request.accept_mimetypes, request.accept_encodings)
+    body, coding = compress(encode(payload, media_type), coding)
+
+    response = Response(body, content_type=media_type)
+    if coding is not None:
+        response.headers["Content-Encoding"] = coding
+    response.vary.update(("Accept", "Accept-Encoding"))
+
+    observer = ORSimulator.stage_observer
+    if observer is not None:
+        observer("serialize", time.perf_counter() - started)
+    return response
+
+
+def _conditional_response(payload, etag):
+    """Negotiated response carrying ``etag``; 304 when the client already has it."""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.vary.update(("Accept", "Accept-Encoding"))
+    else:
+        response = _serialize(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _publish(session, snapshot):
+    """Push a state change to every event stream watching the session."""
+    _sessions.events.publish(session.session_id, "state", snapshot)
+    if snapshot["violation"]:
+        _violating_states.inc()
+        _sessions.events.publish(session.session_id, "violation", snapshot["validationDetails"])
+
+
+@api.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@api.after_app_request
+def _record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        _request_latency.observe(time.perf_counter() - started, request.method, route)
+        _requests_total.inc(request.method, route, str(response.status_code))
+    return response
+
+
+@api.route('/metrics', methods=['GET'])
+def api_metrics():
+    """Prometheus metrics of this process."""
+    return Response(_metrics.render(), mimetype=None, content_type=MetricsRegistry.CONTENT_TYPE)
+
+
+@api.route('/')
 def index():
     """Serve the main page."""
     web_path = os.path.join(os.path.dirname(__file__), 'web', 'index.html')
@@ -57,14 +297,8 @@ def index():
             return f"Error: index.html not found. Looked in {web_path} and {current_dir_path}", 404
 
 
-@app.route('/init', methods=['POST'])
-def api_init():
-    """Initialize the simulator."""
-    global _sim, _validation_details
-
-    data = request.get_json() or {}
-    initial_procedure = data.get('procedure', 'LegoAssembly')
-
+def _resource_paths():
+    """Locate the ontology, SHACL shapes and sensor data; ``(paths, missing)``."""
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
     ontology_path = find_file('twin_or_2_aligned.owl', [
@@ -91,31 +325,113 @@ def api_init():
         'sensor_data.json'
     ])
 
-    if not all([ontology_path, shacl_path, sensor_path]):
-        missing = []
-        if not ontology_path: missing.append("ontology")
-        if not shacl_path: missing.append("SHACL constraints")
-        if not sensor_path: missing.append("sensor data")
+    missing = []
+    if not ontology_path: missing.append("ontology")
+    if not shacl_path: missing.append("SHACL constraints")
+    if not sensor_path: missing.append("sensor data")
+    return (ontology_path, shacl_path, sensor_path), missing
+
+
+def _build_template(procedure):
+    """Construct and validate the simulator that sessions of ``procedure`` are cloned from."""
+    paths, missing = _resource_paths()
+    if missing:
+        raise FileNotFoundError(f"Missing files: {', '.join(missing)}")
+    ontology_path, shacl_path, sensor_path = paths
+
+    sim = ORSimulator(
+        ontology_path,
+        shacl_path,
+        sensor_path,
+        show_validation_report=True,
+        initial_procedure=procedure,
+        reasoner=os.environ.get("OR_TWIN_REASONER") or None,
+        imports=os.environ.get("OR_TWIN_RESOLVE_IMPORTS", "0") != "0",
+    )
+    sim.validate_current_state_with_shacl()
+    return sim
+
+
+_procedure_names_cache = {}
+
+
+def _procedure_names():
+    """Procedures defined in the sensor data, read once per file."""
+    (_, _, sensor_path), _ = _resource_paths()
+    if not sensor_path:
+        raise FileNotFoundError("Missing files: sensor data")
+    names = _procedure_names_cache.get(sensor_path)
+    if names is None:
+        with open(sensor_path, encoding="utf-8") as fp:
+            names = frozenset(json.load(fp).get("procedures", {}))
+        _procedure_names_cache[sensor_path] = names
+    return names
+
+
+_templates = SimulatorTemplates(_build_template, procedures=_procedure_names)
+
+
+def _warm_templates():
+    """Build the templates of every procedure so the first /init is a clone too."""
+    try:
+        default = _templates.get("LegoAssembly")
+        _templates.warm(default.procedures)
+    except Exception as e:
+        print(f"Template warm-up failed: {e}")
+        traceback.print_exc()
+
+
+def _initialize_session(session_id, initial_procedure, job=None):
+    """Install a clone of the procedure's template; returns the initial snapshot."""
+    def build():
+        if job is not None and initial_procedure not in _templates:
+            job.report(0.1, "building procedure template")
+        sim = _templates.clone(initial_procedure)
+        if job is not None:
+            job.check_cancelled()
+        return sim
+
+    session = _sessions.create(session_id, build)
+    if _store is not None:
+        _store.reset(session_id, initial_procedure)
+
+    with session.lock:
+        # The template was validated when it was built
+        session.validation_details = session.sim.get_validation_details()
+        snapshot = _snapshot(session)
+
+    _publish(session, snapshot)
+    return snapshot
+
+
+@api.route('/init', methods=['POST'])
+def api_init():
+    """Initialize the simulator for a session.
+
+    With ``"async": true`` the work runs as a background job and the
+    response is 202 with the job to poll.
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = _session_id()
+    if not _SESSION_ID_RE.match(session_id):
+        return jsonify({"error": f"Invalid session ID: {session_id!r}"}), 400
+
+    initial_procedure = data.get('procedure', 'LegoAssembly')
+
+    _, missing = _resource_paths()
+    if missing:
         return jsonify({"error": f"Missing files: {', '.join(missing)}"}), 400
 
+    if initial_procedure not in _procedure_names():
+        return jsonify({"error": f"Unknown procedure: {initial_procedure}"}), 400
+
+    if data.get('async'):
+        return _submit_job(session_id, "init", {"procedure": initial_procedure},
+                           lambda job: _initialize_session(session_id, initial_procedure, job))
+
     try:
-        with _sim_lock:
-            _sim = ORSimulator(
-                ontology_path,
-                shacl_path,
-                sensor_path,
-                show_validation_report=True,
-                initial_procedure=initial_procedure
-            )
-
-            conforms = _sim.validate_current_state_with_shacl()
-            _validation_details = _sim.get_validation_details() if hasattr(_sim, 'get_validation_details') else {
-                "conforms": conforms,
-                "violations": [],
-                "report": "Initial state valid" if conforms else "Initial validation failed"
-            }
-
-        return jsonify(_snapshot())
+        snapshot = _initialize_session(session_id, initial_procedure)
+        return _serialize(_with_report(_sessions.get(session_id), snapshot))
 
     except Exception as e:
         print(f"Error initializing: {e}")
@@ -123,174 +439,630 @@ def api_init():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/switch-procedure', methods=['POST'])
+@api.route('/switch-procedure', methods=['POST'])
 def api_switch_procedure():
     """Switch to a different procedure."""
-    global _validation_details
+    session, error = _get_session()
+    if error:
+        return error
 
-    if _sim is None:
-        return jsonify({"error": "Simulator not initialized"}), 400
-
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     procedure = data.get('procedure')
 
     if not procedure:
         return jsonify({"error": "No procedure specified"}), 400
 
     try:
-        with _sim_lock:
-            if _sim.switch_procedure(procedure):
-                conforms = _sim.validate_current_state_with_shacl()
-                _validation_details = _sim.get_validation_details() if hasattr(_sim, 'get_validation_details') else {
+        with session.lock:
+            sim = session.sim
+            if sim.switch_procedure(procedure):
+                conforms = sim.validate_current_state_with_shacl()
+                _record(session, {"op": "switch", "procedure": procedure})
+                session.validation_details = sim.get_validation_details() if hasattr(sim, 'get_validation_details') else {
                     "conforms": conforms,
                     "violations": [],
                     "report": ""
                 }
-                return jsonify(_snapshot())
+                snapshot = _snapshot(session)
             else:
                 return jsonify({"error": f"Unknown procedure: {procedure}"}), 400
 
+        _publish(session, snapshot)
+        return _serialize(_with_report(session, snapshot))
+
     except Exception as e:
         print(f"Error switching procedure: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/step', methods=['POST'])
+def _step(session):
+    """Run one step under the session lock and publish the resulting state."""
+    with session.lock:
+        sim = session.sim
+        sim.execute_step()
+        _record(session, {"op": "step"})
+        session.validation_details = sim.get_validation_details()
+        snapshot = _snapshot(session)
+
+    _publish(session, snapshot)
+    return snapshot
+
+
+@api.route('/step', methods=['POST'])
 def api_step():
     """Execute one simulation step."""
-    global _validation_details
+    session, error = _get_session()
+    if error:
+        return error
+
+    try:
+        snapshot = _step(session)
+        return _serialize(_with_report(session, snapshot))
 
-    if _sim is None:
-        return jsonify({"error": "Simulator not initialized"}), 400
+    except Exception as e:
+        print(f"Error in step: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
+
+def _parse_run_request(data):
+    """Validate /run parameters; returns ``(params, error_response)``."""
+    until = data.get('until', 'steps')
+    max_steps = data.get('steps')
+
+    if until not in ('steps', 'violation', 'end'):
+        return None, (jsonify({"error": f"Unknown run mode: {until}"}), 400)
     try:
-        with _sim_lock:
-            _sim.simulate_robotic_sensor_output_and_update_ontology()
-
-            
-            conforms = _sim.validate_current_state_with_shacl()
-            _validation_details = _sim.get_validation_details() if hasattr(_sim, 'get_validation_details') else {
-                "conforms": conforms,
-                "violations": [],
-                "report": ""
-            }
-
-            if 'violations' in _validation_details:
-                for violation in _validation_details['violations']:
-                    focus_node = violation.get('focusNode', '')
-                    if hasattr(_sim, 'sensor_data') and focus_node in _sim.sensor_data:
-                        violation['sensor_message'] = _sim.sensor_data[focus_node].get('message', '')
-
-            _sim.violation_occurred = not conforms
-
-            if conforms:
-                next_steps = _sim.get_next_steps()
-                if next_steps:
-                    _sim.current_steps = next_steps
-                else:
-                    if not _sim.advance_to_next_phase():
-                        _sim.ongoing_procedure = False
+        max_steps = int(max_steps) if max_steps is not None else None
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "'steps' must be an integer"}), 400)
+    if max_steps is not None and max_steps < 1:
+        return None, (jsonify({"error": "'steps' must be at least 1"}), 400)
+    if until == 'steps' and max_steps is None:
+        # One step by default, whether the run is synchronous or a job
+        max_steps = 1
+
+    return {
+        "until": until,
+        "steps": max_steps,
+        "validate": bool(data.get('validate', True)),
+        "continueOnViolation": bool(data.get('continueOnViolation', False)),
+    }, None
+
+
+def _run_session(session, params, job=None):
+    """Run steps for /run. Without a job this is one locked loop; a job steps
+    one at a time, releasing the lock between steps and reporting progress."""
+    sim = session.sim
+    options = dict(until=params["until"], validate=params["validate"],
+                   force_advance=params["continueOnViolation"])
+    op = {"op": "step", "validate": params["validate"], "forceAdvance": params["continueOnViolation"]}
+
+    if job is None:
+        with session.lock:
+            result = sim.run_steps(params["steps"], **options)
+            if result["executed"]:
+                _record(session, dict(op, count=result["executed"]))
+    else:
+        max_steps = params["steps"]
+        summary, stopped_by = [], None
+        while stopped_by is None:
+            job.check_cancelled()
+            with session.lock:
+                chunk = sim.run_steps(1, **options)
+                if chunk["executed"]:
+                    _record(session, dict(op, count=chunk["executed"]))
+                sequence_length = len(STEP_SEQUENCES.get(sim.current_procedure, [])) or 1
+                counter = sim.step_counter
+            summary.extend(chunk["summary"])
+
+            if chunk["stoppedBy"] in ("end", "violation", "limit") or not chunk["executed"]:
+                stopped_by = chunk["stoppedBy"]
+            elif max_steps is not None and len(summary) >= max_steps:
+                stopped_by = "steps"
+
+            done = len(summary) / max_steps if max_steps else counter / sequence_length
+            job.report(done, f"{len(summary)} steps executed")
+        result = {"executed": len(summary), "stoppedBy": stopped_by, "summary": summary}
+
+    with session.lock:
+        session.validation_details = sim.get_validation_details()
+        snapshot = _snapshot(session)
+
+    _publish(session, snapshot)
+    result["state"] = snapshot
+    return result
+
+
+@api.route('/run', methods=['POST'])
+def api_run():
+    """Advance several steps in one server-side loop.
+
+    Body: ``{"steps": K}`` runs K steps, ``{"until": "violation"}`` runs to the
+    next violation and ``{"until": "end"}`` runs to the end of the procedure.
+    Returns a per-step summary plus one final snapshot, or 202 and a job with
+    ``"async": true``.
+    """
+    session, error = _get_session()
+    if error:
+        return error
 
-        return jsonify(_snapshot())
+    data = request.get_json(silent=True) or {}
+    params, error = _parse_run_request(data)
+    if error:
+        return error
+
+    if data.get('async'):
+        return _submit_job(session.session_id, "run", params,
+                           lambda job: _run_session(session, params, job))
+
+    try:
+        result = _run_session(session, params)
+        result["state"] = _with_report(session, result["state"])
+        return _serialize(result)
 
     except Exception as e:
-        print(f"Error in step: {e}")
+        print(f"Error in run: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/state', methods=['GET'])
+def _validate_session(session, job=None):
+    """Re-run SHACL validation on the session's current state."""
+    with session.lock:
+        sim = session.sim
+        conforms = sim.validate_current_state_with_shacl()
+        _record(session, {"op": "validate"})
+        session.validation_details = sim.get_validation_details()
+        snapshot = _snapshot(session)
+
+    _publish(session, snapshot)
+    return {"conforms": conforms, "violations": len(session.validation_details["violations"])}
+
+
+def _submit_job(session_id, kind, params, fn):
+    """Queue background work and answer 202 with the job's status URL."""
+    try:
+        job = _jobs.submit(session_id, kind, fn, params)
+    except JobLimitError as e:
+        return jsonify({"error": str(e)}), 429
+
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.job_id}"
+    return response
+
+
+@api.route('/jobs', methods=['POST'])
+def api_submit_job():
+    """Start a background job: ``{"type": "init" | "validate" | "run", ...}``."""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('type')
+    session_id = _session_id()
+    if not _SESSION_ID_RE.match(session_id):
+        return jsonify({"error": f"Invalid session ID: {session_id!r}"}), 400
+
+    if kind == 'init':
+        _, missing = _resource_paths()
+        if missing:
+            return jsonify({"error": f"Missing files: {', '.join(missing)}"}), 400
+        procedure = data.get('procedure', 'LegoAssembly')
+        if procedure not in _procedure_names():
+            return jsonify({"error": f"Unknown procedure: {procedure}"}), 400
+        return _submit_job(session_id, kind, {"procedure": procedure},
+                           lambda job: _initialize_session(session_id, procedure, job))
+
+    if kind not in ('validate', 'run'):
+        return jsonify({"error": f"Unknown job type: {kind}"}), 400
+
+    session, error = _get_session()
+    if error:
+        return error
+
+    if kind == 'validate':
+        return _submit_job(session_id, kind, {}, lambda job: _validate_session(session, job))
+
+    params, error = _parse_run_request(data)
+    if error:
+        return error
+    return _submit_job(session_id, kind, params, lambda job: _run_session(session, params, job))
+
+
+@api.route('/jobs', methods=['GET'])
+def api_list_jobs():
+    """List jobs, optionally only those of the requesting session."""
+    session_id = request.headers.get("X-Session-ID") or request.args.get("session")
+    return jsonify({"jobs": [job.to_dict() for job in _jobs.jobs(session_id)]})
+
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    """Poll a job's status, progress and result."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+
+@api.route('/jobs/<job_id>', methods=['DELETE'])
+def api_cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next checkpoint."""
+    job = _jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+
+@api.route('/jobs/<job_id>/events', methods=['GET'])
+def api_job_events(job_id):
+    """Server-Sent Events stream of one job's progress, closed when it finishes."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+
+    subscription = _job_events.subscribe(job_id)
+
+    def stream():
+        try:
+            payload = job.to_dict()
+            yield format_sse("job", payload)
+            while payload["status"] in ("queued", "running"):
+                try:
+                    _, payload = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    payload = job.to_dict()
+                    continue
+                yield format_sse("job", payload)
+        finally:
+            _job_events.unsubscribe(job_id, subscription)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@api.route('/state', methods=['GET'])
 def api_state():
     """Get current state."""
-    if _sim is None:
-        return jsonify({"error": "Simulator not initialized"}), 400
-    return jsonify(_snapshot())
+    session, error = _get_session()
+    if error:
+        return error
+
+    with session.lock:
+        etag = _representation_etag(session)
+        if request.if_none_match.contains(etag):
+            return _conditional_response(None, etag)
+        snapshot = _with_report(session, _snapshot(session))
+
+    return _conditional_response(snapshot, etag)
+
+
+@api.route('/briefing', methods=['GET'])
+def api_briefing():
+    """Everything the current steps need, answering every /question category at once."""
+    session, error = _get_session()
+    if error:
+        return error
+
+    sim = session.sim
+    with session.lock:
+        etag = _representation_etag(session, "briefing")
+        if request.if_none_match.contains(etag):
+            return _conditional_response(None, etag)
+        payload = {
+            "session": session.session_id,
+            "version": sim.state_version,
+            "procedure": sim.current_procedure,
+            "phase": sim.current_phase,
+            "steps": sim.current_steps,
+            **sim.get_briefing()
+        }
+
+    return _conditional_response(payload, etag)
+
+
+@api.route('/events', methods=['GET'])
+def api_events():
+    """Server-Sent Events stream of state and violation changes for a session."""
+    session_id = _session_id()
+    if not _SESSION_ID_RE.match(session_id):
+        return jsonify({"error": f"Invalid session ID: {session_id!r}"}), 400
+
+    subscription = _sessions.events.subscribe(session_id)
+
+    def stream():
+        try:
+            session = _sessions.get(session_id)
+            if session is not None:
+                with session.lock:
+                    snapshot = _snapshot(session)
+                yield format_sse("snapshot", snapshot)
+
+            while True:
+                try:
+                    event, data = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            _sessions.events.unsubscribe(session_id, subscription)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+def _autoplay_loop(session_id, stop, interval):
+    """Step a session every ``interval`` seconds until stopped, finished or violated."""
+    try:
+        while not stop.wait(interval):
+            session = _sessions.get(session_id)
+            if session is None or not session.sim.ongoing_procedure:
+                break
+            snapshot = _step(session)
+            if snapshot["violation"] or not snapshot["ongoing"]:
+                break
+    except Exception as e:
+        print(f"Autoplay error: {e}")
+        traceback.print_exc()
+    finally:
+        with _autoplay_lock:
+            if _autoplay.get(session_id) is stop:
+                del _autoplay[session_id]
+        _sessions.events.publish(session_id, "autoplay", {"running": False})
+
+
+@api.route('/autoplay', methods=['POST'])
+def api_autoplay():
+    """Start or stop server-side stepping; state changes arrive over /events."""
+    session, error = _get_session()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    action = data.get('action', 'start')
+    try:
+        interval = float(data.get('interval', 2.0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'interval' must be a number of seconds"}), 400
+    if not math.isfinite(interval):
+        return jsonify({"error": "'interval' must be a number of seconds"}), 400
+    interval = min(max(interval, AUTOPLAY_MIN_INTERVAL), AUTOPLAY_MAX_INTERVAL)
+
+    with _autoplay_lock:
+        stop = _autoplay.pop(session.session_id, None)
+        if stop is not None:
+            stop.set()
+
+        if action == 'start':
+            stop = Event()
+            _autoplay[session.session_id] = stop
+            Thread(target=_autoplay_loop, args=(session.session_id, stop, interval), daemon=True).start()
+        elif action != 'stop':
+            return jsonify({"error": f"Unknown autoplay action: {action}"}), 400
+
+    running = action == 'start'
+    _sessions.events.publish(session.session_id, "autoplay", {"running": running})
+    return jsonify({"session": session.session_id, "running": running, "interval": interval})
+
+
+@api.route('/sessions', methods=['GET'])
+def api_sessions():
+    """List the live sessions / rooms.
 
+    Each room is read under its own lock, waited for at most
+    ``SESSION_LIST_LOCK_TIMEOUT`` seconds; a room busy for longer (a long
+    /run, say) is listed with ``"busy": true`` and no state.
+    """
+    sessions = []
+    for session in _sessions.sessions():
+        if not session.lock.acquire(timeout=SESSION_LIST_LOCK_TIMEOUT):
+            sessions.append({"session": session.session_id, "busy": True})
+            continue
+        try:
+            sim = session.sim
+            sessions.append({
+                "session": session.session_id,
+                "procedure": sim.current_procedure,
+                "phase": sim.current_phase,
+                "steps": list(sim.current_steps),
+                "violation": sim.violation_occurred,
+                "triples": session.triple_count(),
+                "queryCache": sim.query_cache.stats(),
+            })
+        finally:
+            session.lock.release()
+    payload = {"sessions": sessions, "maxSessions": _sessions.max_sessions}
+    if _store is not None:
+        # Rooms held by other worker processes are only visible through the store
+        payload["stored"] = _store.session_ids()
+    return jsonify(payload)
 
-@app.route('/question', methods=['POST'])
+
+@api.route('/session', methods=['DELETE'])
+def api_delete_session():
+    """Drop a session and free its simulator."""
+    session_id = _session_id()
+    stored = _store.delete(session_id) if _store is not None else False
+    if not _sessions.remove(session_id) and not stored:
+        return jsonify({"error": f"Unknown session: {session_id}"}), 404
+    return jsonify({"session": session_id, "deleted": True})
+
+
+@api.route('/allocation', methods=['POST'])
+def api_allocation():
+    """Assign actors and instruments to upcoming steps by capability.
+
+    With ``"allSessions": true`` the current steps of every live room compete
+    for the requesting session's actor and instrument pool.
+    """
+    session, error = _get_session()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    try:
+        lookahead = int(data.get('lookahead', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'lookahead' must be an integer"}), 400
+    if lookahead < 0:
+        return jsonify({"error": "'lookahead' must not be negative"}), 400
+
+    try:
+        demands = None
+        if data.get('allSessions'):
+            demands = {}
+            # Collect under each room's own lock; never hold two locks at once
+            for other in _sessions.sessions():
+                with other.lock:
+                    for step_id, need in other.sim.resource_demands(lookahead).items():
+                        demands[(other.session_id, step_id)] = need
+
+        with session.lock:
+            plan = session.sim.plan_allocation(lookahead, demands)
+
+        label = (lambda d: f"{d[0]}/{d[1]}") if demands is not None else str
+        return jsonify(describe_plan(plan, label))
+
+    except Exception as e:
+        print(f"Allocation error: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/sparql', methods=['GET', 'POST'])
+def api_sparql():
+    """Read-only SPARQL over the session graph, cached until its predicates change.
+
+    The query comes from ``?query=``, a form field, an
+    ``application/sparql-query`` body or a JSON ``query`` key. ``maxRows``
+    (the page size) and ``timeout`` may lower (but not raise) the server
+    limits. Pass a response's ``next`` back as ``cursor`` for the next page.
+    """
+    session, error = _get_session()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    query = request.values.get('query') or data.get('query')
+    if query is None and request.mimetype == 'application/sparql-query':
+        query = request.get_data(as_text=True)
+    if not query:
+        return jsonify({"error": "No query given"}), 400
+
+    try:
+        max_rows, timeout = _sparql.limits(
+            request.values.get('maxRows', data.get('maxRows')),
+            request.values.get('timeout', data.get('timeout')),
+        )
+        normalized = normalize_query(query)
+        sim = session.sim
+
+        offset, cursor_version = 0, None
+        cursor = request.values.get('cursor', data.get('cursor'))
+        if cursor:
+            offset, cursor_version = decode_cursor(cursor, normalized)
+
+        def check_cursor():
+            if cursor_version is None:
+                return
+            predicates = query_predicates(_sparql.prepare(normalized).algebra)
+            if sim.changed_since(cursor_version, predicates):
+                raise SparqlError("The query's predicates changed since the first page; "
+                                  "start again without a cursor", 409)
+
+        check_cursor()
+        graph_version = sim.graph_version
+        payload = _sparql.cached(sim.query_cache, normalized, max_rows, offset)
+        cache = "hit"
+        if payload is None:
+            cache = "miss"
+            # Parse outside the room lock; only evaluation needs it
+            _sparql.prepare(normalized)
+            with session.lock:
+                check_cursor()
+                graph_version = sim.graph_version
+                payload = _sparql.execute(sim.or_graph, sim.query_cache, normalized, max_rows, timeout, offset)
+        payload = _sparql.with_cursor(payload, normalized, offset, graph_version)
+
+    except SparqlTimeout as e:
+        _sparql_queries.inc("timeout")
+        return jsonify({"error": str(e), "timeout": True}), e.status
+    except SparqlError as e:
+        _sparql_queries.inc("error")
+        return jsonify({"error": str(e)}), e.status
+
+    _sparql_queries.inc(cache)
+    response = _serialize(payload)
+    response.headers["X-Cache"] = cache.upper()
+    return response
+
+
+# question keyword -> (step lookup category, answer prefix, empty answer). Categories
+# held by the requirements index are answered from it, the others through the
+# simulator's cached step queries.
+QUESTION_CATEGORIES = [
+    ("instrument", "instruments",
+     "Instruments needed", "No specific instruments required for current steps"),
+    ("actor", "actors",
+     "Actors required", "No specific actors identified"),
+    ("tissue", "tissues",
+     "Target tissues", "No target tissues specified"),
+    ("capability", "capabilities",
+     "Required capabilities", "Standard capabilities sufficient"),
+    ("material", "materials",
+     "Materials used", "No specific materials used"),
+]
+
+
+@api.route('/question', methods=['GET', 'POST'])
 def api_question():
     """Handle questions about the procedure."""
-    if _sim is None:
-        return jsonify({"error": "Simulator not initialized"}), 400
+    session, error = _get_session()
+    if error:
+        return error
 
-    data = request.get_json() or {}
-    question_type = data.get('question', '')
+    if request.method == 'GET':
+        question_type = request.args.get('question', '')
+    else:
+        question_type = (request.get_json(silent=True) or {}).get('question', '')
 
     try:
-        answer = "I can help with questions about instruments, actors, tissues, and capabilities."
-
-        from ontology_utils import query_result_to_list
-
-        if "instrument" in question_type:
-            if hasattr(queries, 'get_instruments_for_steps'):
-                query = queries.get_instruments_for_steps(_sim.current_steps)
-                result = _sim.or_graph.query(query)
-                instruments = []
-                for row in result:
-                    if row[0]:  
-                        label = str(row[0]).split('/')[-1]  
-                        instruments.append(label)
-
-                if instruments:
-                    answer = f"Instruments needed: {', '.join(instruments)}"
-                else:
-                    answer = "No specific instruments required for current steps"
-            else:
-                answer = "Instrument query not available"
-
-        elif "actor" in question_type:
-            if hasattr(queries, 'get_actors_for_steps'):
-                query = queries.get_actors_for_steps(_sim.current_steps)
-                result = _sim.or_graph.query(query)
-                actors = []
-                for row in result:
-                    if row[0]:
-                        label = str(row[0]).split('/')[-1]
-                        actors.append(label)
-
-                if actors:
-                    answer = f"Actors required: {', '.join(actors)}"
-                else:
-                    answer = "No specific actors identified"
-            else:
-                answer = "Actor query not available"
-
-        elif "tissue" in question_type:
-            if hasattr(queries, 'get_target_tissues_for_steps'):
-                query = queries.get_target_tissues_for_steps(_sim.current_steps)
-                result = _sim.or_graph.query(query)
-                tissues = []
-                for row in result:
-                    if row[0]:
-                        label = str(row[0]).split('/')[-1]
-                        tissues.append(label)
-
-                if tissues:
-                    answer = f"Target tissues: {', '.join(tissues)}"
-                else:
-                    answer = "No target tissues specified"
-            else:
-                answer = "Tissue query not available"
-
-        elif "capability" in question_type:
-            if hasattr(queries, 'get_capabilities_for_steps'):
-                query = queries.get_capabilities_for_steps(_sim.current_steps)
-                result = _sim.or_graph.query(query)
-                capabilities = []
-                for row in result:
-                    if row[0]:
-                        label = str(row[0]).split('/')[-1]
-                        capabilities.append(label)
-
-                if capabilities:
-                    answer = f"Required capabilities: {', '.join(capabilities)}"
+        sim = session.sim
+        with session.lock:
+            etag = _representation_etag(session, "q", hashlib.sha1(question_type.encode("utf-8")).hexdigest()[:12])
+            if request.if_none_match.contains(etag):
+                return _conditional_response(None, etag)
+
+            version, answers = session.answer_cache
+            if version != sim.state_version:
+                answers = {}
+                session.answer_cache = (sim.state_version, answers)
+            if question_type in answers:
+                return _conditional_response({"answer": answers[question_type]}, etag)
+
+            answer = "I can help with questions about instruments, actors, tissues, and capabilities."
+
+            for keyword, category, prefix, empty_answer in QUESTION_CATEGORIES:
+                if keyword not in question_type:
+                    continue
+
+                if category in REQUIREMENT_PREDICATES:
+                    labels = sim.get_requirements(category)
                 else:
-                    answer = "Standard capabilities sufficient"
-            else:
-                answer = "Capability query not available"
+                    labels = list(dict.fromkeys(get_label_from_uri(result) for result in sim.step_query(category)))
 
-        return jsonify({"answer": answer})
+                answer = f"{prefix}: {', '.join(labels)}" if labels else empty_answer
+                break
+
+            answers[question_type] = answer
+
+        return _conditional_response({"answer": answer}, etag)
 
     except Exception as e:
         print(f"Question error: {e}")
@@ -298,6 +1070,51 @@ def api_question():
         return jsonify({"error": str(e)}), 500
 
 
+def create_app(session_store=None, warm_start=True, metrics=True):
+    """Build the Flask application.
+
+    ``session_store`` is the path of an SQLite session store shared by the
+    worker processes of ``serve.py``; without it sessions live only in this
+    process. ``warm_start`` builds the procedure templates in the background
+    so that /init only clones. ``metrics`` turns on the stage and lock-wait
+    timing reported by ``/metrics``; route latency is always recorded.
+    """
+    global _store
+    if session_store:
+        _store = SessionStore(session_store)
+
+    if metrics:
+        ORSimulator.stage_observer = _observe_stage
+        TimedLock.observer = _lock_wait.observe
+
+    if warm_start:
+        Thread(target=_warm_templates, daemon=True).start()
+
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(api)
+    return app
+
+
+_app = None
+
+
+def get_app():
+    """The application configured from ``OR_TWIN_*`` variables, built on first call.
+
+    Importing this module builds nothing, so ``serve.py`` workers that call
+    ``create_app`` get exactly one store, manager and warm-up thread.
+    """
+    global _app
+    if _app is None:
+        _app = create_app(
+            os.environ.get("OR_TWIN_SESSION_STORE"),
+            warm_start=os.environ.get("OR_TWIN_WARM_START", "1") != "0",
+            metrics=os.environ.get("OR_TWIN_METRICS", "1") != "0",
+        )
+    return _app
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("OR Digital Twin Web Server")
@@ -307,6 +1124,7 @@ if __name__ == '__main__':
     print("Access the application at:")
     print("  http://localhost:5000/")
     print("")
+    print("Development server only; use serve.py for multi-worker serving.")
     print("=" * 60)
 
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    get_app().run(host='0.0.0.0', port=5000, debug=True)
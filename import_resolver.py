@@ -0,0 +1,84 @@
+# import_resolver.py
+"""
+``owl:imports`` resolved against the local ontology catalog, offline.
+
+``ontologies/catalog.json`` maps ontology IRIs to files in that folder.
+IRIs are matched without a trailing ``#``. A ``file:`` IRI resolves to its
+path if that exists, and otherwise to the catalog file with the same name.
+That covers alignments written on another machine, whose ``hi.ttl`` import
+names that machine's checkout. Anything else stays unresolved: nothing is
+fetched from the network.
+
+Every import is parsed through ``parse_cached``, so all sessions share one
+parsed copy per file version.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from rdflib import Graph, OWL, URIRef
+from rdflib.util import guess_format
+
+from ontology_utils import logger, parse_cached
+
+DEFAULT_CATALOG = Path(__file__).resolve().parent / "ontologies" / "catalog.json"
+
+
+def _key(iri) -> str:
+    return str(iri).rstrip("#")
+
+
+class ImportResolver:
+    """Maps ``owl:imports`` IRIs to local files and collects import closures."""
+
+    def __init__(self, catalog_path: Path = DEFAULT_CATALOG) -> None:
+        with open(catalog_path, encoding="utf-8") as fp:
+            catalog = json.load(fp)
+        folder = Path(catalog_path).resolve().parent
+        self._paths: Dict[str, Path] = {
+            _key(iri): folder / name for iri, name in catalog.get("imports", {}).items()
+        }
+        self._by_name: Dict[str, Path] = {path.name: path for path in self._paths.values()}
+
+    def resolve(self, iri) -> Optional[Path]:
+        """Local file for ``iri``, or None if it is not in the catalog."""
+        path = self._paths.get(_key(iri))
+        if path is not None:
+            return path
+        parsed = urlparse(str(iri))
+        if parsed.scheme == "file":
+            local = Path(unquote(parsed.path))
+            if local.is_file():
+                return local
+            # Windows paths arrive as /C:/...; only the file name matters here
+            return self._by_name.get(unquote(parsed.path).replace("\\", "/").rsplit("/", 1)[-1])
+        return None
+
+    def closure(self, graph: Graph) -> Tuple[Dict[str, Tuple[Path, Graph]], List[str]]:
+        """Transitive imports of ``graph``: IRI -> (file, shared parsed graph), and the unresolved IRIs.
+
+        The graphs come from ``parse_cached`` and must not be modified.
+        """
+        resolved: Dict[str, Tuple[Path, Graph]] = {}
+        unresolved: List[str] = []
+        seen, loaded = set(), set()
+        pending = list(graph.objects(None, OWL.imports))
+        while pending:
+            iri = pending.pop(0)
+            if not isinstance(iri, URIRef) or _key(iri) in seen:
+                continue
+            seen.add(_key(iri))
+            path = self.resolve(iri)
+            if path is None or not path.is_file():
+                unresolved.append(str(iri))
+                continue
+            if path in loaded:
+                continue
+            loaded.add(path)
+            imported = parse_cached(str(path), guess_format(str(path)))
+            resolved[str(iri)] = (path, imported)
+            pending.extend(imported.objects(None, OWL.imports))
+        if unresolved:
+            logger.warning(f"Unresolved owl:imports (not fetched): {', '.join(unresolved)}")
+        return resolved, unresolved
@@ -0,0 +1,167 @@
+# jobs.py
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Callable, Dict, List, Optional
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job has been cancelled."""
+
+
+class JobLimitError(Exception):
+    """Raised when a session already has its maximum number of active jobs."""
+
+
+class Job:
+    """A unit of background work with progress, result and cooperative cancellation."""
+
+    def __init__(self, session_id: str, kind: str, params: dict) -> None:
+        self.job_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self._cancel = Event()
+        self._future = None
+        self._on_update: Callable[["Job"], None] = lambda job: None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        """Call between units of work; raises JobCancelled once cancel() was requested."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report(self, progress: float, message: str = "") -> None:
+        """Record progress in [0, 1] and notify subscribers."""
+        self.progress = max(0.0, min(1.0, progress))
+        self.message = message
+        self._on_update(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "job": self.job_id,
+            "session": self.session_id,
+            "type": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool with a per-session cap on active jobs."""
+
+    def __init__(
+            self,
+            *,
+            max_workers: int = 4,
+            max_jobs_per_session: int = 2,
+            max_finished: int = 256,
+            on_update: Optional[Callable[[Job], None]] = None
+    ) -> None:
+        self.max_jobs_per_session = max_jobs_per_session
+        self.max_finished = max_finished
+        self.on_update = on_update or (lambda job: None)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="or-twin-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = Lock()
+
+    def submit(self, session_id: str, kind: str, fn: Callable[[Job], object], params: Optional[dict] = None) -> Job:
+        """Queue ``fn(job)``; its return value becomes the job result."""
+        job = Job(session_id, kind, params or {})
+        job._on_update = self.on_update
+
+        with self._lock:
+            active = sum(
+                1 for j in self._jobs.values()
+                if j.session_id == session_id and j.status in ACTIVE_STATES
+            )
+            if active >= self.max_jobs_per_session:
+                raise JobLimitError(
+                    f"Session {session_id} already has {active} active jobs "
+                    f"(limit {self.max_jobs_per_session})"
+                )
+            self._jobs[job.job_id] = job
+            self._prune()
+
+        job._future = self._executor.submit(self._run, job, fn)
+        self.on_update(job)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], object]) -> None:
+        if job.cancelled:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            self.on_update(job)
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        self.on_update(job)
+
+        try:
+            job.result = fn(job)
+            job.status = "succeeded"
+            job.progress = 1.0
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            self.on_update(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, session_id: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if session_id is not None:
+            jobs = [j for j in jobs if j.session_id == session_id]
+        return jobs
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job outright or ask a running one to stop at its next check."""
+        job = self.get(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return job
+
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            self.on_update(job)
+        return job
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond ``max_finished`` (lock held)."""
+        finished = [j for j in self._jobs.values() if j.status not in ACTIVE_STATES]
+        if len(finished) > self.max_finished:
+            finished.sort(key=lambda j: j.finished_at or 0.0)
+            for job in finished[:len(finished) - self.max_finished]:
+                del self._jobs[job.job_id]
@@ -1,10 +1,17 @@
 from rdflib import Graph, Literal, Namespace, URIRef
 from owlready2 import get_ontology, sync_reasoner_pellet, default_world
+import owlrl
 from rdflib.namespace import XSD, RDF, RDFS, OWL
 from pathlib import Path
+from functools import lru_cache
+from typing import Optional, Tuple
+import hashlib
 import logging
+import time
 import platform
 import os
+import tempfile
+from threading import Lock
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +21,213 @@ OR = Namespace("http://www.semanticweb.org/Twin_OR/")
 HI = Namespace("http://www.semanticweb.org/vbr240/ontologies/2022/4/untitled-ontology-51/")
 PROV = Namespace("http://www.w3.org/ns/prov#")
 
+# (absolute path, format, mtime, size) -> parsed graph, shared read-only
+_PARSE_CACHE = {}
+_PARSE_CACHE_LOCK = Lock()
+
+# Faster-parsing companions of an RDF/XML file, in order of preference
+COMPANION_FORMATS = ((".nt", "nt"), (".ttl", "turtle"))
+# First line of a companion: hash of the RDF/XML file it was written with
+SOURCE_HASH_PREFIX = "# source-sha256: "
+
+# reasoner -> owlrl closure; "pellet", the former default, maps to OWL RL
+REASONERS = {
+    "rdfs": owlrl.RDFS_Semantics,
+    "owlrl": owlrl.OWLRL_Semantics,
+    "pellet": owlrl.OWLRL_Semantics,
+}
+
+
+def parse_cached(file_path: str, format: str = None) -> Graph:
+    """Parse an RDF file once per on-disk version.
+
+    The returned graph is shared between callers and must not be modified;
+    use ``copy_graph`` for a private, mutable copy.
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    key = (path, format, stat.st_mtime_ns, stat.st_size)
+
+    with _PARSE_CACHE_LOCK:
+        graph = _PARSE_CACHE.get(key)
+        if graph is None:
+            graph = Graph().parse(path, format=format)
+            # Drop graphs of older versions of the same file
+            for stale in [k for k in _PARSE_CACHE if k[:2] == key[:2]]:
+                del _PARSE_CACHE[stale]
+            _PARSE_CACHE[key] = graph
+    return graph
+
+
+def clear_parse_cache() -> None:
+    """Forget every graph parsed by ``parse_cached``."""
+    with _PARSE_CACHE_LOCK:
+        _PARSE_CACHE.clear()
+
+
+@lru_cache(maxsize=64)
+def _sha256(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(file_path) -> str:
+    """Hex SHA-256 of a file's bytes, computed once per on-disk version."""
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    return _sha256(path, stat.st_mtime_ns, stat.st_size)
+
+
+def find_companion(file_path) -> Optional[Tuple[str, str]]:
+    """(path, format) of an N-Triples/Turtle copy of an RDF/XML file, or None.
+
+    A companion is only used while its source hash matches the RDF/XML file,
+    so hand edits of the .owl are never shadowed by a stale copy. Without the
+    RDF/XML file, the companion is used as is.
+    """
+    source = Path(file_path)
+    for suffix, fmt in COMPANION_FORMATS:
+        companion = source.with_suffix(suffix)
+        if companion == source or not companion.is_file():
+            continue
+        if not source.exists():
+            return str(companion), fmt
+        with open(companion, encoding="utf-8") as fp:
+            first = fp.readline()
+        if first.startswith(SOURCE_HASH_PREFIX) and \
+                first[len(SOURCE_HASH_PREFIX):].strip() == file_sha256(source):
+            return str(companion), fmt
+    return None
+
+
+def write_atomic(path, text: str) -> None:
+    """Write ``text`` to ``path`` through a temporary file in the same directory.
+
+    Readers that match a cache file by its header line never see a partly
+    written body: the complete file replaces the old one in one step.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            fp.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def copy_graph(graph: Graph) -> Graph:
+    """Independent copy of ``graph`` with its triples and namespace bindings."""
+    copy = Graph()
+    for prefix, namespace in graph.namespaces():
+        copy.bind(prefix, namespace, override=True, replace=True)
+    copy.addN((s, p, o, copy) for s, p, o in graph)
+    return copy
+
+
+def _closure_header(source_hash: str, semantics) -> str:
+    # The closure depends on the source and on the owlrl rules that produced it
+    return f"{SOURCE_HASH_PREFIX}{source_hash}\n# closure: {semantics.__name__} owlrl {owlrl.__version__}\n"
+
+
+def _resolve_source(file_path: str, format: str) -> Tuple[str, str]:
+    companion = find_companion(file_path) if format == "xml" else None
+    return companion or (file_path, format)
+
+
+def _imports(graph: Graph) -> dict:
+    # import_resolver imports this module
+    from import_resolver import ImportResolver
+    resolved, _ = ImportResolver().closure(graph)
+    return resolved
+
+
+def materialize(file_path: str, format: str = "xml", reasoner: str = "owlrl",
+                imports: bool = False) -> Tuple[Graph, dict]:
+    """OWL RL or RDFS closure of an ontology file, computed once per content hash.
+
+    The closure is written next to the source as ``<stem>.<reasoner>-closure.nt``
+    and later loads parse it instead of reasoning again. With ``imports``, the
+    ontologies it imports (see ``import_resolver``) are reasoned over with it
+    and their hashes are part of the key. Returns the shared, read-only
+    closure graph (see ``parse_cached``) and the counts and timing of the
+    materialisation.
+    """
+    if reasoner not in REASONERS:
+        raise ValueError(f"Unknown reasoner {reasoner!r}; choose from {', '.join(REASONERS)}")
+    semantics = REASONERS[reasoner]
+    if reasoner == "pellet":
+        logger.warning('Reasoner "pellet" is an alias of "owlrl"; running the OWL RL closure')
+    name = "owlrl" if semantics is owlrl.OWLRL_Semantics else reasoner
+
+    source, source_format = _resolve_source(file_path, format)
+    source_hash = file_sha256(file_path if os.path.exists(file_path) else source)
+    imported = {}
+    if imports:
+        imported = _imports(parse_cached(source, source_format))
+        hashes = " ".join([source_hash] + [file_sha256(path) for path, _ in imported.values()])
+        source_hash = hashlib.sha256(hashes.encode("utf-8")).hexdigest()
+        name += "+imports"
+    header = _closure_header(source_hash, semantics)
+    closure_path = Path(file_path).with_name(f"{Path(file_path).stem}.{name}-closure.nt")
+
+    started = time.perf_counter()
+    asserted = _cached_closure(closure_path, header)
+    if asserted is not None:
+        graph = parse_cached(str(closure_path), "nt")
+        cached = True
+    else:
+        graph = copy_graph(parse_cached(source, source_format))
+        for _, imported_graph in imported.values():
+            graph.addN((s, p, o, graph) for s, p, o in imported_graph)
+        asserted = len(graph)
+        owlrl.DeductiveClosure(semantics).expand(graph)
+        # The rules also type literals; such triples are not valid RDF
+        for triple in [t for t in graph if isinstance(t[0], Literal)]:
+            graph.remove(triple)
+        _write_closure(graph, closure_path, header, asserted)
+        cached = False
+
+    return graph, {
+        "reasoner": name,
+        "asserted": asserted,
+        "inferred": len(graph) - asserted,
+        "imports": [str(path) for path, _ in imported.values()],
+        "seconds": time.perf_counter() - started,
+        "cached": cached,
+        "path": str(closure_path),
+    }
+
+
+def _cached_closure(closure_path: Path, header: str) -> Optional[int]:
+    """Asserted-triple count of a closure file written with ``header``, else None."""
+    if not closure_path.is_file():
+        return None
+    with open(closure_path, encoding="utf-8") as fp:
+        if fp.readline() + fp.readline() != header:
+            return None
+        counts = fp.readline()
+    if not counts.startswith("# asserted: "):
+        return None
+    return int(counts.split()[2])
+
+
+def _write_closure(graph: Graph, closure_path: Path, header: str, asserted: int) -> None:
+    data = graph.serialize(format="nt", encoding="utf-8").decode("utf-8")
+    counts = f"# asserted: {asserted} inferred: {len(graph) - asserted}\n"
+    lines = sorted(line + "\n" for line in data.splitlines() if line)
+    try:
+        write_atomic(closure_path, header + counts + "".join(lines))
+    except OSError as exc:
+        logger.warning(f"Closure not cached, cannot write {closure_path}: {exc}")
+
 
 def load_and_materialize_ontology(
         file_path: str,
@@ -21,13 +235,39 @@ def load_and_materialize_ontology(
         prefix: str,
         *,
         format: str = "xml",
-        reasoner: str = "pellet" 
+        reasoner: Optional[str] = None,
+        imports: bool = False
 ) -> Graph:
-    """Simply load the OWL ontology file."""
+    """Load the OWL ontology file, optionally with its entailments materialised.
+
+    An RDF/XML file is read from its up-to-date N-Triples or Turtle
+    companion when one exists (see ``find_companion``). With ``imports``, the
+    ontologies it imports are merged in from the local catalog (see
+    ``import_resolver``). With ``reasoner`` (``"rdfs"`` or ``"owlrl"``;
+    ``"pellet"`` is an alias of ``"owlrl"``), the graph is the closure from
+    ``materialize`` instead, reasoned once per version of the files. No Java
+    reasoner is involved.
+    """
     logger.info(f"Loading ontology from: {file_path}")
 
-    g = Graph()
-    g.parse(file_path, format=format)
+    if reasoner:
+        closure, stats = materialize(file_path, format, reasoner, imports)
+        g = copy_graph(closure)
+        logger.info(
+            f"{'Loaded' if stats['cached'] else 'Materialised'} {stats['reasoner']} closure: "
+            f"{stats['asserted']} asserted + {stats['inferred']} inferred triples "
+            f"in {stats['seconds']:.2f} s"
+        )
+    else:
+        source, source_format = _resolve_source(file_path, format)
+        if source != file_path:
+            logger.info(f"Using {source_format} companion: {source}")
+        parsed = parse_cached(source, source_format)
+        g = copy_graph(parsed)
+        if imports:
+            for iri, (path, imported) in _imports(parsed).items():
+                g.addN((s, p, o, g) for s, p, o in imported)
+                logger.info(f"Imported {iri} from {path} ({len(imported)} triples)")
 
     g.bind(prefix, namespace)
     g.bind("twin", OR)
@@ -74,14 +314,17 @@ def parse_json_to_rdflib(json_triple: dict, namespace: Namespace):
     return (s, p, o)
 
 
-def query_result_to_list(query_result):
-    """Flatten a SPARQL Result into a Python list of local names."""
-    result = []
+def iter_query_result(query_result):
+    """Lazily yield the local names of the non-empty cells of a SPARQL Result."""
     for row in query_result:
         for cell in row:
-            if cell:  
-                result.append(get_label_from_uri(cell))
-    return result
+            if cell:
+                yield get_label_from_uri(cell)
+
+
+def query_result_to_list(query_result):
+    """Flatten a SPARQL Result into a Python list of local names."""
+    return list(iter_query_result(query_result))
 
 
 def get_label_from_uri(uri):
@@ -0,0 +1,49 @@
+# property_hierarchy.py
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple
+
+from rdflib import Graph, OWL, RDFS, URIRef
+
+# Triples with these predicates change the hierarchy
+HIERARCHY_PREDICATES = (RDFS.subPropertyOf, OWL.equivalentProperty)
+
+
+class PropertyHierarchy:
+    """Sub-properties of each property, from a graph's alignment axioms.
+
+    Built once from ``rdfs:subPropertyOf`` and ``owl:equivalentProperty``
+    (equivalent properties count as sub-properties of each other). A lookup
+    over ``expand(p)`` finds every triple that entails a ``p`` triple, so
+    queries match one predicate set instead of a hand-written UNION per
+    property and pick up new alignment axioms without being edited.
+    """
+
+    def __init__(self, graph: Graph) -> None:
+        self._subs: Dict[URIRef, Set[URIRef]] = defaultdict(set)
+        for sub, sup in graph.subject_objects(RDFS.subPropertyOf):
+            if isinstance(sub, URIRef) and isinstance(sup, URIRef):
+                self._subs[sup].add(sub)
+        for a, b in graph.subject_objects(OWL.equivalentProperty):
+            if isinstance(a, URIRef) and isinstance(b, URIRef):
+                self._subs[a].add(b)
+                self._subs[b].add(a)
+        self._expanded: Dict[URIRef, Tuple[URIRef, ...]] = {}
+
+    def expand(self, prop: URIRef) -> Tuple[URIRef, ...]:
+        """``prop`` followed by its transitive sub-properties, in IRI order."""
+        expanded = self._expanded.get(prop)
+        if expanded is None:
+            seen, stack = {prop}, [prop]
+            while stack:
+                for sub in self._subs.get(stack.pop(), ()):
+                    if sub not in seen:
+                        seen.add(sub)
+                        stack.append(sub)
+            seen.discard(prop)
+            expanded = self._expanded[prop] = (prop, *sorted(seen))
+        return expanded
+
+    @staticmethod
+    def affected_by(triples: Iterable[Tuple]) -> bool:
+        """True if any of ``triples`` is an axiom the hierarchy is built from."""
+        return any(p in HIERARCHY_PREDICATES for _, p, _ in triples)
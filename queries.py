@@ -1,214 +1,280 @@
 # queries.py
-from rdflib import Graph
+"""
+SPARQL used by the simulator and the API.
+
+Queries are parsed and translated once, at import time, with
+``prepareQuery`` and executed with ``initBindings`` for the capability or
+class they are about, so no user-supplied name is ever spliced into query
+text.
+
+Per-step lookups (``run_step_query``, ``step_briefing``) match a property and
+all of its sub-properties, taken from the graph's ``rdfs:subPropertyOf`` /
+``owl:equivalentProperty`` axioms by ``PropertyHierarchy``. They look the
+expanded predicate set up directly in the graph's indexes rather than
+evaluating a UNION per property.
+
+The ``get_*`` functions intentionally stay textual: their contract is to
+return query strings, for callers that show or log the query and for the
+benchmarks that time SPARQL text against the indexed lookups. Nothing in the
+simulator or the API executes them. They render names through
+``rdflib.URIRef.n3()``, which rejects anything that is not a valid IRI, so a
+name cannot change the query's structure.
+"""
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rdflib import Graph, Namespace, URIRef
+from rdflib.namespace import RDF, RDFS
+from rdflib.plugins.sparql import prepareQuery
+
+from property_hierarchy import HIERARCHY_PREDICATES, PropertyHierarchy
+from query_cache import QueryCache
+
+TWIN = Namespace("http://www.semanticweb.org/Twin_OR/")
+PROV = Namespace("http://www.w3.org/ns/prov#")
+
+_NS = {"rdf": RDF, "rdfs": RDFS, "twin": TWIN, "prov": PROV}
+
+_PREFIXES = """
+    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
+    PREFIX prov: <http://www.w3.org/ns/prov#>
+"""
+
+# Property each step lookup matches, together with its sub-properties
+STEP_PROPERTIES: Dict[str, URIRef] = {
+    "instruments": TWIN.hasInstrument,
+    "actors": PROV.wasAssociatedWith,
+    "tissues": TWIN.targetTissue,
+    "capabilities": TWIN.requiresCapability,
+    "materials": TWIN.materialUsed,
+    "action_group": TWIN.implementsGroup,
+    "force": TWIN.forceValue,
+    "motion": TWIN.motionParam,
+}
+
+# Expansion of STEP_PROPERTIES under the shipped alignment, for query text
+# built without a graph at hand
+STEP_PREDICATES: Dict[str, Tuple[URIRef, ...]] = {
+    **{name: (prop,) for name, prop in STEP_PROPERTIES.items()},
+    "instruments": (TWIN.hasInstrument, TWIN.toolUsed),
+    "actors": (PROV.wasAssociatedWith, TWIN.actor, TWIN.performedBy, TWIN.performer),
+}
+
+
+def step_predicates(hierarchy: Optional[PropertyHierarchy] = None) -> Dict[str, Tuple[URIRef, ...]]:
+    """Predicates matched by each step lookup, from ``hierarchy`` if given."""
+    if hierarchy is None:
+        return STEP_PREDICATES
+    return {name: hierarchy.expand(prop) for name, prop in STEP_PROPERTIES.items()}
+
+
+ACTORS_WITH_CAPABILITY = prepareQuery(
+    "SELECT DISTINCT ?actor WHERE { ?actor twin:hasCapability ?capability . }", initNs=_NS
+)
+ACTION_GROUPS_FOR_CORE = prepareQuery(
+    "SELECT DISTINCT ?group WHERE { ?group rdfs:subClassOf ?core . ?group rdfs:subClassOf twin:ActionGroup . }",
+    initNs=_NS
+)
+
+
+def step_uri(step: str) -> URIRef:
+    """IRI of a step, accepting names with spaces as the scenario data does."""
+    return TWIN[step.replace(" ", "_")]
+
+
+def _term(name: str) -> str:
+    """``twin:`` IRI of ``name`` as SPARQL text; raises ValueError for non-IRIs."""
+    try:
+        return step_uri(name).n3()
+    except Exception as e:
+        raise ValueError(f"Not a valid name for a query: {name!r}") from e
+
+
+def iter_step_query(
+        graph: Graph,
+        name: str,
+        steps: Iterable[str],
+        hierarchy: Optional[PropertyHierarchy] = None
+) -> Iterator:
+    """Lazily yield the distinct results of the ``name`` lookup over ``steps``."""
+    if hierarchy is None:
+        hierarchy = PropertyHierarchy(graph)
+    predicates = hierarchy.expand(STEP_PROPERTIES[name])
+    seen = set()
+    for step in steps:
+        subject = step_uri(step)
+        for predicate in predicates:
+            for obj in graph.objects(subject, predicate):
+                if obj not in seen:
+                    seen.add(obj)
+                    yield obj
+
+
+def run_step_query(
+        graph: Graph,
+        name: str,
+        steps: Iterable[str],
+        limit: Optional[int] = None,
+        hierarchy: Optional[PropertyHierarchy] = None,
+        cache: Optional[QueryCache] = None
+) -> List:
+    """Distinct results of the ``name`` lookup over ``steps``, in first-seen order.
+
+    One triple-pattern lookup per step and expanded predicate, stopping
+    after ``limit`` results if given. ``hierarchy`` defaults to one built
+    from ``graph``; pass a kept instance to skip that. With ``cache`` (the
+    graph's ``QueryCache``) results are reused until a change touches one
+    of the predicates.
+    """
+    if hierarchy is None:
+        hierarchy = PropertyHierarchy(graph)
+    predicates = hierarchy.expand(STEP_PROPERTIES[name])
+    steps = tuple(steps)
+    key = ("step", predicates, steps, limit)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+    results = list(itertools.islice(iter_step_query(graph, name, steps, hierarchy), limit))
+    if cache is not None:
+        cache.put(key, results, predicates + HIERARCHY_PREDICATES)
+    return list(results)
+
+
+def step_briefing(
+        graph: Graph,
+        steps: Iterable[str],
+        hierarchy: Optional[PropertyHierarchy] = None
+) -> Dict[str, List]:
+    """Results of every ``STEP_PROPERTIES`` lookup for ``steps`` in one pass.
+
+    Walks the outgoing triples of each step once and sorts the objects by
+    predicate, instead of running one query per category.
+    """
+    if hierarchy is None:
+        hierarchy = PropertyHierarchy(graph)
+    categories_of = {}
+    for name, predicates in step_predicates(hierarchy).items():
+        for predicate in predicates:
+            categories_of.setdefault(predicate, []).append(name)
+
+    found = {name: {} for name in STEP_PROPERTIES}
+    for step in steps:
+        for predicate, obj in graph.predicate_objects(step_uri(step)):
+            for name in categories_of.get(predicate, ()):
+                found[name][obj] = None
+    return {name: list(objects) for name, objects in found.items()}
+
+
+def actors_with_capability(graph: Graph, capability: str) -> List:
+    return [row[0] for row in graph.query(ACTORS_WITH_CAPABILITY, initBindings={"capability": TWIN[capability]})]
+
+
+def action_groups_for_core(graph: Graph, core_type: str) -> List:
+    return [row[0] for row in graph.query(ACTION_GROUPS_FOR_CORE, initBindings={"core": TWIN[core_type]})]
+
+
+# -- query text ------------------------------------------------------------
+
+def _empty_select(var: str) -> str:
+    return f"""{_PREFIXES}
+    SELECT DISTINCT ?{var} WHERE {{
+        FILTER(false)
+    }}
+    """
+
+
+def _path(name: str) -> str:
+    """``STEP_PREDICATES[name]`` as a SPARQL alternative path."""
+    return "|".join(p.n3() for p in STEP_PREDICATES[name])
+
+
+def _steps_query(name: str, var: str, steps: List[str], limit: Optional[int] = None) -> str:
+    """Text of a per-step lookup for several steps, as a ``VALUES`` block."""
+    if not steps:
+        return _empty_select(var)
+    values = " ".join(_term(step) for step in steps)
+    return f"""{_PREFIXES}
+    SELECT DISTINCT ?{var} WHERE {{
+        VALUES ?step {{ {values} }}
+        ?step {_path(name)} ?{var} .
+    }}{f" LIMIT {limit}" if limit is not None else ""}
+    """
+
 
 def get_all_instruments() -> str:
     """Get all instruments used in steps."""
-    return """
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT DISTINCT ?instrument WHERE {
-        { ?step twin:hasInstrument ?instrument }
-        UNION
-        { ?step twin:toolUsed ?instrument }
-    } LIMIT 100
+    return f"""{_PREFIXES}
+    SELECT DISTINCT ?instrument WHERE {{
+        ?step {_path("instruments")} ?instrument .
+    }}
     """
 
 
 def get_all_steps() -> str:
     """Retrieve all steps."""
-    return """
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT ?step WHERE {
+    return f"""{_PREFIXES}
+    SELECT ?step WHERE {{
         ?step a twin:Step .
-    } LIMIT 100
+    }}
     """
 
 
 def get_actors_with_capability(capability: str) -> str:
     """Get actors with specific capability."""
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
+    return f"""{_PREFIXES}
     SELECT DISTINCT ?actor WHERE {{
-        ?actor twin:hasCapability twin:{capability} .
-    }} LIMIT 100
+        ?actor twin:hasCapability {_term(capability)} .
+    }}
     """
 
 
 def get_action_groups_for_core(core_type: str) -> str:
     """Get action groups for a specific core type."""
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
+    return f"""{_PREFIXES}
     SELECT DISTINCT ?group WHERE {{
-        ?group rdfs:subClassOf twin:{core_type} .
+        ?group rdfs:subClassOf {_term(core_type)} .
         ?group rdfs:subClassOf twin:ActionGroup .
-    }} LIMIT 100
+    }}
     """
 
 
 def get_instruments_for_steps(steps: list[str]) -> str:
     """Get instruments required for given steps - checking both hasInstrument and toolUsed."""
-    if not steps:
-        return """
-        PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-        SELECT DISTINCT ?instrument WHERE {
-            FILTER(false)
-        }
-        """
-
-    step_unions = []
-    for step in steps:
-        step_uri = f'twin:{step.replace(" ", "_")}'
-        step_unions.append(f"""
-        {{
-            {step_uri} twin:hasInstrument ?instrument
-        }}
-        UNION
-        {{
-            {step_uri} twin:toolUsed ?instrument
-        }}""")
-
-    union_query = " UNION ".join(step_unions)
-
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT DISTINCT ?instrument WHERE {{
-        {union_query}
-    }} LIMIT 100
-    """
+    return _steps_query("instruments", "instrument", steps)
 
 
 def get_target_tissues_for_steps(steps: list[str]) -> str:
     """Get target tissues for given steps."""
-    if not steps:
-        return """
-        PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-        SELECT DISTINCT ?tissue WHERE {
-            FILTER(false)
-        }
-        """
-
-    # Create SPARQL for multiple steps
-    step_unions = []
-    for step in steps:
-        step_uri = f'twin:{step.replace(" ", "_")}'
-        step_unions.append(f"{{ {step_uri} twin:targetTissue ?tissue }}")
-
-    union_query = " UNION ".join(step_unions)
-
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT DISTINCT ?tissue WHERE {{
-        {union_query}
-    }} LIMIT 100
-    """
+    return _steps_query("tissues", "tissue", steps)
 
 
 def get_actors_for_steps(steps: list[str]) -> str:
     """Get actors performing given steps - checking multiple properties."""
-    if not steps:
-        return """
-        PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-        SELECT DISTINCT ?actor WHERE {
-            FILTER(false)
-        }
-        """
-
-    step_unions = []
-    for step in steps:
-        step_uri = f'twin:{step.replace(" ", "_")}'
-        step_unions.append(f"""
-        {{
-            {step_uri} prov:wasAssociatedWith ?actor
-        }}
-        UNION
-        {{
-            {step_uri} twin:performedBy ?actor
-        }}
-        UNION
-        {{
-            {step_uri} twin:performer ?actor
-        }}
-        UNION
-        {{
-            {step_uri} twin:actor ?actor
-        }}""")
-
-    union_query = " UNION ".join(step_unions)
-
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    PREFIX prov: <http://www.w3.org/ns/prov#>
-    SELECT DISTINCT ?actor WHERE {{
-        {union_query}
-    }} LIMIT 100
-    """
+    return _steps_query("actors", "actor", steps)
 
 
 def get_capabilities_for_steps(steps: list[str]) -> str:
     """Get capabilities required for given steps."""
-    if not steps:
-        return """
-        PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-        SELECT DISTINCT ?capability WHERE {
-            FILTER(false)
-        }
-        """
-
-    # Create SPARQL for multiple steps
-    step_unions = []
-    for step in steps:
-        step_uri = f'twin:{step.replace(" ", "_")}'
-        step_unions.append(f"{{ {step_uri} twin:requiresCapability ?capability }}")
-
-    union_query = " UNION ".join(step_unions)
-
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT DISTINCT ?capability WHERE {{
-        {union_query}
-    }} LIMIT 100
-    """
+    return _steps_query("capabilities", "capability", steps)
 
 
 def get_action_group_for_step(step: str) -> str:
     """Get the action group implemented by a step."""
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT DISTINCT ?group WHERE {{
-        twin:{step} twin:implementsGroup ?group .
-    }} LIMIT 10
-    """
+    return _steps_query("action_group", "group", [step])
 
 
 def get_force_value_for_step(step: str) -> str:
     """Get force value for a step."""
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT ?force WHERE {{
-        twin:{step} twin:forceValue ?force .
-    }} LIMIT 1
-    """
+    return _steps_query("force", "force", [step], limit=1)
 
 
 def get_motion_params_for_step(step: str) -> str:
     """Get motion parameters for a step."""
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT ?motion WHERE {{
-        twin:{step} twin:motionParam ?motion .
-    }} LIMIT 1
-    """
+    return _steps_query("motion", "motion", [step], limit=1)
 
 
 def get_tools_for_steps(steps: list[str]) -> str:
@@ -218,28 +284,7 @@ def get_tools_for_steps(steps: list[str]) -> str:
 
 def get_materials_for_steps(steps: list[str]) -> str:
     """Get materials - checking materialUsed property."""
-    if not steps:
-        return """
-        PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-        SELECT DISTINCT ?material WHERE {
-            FILTER(false)
-        }
-        """
-
-    step_unions = []
-    for step in steps:
-        step_uri = f'twin:{step.replace(" ", "_")}'
-        step_unions.append(f"{{ {step_uri} twin:materialUsed ?material }}")
-
-    union_query = " UNION ".join(step_unions)
-
-    return f"""
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX twin: <http://www.semanticweb.org/Twin_OR/>
-    SELECT DISTINCT ?material WHERE {{
-        {union_query}
-    }} LIMIT 100
-    """
+    return _steps_query("materials", "material", steps)
 
 
 def get_next_steps(current_steps: list[str]) -> str:
@@ -0,0 +1,158 @@
+# query_cache.py
+"""
+Query results cached per graph and dropped only when the predicates they
+read change.
+
+Each entry records the predicates its query matches. After a step,
+``invalidate(predicates of the delta)`` evicts just the entries that
+read one of them, so results about untouched predicates survive the step.
+Entries whose dependencies cannot be bounded (a variable predicate, a
+negated property path, a ``p*`` / ``p?`` path that also matches at zero
+length, DESCRIBE) are stored with ``predicates=None`` and dropped by every
+invalidation.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, FrozenSet, Hashable, Iterable, Optional, Set
+
+from rdflib import URIRef
+from rdflib.paths import (
+    AlternativePath,
+    InvPath,
+    MulPath,
+    NegatedPath,
+    SequencePath,
+    ZeroOrMore,
+    ZeroOrOne,
+)
+from rdflib.plugins.sparql.parserutils import CompValue
+
+DEFAULT_MAXSIZE = 256
+
+_MISSING = object()
+
+
+class _Unbounded(Exception):
+    pass
+
+
+def _path_predicates(path, found: Set[URIRef]) -> None:
+    if isinstance(path, URIRef):
+        found.add(path)
+    elif isinstance(path, (AlternativePath, SequencePath)):
+        for arg in path.args:
+            _path_predicates(arg, found)
+    elif isinstance(path, InvPath):
+        _path_predicates(path.arg, found)
+    elif isinstance(path, MulPath) and path.mod not in (ZeroOrMore, ZeroOrOne):
+        _path_predicates(path.path, found)
+    else:
+        # Variables and negated paths can match any predicate; zero-length
+        # paths (p*, p?) match every node, whatever predicates it carries
+        raise _Unbounded()
+
+
+def query_predicates(algebra) -> Optional[FrozenSet[URIRef]]:
+    """Predicates a translated query can match, or None if that is unbounded."""
+    found: Set[URIRef] = set()
+    stack = [algebra]
+    try:
+        while stack:
+            node = stack.pop()
+            if isinstance(node, CompValue):
+                if node.name == "DescribeQuery":
+                    raise _Unbounded()
+                if node.name == "BGP":
+                    for _, predicate, _ in node.triples:
+                        _path_predicates(predicate, found)
+                elif node.name == "TriplesBlock":
+                    # Untranslated patterns, e.g. inside FILTER EXISTS; flat s p o lists
+                    for block in node.triples:
+                        for predicate in block[1::3]:
+                            if not isinstance(predicate, URIRef):
+                                raise _Unbounded()
+                            found.add(predicate)
+                stack.extend(node.values())
+            elif isinstance(node, (list, tuple)):
+                stack.extend(node)
+            elif isinstance(node, NegatedPath):
+                raise _Unbounded()
+    except _Unbounded:
+        return None
+    return frozenset(found)
+
+
+class QueryCache:
+    """LRU of query results, invalidated by predicate."""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # predicate -> keys of entries reading it; None -> unbounded entries
+        self._readers: Dict[Optional[URIRef], Set[Hashable]] = {}
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value, predicates: Optional[Iterable[URIRef]]) -> None:
+        """Cache ``value`` as depending on ``predicates`` (None: on everything)."""
+        dependencies = None if predicates is None else frozenset(predicates)
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (value, dependencies)
+            for predicate in (None,) if dependencies is None else dependencies:
+                self._readers.setdefault(predicate, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, predicates: Iterable[URIRef]) -> int:
+        """Drop the entries reading any of ``predicates``; returns how many."""
+        with self._lock:
+            stale = set(self._readers.get(None, ()))
+            for predicate in set(predicates):
+                stale.update(self._readers.get(predicate, ()))
+            for key in stale:
+                self._discard(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._readers.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _discard(self, key: Hashable) -> None:
+        _, dependencies = self._entries.pop(key)
+        for predicate in (None,) if dependencies is None else dependencies:
+            readers = self._readers.get(predicate)
+            if readers is not None:
+                readers.discard(key)
+                if not readers:
+                    del self._readers[predicate]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
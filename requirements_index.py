@@ -0,0 +1,87 @@
+# requirements_index.py
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rdflib import Graph, Namespace, URIRef
+
+from ontology_utils import get_label_from_uri
+from queries import STEP_PREDICATES
+
+OR = Namespace("http://www.semanticweb.org/Twin_OR/")
+
+# Default predicates per category: the shipped alignment's expansion from queries.py
+REQUIREMENT_PREDICATES = {
+    category: STEP_PREDICATES[category]
+    for category in ("instruments", "actors", "tissues", "capabilities")
+}
+
+
+class RequirementsIndex:
+    """step -> instruments / actors / tissues / capabilities, kept in step with a graph.
+
+    Built once from the graph and then maintained from the per-step delta, so
+    the Q&A routes answer with dict lookups instead of SPARQL.
+    """
+
+    def __init__(self, graph: Graph, predicates: Optional[Dict[str, Sequence[URIRef]]] = None) -> None:
+        self.graph = graph
+        self._predicates = predicates or REQUIREMENT_PREDICATES
+        self._category_of: Dict[URIRef, str] = {
+            predicate: category
+            for category, predicates in self._predicates.items()
+            for predicate in predicates
+        }
+        # category -> subject -> insertion-ordered set of objects
+        self._index: Dict[str, Dict[URIRef, Dict]] = {}
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Re-index every requirement triple in the graph."""
+        self._index = {c: {} for c in self._predicates}
+        for predicate in self._category_of:
+            for s, p, o in self.graph.triples((None, predicate, None)):
+                self._add(s, p, o)
+
+    def copy(self, graph: Graph) -> "RequirementsIndex":
+        """Copy of this index bound to ``graph``, an identical copy of ``self.graph``."""
+        clone = RequirementsIndex.__new__(RequirementsIndex)
+        clone.graph = graph
+        clone._predicates = self._predicates
+        clone._category_of = self._category_of
+        clone._index = {
+            category: {s: dict(objects) for s, objects in by_subject.items()}
+            for category, by_subject in self._index.items()
+        }
+        return clone
+
+    def apply_delta(self, added: Iterable[Tuple], removed: Iterable[Tuple]) -> None:
+        """Update the index from the triples a step added to / removed from the graph."""
+        for s, p, o in added:
+            if p in self._category_of:
+                self._add(s, p, o)
+        for s, p, o in removed:
+            if p in self._category_of:
+                self._remove(s, p, o)
+
+    def _add(self, s, p, o) -> None:
+        self._index[self._category_of[p]].setdefault(s, {})[o] = None
+
+    def _remove(self, s, p, o) -> None:
+        category = self._category_of[p]
+        objects = self._index[category].get(s)
+        if objects is None or o not in objects:
+            return
+        # Re-added later in the same delta, or still asserted by a sibling predicate
+        if any((s, predicate, o) in self.graph for predicate in self._predicates[category]):
+            return
+        del objects[o]
+        if not objects:
+            del self._index[category][s]
+
+    def lookup(self, category: str, steps: List[str]) -> List[str]:
+        """Local names required by ``steps`` for one category, without duplicates."""
+        seen = {}
+        by_subject = self._index[category]
+        for step in steps:
+            for o in by_subject.get(OR[step.replace(" ", "_")], ()):
+                seen[get_label_from_uri(o)] = None
+        return list(seen)
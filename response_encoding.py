@@ -0,0 +1,77 @@
+# response_encoding.py
+"""
+Content negotiation for API payloads: JSON or MessagePack, optionally
+compressed with brotli or gzip.
+
+MessagePack and brotli are optional; without them the corresponding
+encodings are simply not offered and clients get JSON / gzip.
+"""
+import gzip
+import json
+from typing import Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def media_types():
+    """Media types the server can produce, in order of preference for ``*/*``."""
+    return [JSON, *(MSGPACK_ALIASES if msgpack is not None else ())]
+
+
+def codings():
+    """Content codings the server can produce, best first."""
+    return [*(("br",) if brotli is not None else ()), "gzip"]
+
+
+def negotiate(accept, accept_encoding) -> Tuple[str, Optional[str]]:
+    """Pick ``(media type, content coding or None)`` from werkzeug Accept headers."""
+    media_type = accept.best_match(media_types(), default=JSON)
+    if media_type in MSGPACK_ALIASES:
+        media_type = MSGPACK
+
+    coding = None
+    for candidate in codings():
+        if accept_encoding[candidate]:
+            coding = candidate
+            break
+    return media_type, coding
+
+
+def variant_tag(media_type: str, coding: Optional[str]) -> str:
+    """Short suffix distinguishing the ETags of different representations."""
+    return "".join([
+        "mp" if media_type == MSGPACK else "js",
+        f".{coding}" if coding else "",
+    ])
+
+
+def encode(payload, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True, default=str)
+    return json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def compress(body: bytes, coding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress ``body``; returns the coding actually applied (None if skipped)."""
+    if coding is None or len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
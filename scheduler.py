@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+scheduler.py
+Discrete-event scheduler that runs many ORSimulator rooms on a simulated clock.
+
+Each room holds at most one pending step event in a priority queue ordered by
+simulated time (minutes). Step durations come from the ``duration`` field of
+the scenario data. Actors and instruments named by a step's sensor triples are
+shared across rooms, so a step whose resources are held elsewhere waits until
+they are released; the waiting time is what the contention report measures.
+The clock jumps from event to event, so a full day of a surgical suite runs as
+fast as the steps themselves can be applied.
+"""
+import argparse
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import queries
+from OR_simulator import OR, ORSimulator
+from ontology_utils import get_label_from_uri, parse_json_to_rdflib
+
+# Step lookup categories whose objects are shared between rooms
+RESOURCE_CATEGORIES = ("actors", "instruments")
+
+
+class Room:
+    """Scheduling state for one simulator: its case list and statistics."""
+
+    def __init__(self, room_id: str, sim: ORSimulator, cases: List[str], turnover: float) -> None:
+        self.room_id = room_id
+        self.sim = sim
+        self.cases = list(cases)
+        self.turnover = turnover
+
+        self.steps_executed = 0
+        self.violations = 0
+        self.cases_completed = 0
+        self.wait_time = 0.0
+        self.finished_at: Optional[float] = None
+
+
+class DiscreteEventScheduler:
+    """Priority-queue scheduler for timed step events across rooms."""
+
+    def __init__(
+            self,
+            *,
+            default_step_duration: float = 5.0,
+            validate: bool = False,
+            halt_on_violation: bool = False
+    ) -> None:
+        self.default_step_duration = default_step_duration
+        self.validate = validate
+        self.halt_on_violation = halt_on_violation
+
+        self.now = 0.0
+        self.rooms: Dict[str, Room] = {}
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+
+        self._resource_free_at: Dict[str, float] = defaultdict(float)
+        self._resource_busy: Dict[str, float] = defaultdict(float)
+        self._resource_wait: Dict[str, float] = defaultdict(float)
+        self._resource_conflicts: Dict[str, int] = defaultdict(int)
+        self.events_processed = 0
+
+    def add_room(
+            self,
+            room_id: str,
+            sim: ORSimulator,
+            cases: Optional[List[str]] = None,
+            *,
+            start_time: float = 0.0,
+            turnover: float = 0.0
+    ) -> Room:
+        """Register a room; ``cases`` are procedures run back to back after the current one."""
+        room = Room(room_id, sim, cases or [], turnover)
+        self.rooms[room_id] = room
+        self._schedule(start_time, room_id)
+        return room
+
+    def _schedule(self, at: float, room_id: str) -> None:
+        heapq.heappush(self._queue, (at, next(self._seq), room_id))
+
+    def step_resources(self, sim: ORSimulator) -> Set[str]:
+        """Actors and instruments named in the sensor triples of the current steps.
+
+        A triple names a resource when its predicate is an actor or instrument
+        property, or a sub-property of one, in the simulator's property hierarchy.
+        """
+        expanded = queries.step_predicates(sim.property_hierarchy)
+        predicates = {p for category in RESOURCE_CATEGORIES for p in expanded[category]}
+        resources = set()
+        for step_id in sim.current_steps:
+            for triple in sim.sensor_data.get(step_id, {}).get("triples", []):
+                _, p, o = parse_json_to_rdflib(triple, OR)
+                if p in predicates:
+                    resources.add(get_label_from_uri(o))
+        return resources
+
+    def run(self, until: Optional[float] = None, max_events: Optional[int] = None) -> dict:
+        """Process events until the queue drains, ``until`` or ``max_events`` is hit."""
+        started = time.perf_counter()
+
+        while self._queue:
+            if max_events is not None and self.events_processed >= max_events:
+                break
+            at, _, room_id = self._queue[0]
+            if until is not None and at > until:
+                break
+            heapq.heappop(self._queue)
+
+            self.now = at
+            self.events_processed += 1
+            self._handle(self.rooms[room_id])
+
+        report = self.report()
+        report["wallSeconds"] = time.perf_counter() - started
+        return report
+
+    def _handle(self, room: Room) -> None:
+        sim = room.sim
+        resources = self.step_resources(sim)
+
+        busy = {r: self._resource_free_at[r] for r in resources if self._resource_free_at[r] > self.now}
+        if busy:
+            # Wait for the last conflicting resource to be released, then retry
+            retry_at = max(busy.values())
+            room.wait_time += retry_at - self.now
+            for resource in busy:
+                self._resource_wait[resource] += retry_at - self.now
+                self._resource_conflicts[resource] += 1
+            self._schedule(retry_at, room.room_id)
+            return
+
+        duration = sum(sim.step_duration(s, self.default_step_duration) for s in sim.current_steps)
+        end = self.now + duration
+        for resource in resources:
+            self._resource_free_at[resource] = end
+            self._resource_busy[resource] += duration
+
+        conforms = sim.execute_step(validate=self.validate, force_advance=not self.halt_on_violation)
+        room.steps_executed += 1
+        if not conforms:
+            room.violations += 1
+            if self.halt_on_violation:
+                room.finished_at = end
+                return
+
+        if sim.is_sequence_complete() or not sim.ongoing_procedure:
+            room.cases_completed += 1
+            if room.cases and sim.switch_procedure(room.cases.pop(0)):
+                self._schedule(end + room.turnover, room.room_id)
+            else:
+                room.finished_at = end
+            return
+
+        self._schedule(end, room.room_id)
+
+    def report(self) -> dict:
+        """Simulated-time statistics per room and per shared resource."""
+        horizon = max(
+            [self.now]
+            + [r.finished_at or 0.0 for r in self.rooms.values()]
+            + list(self._resource_free_at.values())
+        )
+
+        return {
+            "simulatedMinutes": horizon,
+            "events": self.events_processed,
+            "rooms": {
+                room_id: {
+                    "procedure": room.sim.current_procedure,
+                    "steps": room.steps_executed,
+                    "violations": room.violations,
+                    "casesCompleted": room.cases_completed,
+                    "waitMinutes": room.wait_time,
+                    "finishedAt": room.finished_at,
+                }
+                for room_id, room in self.rooms.items()
+            },
+            "resources": {
+                resource: {
+                    "busyMinutes": self._resource_busy[resource],
+                    "utilisation": self._resource_busy[resource] / horizon if horizon else 0.0,
+                    "waitMinutes": self._resource_wait[resource],
+                    "conflicts": self._resource_conflicts[resource],
+                }
+                for resource in sorted(self._resource_busy)
+            },
+        }
+
+
+def main():
+    """Simulate a day of a surgical suite from the command line."""
+    ROOT = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Run OR rooms on a simulated clock")
+    parser.add_argument("--rooms", type=int, default=4, help="number of operating rooms")
+    parser.add_argument("--procedures", nargs="+",
+                        default=["LaparoscopicProcedure", "MicrosurgicalProcedure", "RoboticProcedure"],
+                        help="procedures assigned to rooms round-robin")
+    parser.add_argument("--day", type=float, default=600.0, help="length of the day in minutes")
+    parser.add_argument("--turnover", type=float, default=30.0, help="minutes between cases")
+    parser.add_argument("--validate", action="store_true", help="run SHACL validation on every step")
+    parser.add_argument("--onto", type=Path, default=ROOT / "alignments" / "twin_or_2_aligned.owl")
+    parser.add_argument("--shapes", type=Path, default=ROOT / "ontologies" / "SHACL_constraints.ttl")
+    parser.add_argument("--sensors", type=Path, default=ROOT / "data" / "sensor_data.json")
+    args = parser.parse_args()
+
+    scheduler = DiscreteEventScheduler(validate=args.validate)
+    for i in range(args.rooms):
+        procedure = args.procedures[i % len(args.procedures)]
+        sim = ORSimulator(str(args.onto), str(args.shapes), str(args.sensors), initial_procedure=procedure)
+        # Enough cases to fill the day; the clock cut-off stops the rest
+        cases = [args.procedures[(i + k) % len(args.procedures)] for k in range(1, 50)]
+        scheduler.add_room(f"OR-{i + 1}", sim, cases, turnover=args.turnover)
+
+    report = scheduler.run(until=args.day)
+
+    print(f"Simulated {report['simulatedMinutes']:.0f} min, {report['events']} events "
+          f"in {report['wallSeconds']:.3f} s")
+    for room_id, stats in report["rooms"].items():
+        print(f"  {room_id}: {stats['casesCompleted']} cases, {stats['steps']} steps, "
+              f"{stats['violations']} violations, waited {stats['waitMinutes']:.0f} min")
+    print("Resource contention:")
+    for resource, stats in report["resources"].items():
+        print(f"  {resource:20s} util {stats['utilisation']:5.1%}  "
+              f"wait {stats['waitMinutes']:6.0f} min  conflicts {stats['conflicts']}")
+
+
+if __name__ == "__main__":
+    main()
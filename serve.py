@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+serve.py
+Production serving mode: several worker processes behind a session-affinity router.
+
+Each worker is a separate process running ``flask_server.create_app()`` on
+its own loopback port, so simulations use more than one core. The router
+listens on the public port and forwards every request to the worker chosen
+by a stable hash of its session ID (``X-Session-ID`` header, ``?session=``
+or the JSON ``session`` key), which keeps a room's simulator, locks, event
+streams and jobs in one process. Session state is also written to a shared
+SQLite store, so when a worker dies the supervisor restarts it and the
+rooms it held are rebuilt by replay on their next request.
+
+    python serve.py --workers 4 --port 5000
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    """HTTP/1.1 so the router can reuse its connections to a worker."""
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def _serve_worker(port: int, store: str) -> None:
+    """Entry point of one worker process."""
+    from flask_server import create_app
+
+    app = create_app(store)
+    server = make_server("127.0.0.1", port, app, threaded=True, request_handler=_KeepAliveHandler)
+    server.serve_forever()
+
+
+class AffinityRouter:
+    """WSGI app that proxies each request to the worker owning its session."""
+
+    def __init__(self, backends: List[int], max_job_routes: int = 4096) -> None:
+        self.backends = backends
+        self.max_job_routes = max_job_routes
+        self._local = threading.local()
+        # job ID -> worker index, learned from the Location of 202 responses
+        self._job_routes: "OrderedDict[str, int]" = OrderedDict()
+        self._job_lock = threading.Lock()
+
+    def worker_for(self, session_id: str) -> int:
+        return zlib.crc32(session_id.encode("utf-8")) % len(self.backends)
+
+    def _route(self, environ, body: bytes) -> int:
+        path = environ.get("PATH_INFO", "")
+        if path.startswith("/jobs/"):
+            job_id = path.split("/")[2]
+            with self._job_lock:
+                if job_id in self._job_routes:
+                    return self._job_routes[job_id]
+
+        session_id = environ.get("HTTP_X_SESSION_ID")
+        if not session_id:
+            session_id = (parse_qs(environ.get("QUERY_STRING", "")).get("session") or [None])[0]
+        if not session_id and body and environ.get("CONTENT_TYPE", "").startswith("application/json"):
+            try:
+                data = json.loads(body)
+                session_id = data.get("session") if isinstance(data, dict) else None
+            except ValueError:
+                pass
+        return self.worker_for(session_id or "default")
+
+    def _connection(self, worker: int, fresh: bool = False) -> http.client.HTTPConnection:
+        pool = getattr(self._local, "pool", None)
+        if pool is None:
+            pool = self._local.pool = {}
+        conn = pool.get(worker)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = pool[worker] = http.client.HTTPConnection("127.0.0.1", self.backends[worker], timeout=300)
+        return conn
+
+    def _forward(self, worker: int, method: str, target: str, headers: dict, body: bytes):
+        # One retry on a fresh connection covers keep-alive sockets the worker closed
+        for attempt in range(2):
+            conn = self._connection(worker, fresh=attempt > 0)
+            try:
+                conn.request(method, target, body=body or None, headers=headers)
+                return conn, conn.getresponse()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                conn.close()
+                if attempt:
+                    raise
+
+    def _remember_job(self, location: Optional[str], worker: int) -> None:
+        if not location or not location.startswith("/jobs/"):
+            return
+        job_id = location.split("/")[2].split("?")[0]
+        with self._job_lock:
+            self._job_routes[job_id] = worker
+            while len(self._job_routes) > self.max_job_routes:
+                self._job_routes.popitem(last=False)
+
+    def __call__(self, environ, start_response):
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+        worker = self._route(environ, body)
+
+        headers = {
+            key[5:].replace("_", "-").title(): value
+            for key, value in environ.items()
+            if key.startswith("HTTP_") and key[5:].replace("_", "-").lower() not in HOP_BY_HOP
+        }
+        if environ.get("CONTENT_TYPE"):
+            headers["Content-Type"] = environ["CONTENT_TYPE"]
+        target = environ.get("PATH_INFO", "/")
+        if environ.get("QUERY_STRING"):
+            target += "?" + environ["QUERY_STRING"]
+
+        try:
+            conn, response = self._forward(worker, environ["REQUEST_METHOD"], target, headers, body)
+        except (OSError, http.client.HTTPException) as e:
+            start_response("502 Bad Gateway", [("Content-Type", "application/json")])
+            return [json.dumps({"error": f"Worker {worker} unavailable: {e}"}).encode("utf-8")]
+
+        if response.status == 202:
+            self._remember_job(response.getheader("Location"), worker)
+
+        out_headers = [(k, v) for k, v in response.getheaders() if k.lower() not in HOP_BY_HOP]
+        start_response(f"{response.status} {response.reason}", out_headers)
+
+        if response.getheader("Content-Type", "").startswith("text/event-stream"):
+            # Event streams never end; hand the connection over to the stream
+            self._local.pool.pop(worker, None)
+            return self._stream(conn, response)
+        return [response.read()]
+
+    @staticmethod
+    def _stream(conn, response):
+        try:
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            conn.close()
+
+
+def _start_worker(ctx, port: int, store: str):
+    process = ctx.Process(target=_serve_worker, args=(port, store), daemon=True)
+    process.start()
+    return process
+
+
+def _wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            http.client.HTTPConnection("127.0.0.1", port, timeout=1).connect()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+
+def main():
+    """Start the workers, the supervisor and the router."""
+    ROOT = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Serve the OR digital twin with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--worker-port", type=int, default=5100, help="first loopback port used by workers")
+    parser.add_argument("--store", type=Path, default=ROOT / "sessions.db", help="shared SQLite session store")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    ports = [args.worker_port + i for i in range(args.workers)]
+    processes = [_start_worker(ctx, port, str(args.store)) for port in ports]
+    for port in ports:
+        _wait_for_port(port)
+
+    def supervise():
+        while True:
+            time.sleep(1.0)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    print(f"Worker {i} (port {ports[i]}) exited with {process.exitcode}; restarting")
+                    processes[i] = _start_worker(ctx, ports[i], str(args.store))
+
+    threading.Thread(target=supervise, daemon=True).start()
+
+    print(f"OR Digital Twin: {args.workers} workers behind http://{args.host}:{args.port}/ "
+          f"(store: {args.store})")
+    # Let `kill` stop the workers too, not just Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    router = AffinityRouter(ports)
+    server = make_server(args.host, args.port, router, threaded=True, request_handler=_KeepAliveHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# session_manager.py
+import time
+import uuid
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, Collection, Dict, Iterable, List, Optional
+
+from OR_simulator import ORSimulator
+from event_stream import EventBroker
+
+DEFAULT_SESSION_ID = "default"
+
+
+class TimedLock:
+    """Lock that reports how long each ``with`` block waited to ``TimedLock.observer``.
+
+    An uncontended acquire costs one extra non-blocking attempt.
+    """
+
+    observer: Optional[Callable[[float], None]] = None
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(blocking=False):
+            waited = 0.0
+        elif not blocking:
+            return False
+        else:
+            started = time.perf_counter()
+            if not self._lock.acquire(timeout=timeout):
+                return False
+            waited = time.perf_counter() - started
+        observer = TimedLock.observer
+        if observer is not None:
+            observer(waited)
+        return True
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class SimulatorSession:
+    """One simulated OR room: a simulator plus the lock that serialises it."""
+
+    def __init__(self, session_id: str, sim: ORSimulator) -> None:
+        self.session_id = session_id
+        self.sim = sim
+        self.lock = TimedLock()
+        # Bumped by every assignment of validation_details; part of the snapshot cache key
+        self.validation_version = 0
+        self._validation_details = {"conforms": True, "violations": [], "report": ""}
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+
+        # Distinguishes ETags of a re-initialised room whose version restarted
+        self.epoch = uuid.uuid4().hex[:12]
+        # Snapshot and Q&A answers for the current state version only
+        self.snapshot_cache = None
+        self.answer_cache = (None, {})
+
+    @property
+    def validation_details(self) -> dict:
+        return self._validation_details
+
+    @validation_details.setter
+    def validation_details(self, details: dict) -> None:
+        self._validation_details = details
+        self.validation_version += 1
+
+    def touch(self) -> None:
+        self.last_access = time.monotonic()
+
+    def etag(self, *parts) -> str:
+        """ETag for the current simulator state, optionally narrowed by ``parts``."""
+        return "-".join([self.epoch, str(self.sim.state_version), *map(str, parts)])
+
+    def triple_count(self) -> int:
+        return len(self.sim.or_graph)
+
+
+class SimulatorTemplates:
+    """Initialised and validated simulators, one per procedure, to clone sessions from.
+
+    Templates are built by ``factory(procedure)`` on first use (or by
+    ``warm()`` at startup) and never modified afterwards; ``clone()`` hands
+    out independent copies. Builds run outside the lock, so a slow template
+    does not hold up clones of the others, and concurrent first requests for
+    one procedure share a single build. ``procedures()``, when given, returns
+    the known procedure names; anything else is rejected before building. At
+    most ``max_templates`` procedures are kept.
+    """
+
+    def __init__(
+            self,
+            factory: Callable[[str], ORSimulator],
+            max_templates: int = 16,
+            procedures: Optional[Callable[[], Collection[str]]] = None
+    ) -> None:
+        self.factory = factory
+        self.max_templates = max_templates
+        self.procedures = procedures
+
+        self._templates: Dict[str, ORSimulator] = {}
+        self._building: Dict[str, Future] = {}
+        self._lock = Lock()
+
+    def get(self, procedure: str) -> ORSimulator:
+        with self._lock:
+            template = self._templates.get(procedure)
+            if template is not None:
+                return template
+            pending = self._building.get(procedure)
+
+        if pending is not None:
+            return pending.result()
+
+        if self.procedures is not None and procedure not in self.procedures():
+            raise ValueError(f"Unknown procedure: {procedure}")
+        with self._lock:
+            template = self._templates.get(procedure)
+            if template is not None:
+                return template
+            pending = self._building.get(procedure)
+            owner = pending is None
+            if owner:
+                pending = self._building[procedure] = Future()
+
+        return self._build(procedure, pending) if owner else pending.result()
+
+    def _build(self, procedure: str, pending: Future) -> ORSimulator:
+        """Run the factory for ``procedure`` and hand the result to its waiters."""
+        try:
+            template = self.factory(procedure)
+        except BaseException as e:
+            with self._lock:
+                del self._building[procedure]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._building[procedure]
+            if len(self._templates) < self.max_templates:
+                self._templates[procedure] = template
+        pending.set_result(template)
+        return template
+
+    def clone(self, procedure: str) -> ORSimulator:
+        return self.get(procedure).clone()
+
+    def warm(self, procedures: Iterable[str]) -> None:
+        for procedure in procedures:
+            self.get(procedure)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+
+    def __contains__(self, procedure: str) -> bool:
+        with self._lock:
+            return procedure in self._templates
+
+
+class SessionManager:
+    """Keeps one ``ORSimulator`` per session / room ID.
+
+    Sessions idle for longer than ``idle_timeout`` seconds are evicted, and
+    the least recently used sessions are dropped once either ``max_sessions``
+    or ``max_triples`` (summed over all session graphs, a proxy for memory)
+    is exceeded.
+    """
+
+    def __init__(
+            self,
+            *,
+            max_sessions: int = 64,
+            idle_timeout: float = 1800.0,
+            max_triples: Optional[int] = None,
+            eviction_interval: float = 30.0
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_triples = max_triples
+        self.eviction_interval = eviction_interval
+
+        self._sessions: Dict[str, SimulatorSession] = {}
+        self._lock = Lock()
+        # Keyed by session ID so that streams survive a re-/init of the room
+        self.events = EventBroker()
+        self._last_eviction = time.monotonic()
+
+    def get(self, session_id: str) -> Optional[SimulatorSession]:
+        """Return the live session for ``session_id`` or None."""
+        self._maybe_evict_idle()
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def create(self, session_id: str, factory: Callable[[], ORSimulator]) -> SimulatorSession:
+        """Build a simulator with ``factory`` and install it under ``session_id``.
+
+        The factory runs outside the manager lock so that a slow ontology load
+        in one room does not block requests for the others.
+        """
+        sim = factory()
+        session = SimulatorSession(session_id, sim)
+
+        with self._lock:
+            self._sessions[session_id] = session
+            self._enforce_caps(keep=session_id)
+
+        return session
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def sessions(self) -> List[SimulatorSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Drop sessions that have not been accessed within ``idle_timeout``."""
+        now = time.monotonic() if now is None else now
+        evicted = []
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                # A room with an open event stream is being watched, not idle
+                if self.events.subscriber_count(session_id):
+                    continue
+                if now - session.last_access > self.idle_timeout:
+                    del self._sessions[session_id]
+                    evicted.append(session_id)
+            self._last_eviction = now
+        return evicted
+
+    def _maybe_evict_idle(self) -> None:
+        if time.monotonic() - self._last_eviction >= self.eviction_interval:
+            self.evict_idle()
+
+    def _enforce_caps(self, keep: str) -> None:
+        """Evict least recently used sessions until both caps hold (lock held)."""
+        by_age = sorted(
+            (s for s in self._sessions.values() if s.session_id != keep),
+            key=lambda s: s.last_access
+        )
+
+        while len(self._sessions) > self.max_sessions and by_age:
+            del self._sessions[by_age.pop(0).session_id]
+
+        if self.max_triples is not None:
+            total = sum(s.triple_count() for s in self._sessions.values())
+            while total > self.max_triples and by_age:
+                victim = by_age.pop(0)
+                total -= victim.triple_count()
+                del self._sessions[victim.session_id]
@@ -0,0 +1,131 @@
+# session_store.py
+"""
+Shared, process-independent record of every session's simulator state.
+
+A simulator is deterministic given its procedure and the mutations applied
+since ``/init``, so the store keeps that short operation log instead of the
+RDF graph. Any worker process can rebuild a room by replaying the log, which
+is what happens when a worker restarts or the affinity router re-maps a
+session. Each operation is one row keyed by ``(session_id, seq)``, so an
+append costs the same however long the session has run.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from OR_simulator import ORSimulator
+
+# Bumped when the tables change; older stores are dropped and recreated
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    procedure  TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS operations (
+    session_id TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    op         TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class SessionStore:
+    """SQLite-backed operation log per session, safe across threads and processes."""
+
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                # The log only rebuilds live rooms, so an old layout is not migrated
+                conn.execute("DROP TABLE IF EXISTS sessions")
+                conn.execute("DROP TABLE IF EXISTS operations")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def reset(self, session_id: str, procedure: str) -> None:
+        """Start a fresh log for a (re-)initialised session."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM operations WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session_id, procedure, time.time())
+            )
+
+    def append(self, session_id: str, op: dict) -> Optional[int]:
+        """Append one operation; returns its sequence number or None for unknown sessions."""
+        conn = self._conn()
+        with conn:
+            updated = conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE session_id = ?", (time.time(), session_id)
+            ).rowcount
+            if not updated:
+                return None
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM operations WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            conn.execute("INSERT INTO operations VALUES (?, ?, ?)", (session_id, seq, json.dumps(op)))
+        return seq
+
+    def load(self, session_id: str) -> Optional[Tuple[str, List[dict]]]:
+        """Return ``(procedure, ops)`` or None."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT procedure FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        ops = conn.execute(
+            "SELECT op FROM operations WHERE session_id = ? ORDER BY seq", (session_id,)
+        )
+        return row[0], [json.loads(op) for op, in ops]
+
+    def delete(self, session_id: str) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM operations WHERE session_id = ?", (session_id,))
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def session_ids(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT session_id FROM sessions ORDER BY session_id")]
+
+
+def apply_operation(sim: ORSimulator, op: dict) -> None:
+    """Re-apply one logged mutation to a simulator."""
+    kind = op["op"]
+    if kind == "switch":
+        sim.switch_procedure(op["procedure"])
+        sim.validate_current_state_with_shacl()
+    elif kind == "validate":
+        sim.validate_current_state_with_shacl()
+    elif kind == "step":
+        for _ in range(op.get("count", 1)):
+            sim.execute_step(validate=op.get("validate", True), force_advance=op.get("forceAdvance", False))
+    else:
+        raise ValueError(f"Unknown session operation: {kind}")
+
+
+def replay(sim: ORSimulator, ops: List[dict]) -> ORSimulator:
+    """Bring a freshly initialised and validated simulator up to date with ``ops``."""
+    for op in ops:
+        apply_operation(sim, op)
+    return sim
@@ -0,0 +1,297 @@
+# sparql_endpoint.py
+"""
+Read-only SPARQL over a simulator graph with prepared-query and result caches.
+
+Queries are normalised (comments dropped, whitespace outside literals and
+IRIs collapsed) so that cosmetic differences share cache entries. Parsed and
+translated queries are kept in an LRU keyed on the normalised text. Results
+go to the simulator's ``QueryCache`` with the predicates the query matches,
+so repeated dashboard queries are answered without touching the graph until
+a step changes one of those predicates.
+
+Results are paged: each response holds at most ``max_rows`` rows and, when
+more follow, a ``next`` cursor. Cursors are stateless tokens naming the
+query, the offset and the graph version they were issued at; the next page
+re-evaluates the query and skips to the offset, so memory stays bounded by
+the page size. A cursor stays valid while no step changes a predicate the
+query matches. The skip still produces every earlier row, so a page at
+offset ``n`` costs O(n) and reading N rows in pages of k costs O(N²/k);
+offsets are therefore capped at ``max_offset``. CONSTRUCT and DESCRIBE
+results are built in full by rdflib before paging starts.
+
+Only query forms parse, so updates are impossible; ``SERVICE`` and
+``FROM`` / ``FROM NAMED`` are rejected because rdflib would fetch them over
+the network. rdflib cannot interrupt a running query, so the timeout is a
+deadline checked while result rows are produced: it bounds streaming
+queries, while a single blocking ORDER BY / GROUP BY is only detected after
+it completes.
+"""
+import base64
+import hashlib
+import itertools
+import json
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Iterator, List, Optional, Tuple
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.evaluate import evalQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+
+from query_cache import QueryCache, query_predicates
+
+# Literals, IRIs and comments are matched first so whitespace inside them is kept
+_TOKEN_RE = re.compile(
+    r'"""(?:[^"\\]|\\.|"(?!""))*"""'
+    r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r"|<[^<>\"{}|^`\\\s]*>"
+    r"|#[^\n]*"
+    r"|\s+"
+)
+
+
+class SparqlError(Exception):
+    """A query that cannot be run; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class SparqlTimeout(SparqlError):
+    def __init__(self, seconds: float) -> None:
+        super().__init__(f"Query exceeded its {seconds:g} s time limit", 503)
+
+
+def normalize_query(query: str) -> str:
+    """Drop comments and collapse whitespace outside literals and IRIs."""
+    def replace(match):
+        token = match.group(0)
+        if token[0] == "#":
+            return " "
+        if token.isspace():
+            return " "
+        return token
+    return _TOKEN_RE.sub(replace, query).strip()
+
+
+def _term(term) -> Optional[dict]:
+    """SPARQL 1.1 JSON results encoding of one RDF term."""
+    if term is None:
+        return None
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    if isinstance(term, Literal):
+        encoded = {"type": "literal", "value": str(term)}
+        if term.language:
+            encoded["xml:lang"] = term.language
+        elif term.datatype:
+            encoded["datatype"] = str(term.datatype)
+        return encoded
+    return {"type": "literal", "value": str(term)}
+
+
+def _forbidden(node) -> Optional[str]:
+    """Name of the first network-reaching construct in a query algebra, if any."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, CompValue):
+            if node.name == "ServiceGraphPattern":
+                return "SERVICE"
+            if node.name == "DatasetClause":
+                return "FROM / FROM NAMED"
+            stack.extend(node.values())
+        elif isinstance(node, (list, tuple)):
+            stack.extend(node)
+    return None
+
+
+def _query_id(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(normalized: str, offset: int, graph_version: int) -> str:
+    """Continuation token for the rows of ``normalized`` from ``offset`` on."""
+    token = json.dumps({"q": _query_id(normalized), "o": offset, "v": graph_version}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, normalized: str) -> Tuple[int, int]:
+    """``(offset, graph version)`` of a token from ``encode_cursor`` for this query."""
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        query_id, offset, graph_version = token["q"], int(token["o"]), int(token["v"])
+    except (ValueError, TypeError, KeyError):
+        raise SparqlError("Malformed cursor")
+    if query_id != _query_id(normalized) or offset < 0:
+        raise SparqlError("Cursor does not belong to this query")
+    return offset, graph_version
+
+
+def iter_results(graph: Graph, prepared: Query) -> Tuple[str, List[str], Iterator]:
+    """Query form, SELECT variables and a lazy iterator over the results.
+
+    ``Graph.query`` keeps every row it yields, so this evaluates the algebra
+    directly: SELECT rows are produced on demand and dropped once consumed.
+    For ASK the third item is the boolean answer; CONSTRUCT and DESCRIBE
+    yield the triples of the graph rdflib builds.
+    """
+    result = evalQuery(graph, prepared, {})
+    kind = result["type_"]
+    if kind == "ASK":
+        return kind, [], result["askAnswer"]
+    if kind == "SELECT":
+        variables = result["vars_"]
+        rows = (
+            [binding.get(var) for var in variables]
+            for binding in result["bindings"]
+            if binding
+        )
+        return kind, [str(var) for var in variables], rows
+    return kind, [], iter(result["graph"])
+
+
+class _LRU:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+
+class SparqlEndpoint:
+    """Prepared-query cache shared by all sessions of a process, and limits."""
+
+    def __init__(
+            self,
+            *,
+            max_prepared: int = 256,
+            default_timeout: float = 5.0,
+            max_timeout: float = 30.0,
+            default_rows: int = 1000,
+            max_rows: int = 10000,
+            max_offset: int = 100000
+    ) -> None:
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        self.default_rows = default_rows
+        self.max_rows = max_rows
+        self.max_offset = max_offset
+
+        self._prepared = _LRU(max_prepared)
+
+    def limits(self, max_rows=None, timeout=None) -> Tuple[int, float]:
+        """Clamp client-requested row cap and timeout to the server maxima."""
+        try:
+            rows = self.default_rows if max_rows is None else int(max_rows)
+            seconds = self.default_timeout if timeout is None else float(timeout)
+        except (TypeError, ValueError):
+            raise SparqlError("'maxRows' and 'timeout' must be numbers")
+        return max(1, min(rows, self.max_rows)), max(0.001, min(seconds, self.max_timeout))
+
+    def prepare(self, normalized: str) -> Query:
+        prepared = self._prepared.get(normalized)
+        if prepared is None:
+            try:
+                prepared = prepareQuery(normalized)
+            except Exception as e:
+                raise SparqlError(f"Invalid or non-query SPARQL: {e}")
+            construct = _forbidden(prepared.algebra)
+            if construct:
+                raise SparqlError(f"{construct} is not allowed on this endpoint", 403)
+            self._prepared.put(normalized, prepared)
+        return prepared
+
+    def cached(self, cache: QueryCache, normalized: str, max_rows: int, offset: int = 0) -> Optional[dict]:
+        return cache.get(("sparql", normalized, max_rows, offset))
+
+    def execute(
+            self,
+            graph: Graph,
+            cache: QueryCache,
+            normalized: str,
+            max_rows: int,
+            timeout: float,
+            offset: int = 0
+    ) -> dict:
+        """Evaluate one page (caller holds the graph's lock) and cache it in ``cache``.
+
+        ``max_rows`` rows are returned starting at ``offset``; ``truncated``
+        tells whether more follow (see ``with_cursor``). Offsets beyond
+        ``max_offset`` are refused, since reaching them re-produces every
+        earlier row.
+        """
+        if offset > self.max_offset:
+            raise SparqlError(
+                f"Offset {offset} is beyond the {self.max_offset}-row paging limit; narrow the query instead"
+            )
+        prepared = self.prepare(normalized)
+        deadline = time.monotonic() + timeout
+
+        kind, variables, rows = iter_results(graph, prepared)
+        if kind == "ASK":
+            payload = {"head": {}, "boolean": rows}
+        else:
+            page, more = [], False
+            for row in itertools.islice(rows, offset, None):
+                if time.monotonic() > deadline:
+                    raise SparqlTimeout(timeout)
+                if len(page) >= max_rows:
+                    more = True
+                    break
+                if kind == "SELECT":
+                    page.append({var: _term(value) for var, value in zip(variables, row) if value is not None})
+                else:
+                    page.append([_term(term) for term in row])
+
+            if kind == "SELECT":
+                payload = {"head": {"vars": variables}, "results": {"bindings": page}}
+            else:
+                payload = {"head": {}, "triples": page}
+            payload["truncated"] = more
+
+        if time.monotonic() > deadline:
+            raise SparqlTimeout(timeout)
+        cache.put(("sparql", normalized, max_rows, offset), payload, query_predicates(prepared.algebra))
+        return payload
+
+    @staticmethod
+    def with_cursor(payload: dict, normalized: str, offset: int, graph_version: int) -> dict:
+        """``payload`` plus ``next``: the cursor of the following page, or None.
+
+        Added per response rather than cached, since a cached page stays
+        valid across graph versions that did not touch its predicates.
+        """
+        if "boolean" in payload:
+            return payload
+        next_cursor = None
+        if payload["truncated"]:
+            rows = len(payload["results"]["bindings"]) if "results" in payload else len(payload["triples"])
+            next_cursor = encode_cursor(normalized, offset + rows, graph_version)
+        return dict(payload, next=next_cursor)
@@ -0,0 +1,27 @@
+# tests/conftest.py
+from pathlib import Path
+
+import pytest
+
+from OR_simulator import ORSimulator
+
+ROOT = Path(__file__).resolve().parent.parent
+ONTOLOGY = ROOT / "alignments" / "twin_or_2_aligned.owl"
+SHAPES = ROOT / "ontologies" / "SHACL_constraints.ttl"
+SENSOR_DATA = ROOT / "data" / "sensor_data.json"
+
+
+@pytest.fixture(scope="session")
+def template():
+    """Validated LegoAssembly simulator; clone it rather than mutating it."""
+    sim = ORSimulator(str(ONTOLOGY), str(SHAPES), str(SENSOR_DATA))
+    sim.validate_current_state_with_shacl()
+    return sim
+
+
+@pytest.fixture
+def sim(template):
+    """Fresh simulator whose scenario data a test may edit."""
+    clone = template.clone()
+    clone.sensor_data = {step: dict(data) for step, data in template.sensor_data.items()}
+    return clone
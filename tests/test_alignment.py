@@ -0,0 +1,87 @@
+# tests/test_alignment.py
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+from rdflib import Graph, OWL, RDF
+from rdflib.compare import graph_diff, isomorphic, to_isomorphic
+
+import alignment_build
+import alignment_engine
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BASE = ROOT / "ontologies" / "twin_or_2.owl"
+REFDIR = ROOT / "ontologies"
+MAPPINGS = [alignment_engine.MAPPINGS_DIR / "core.json", alignment_engine.MAPPINGS_DIR / "surgical.json"]
+
+
+@pytest.fixture
+def mappings(tmp_path):
+    """Copies of the mapping files that a test may edit."""
+    folder = tmp_path / "mappings"
+    folder.mkdir()
+    return [shutil.copy(path, folder / path.name) for path in MAPPINGS]
+
+
+def _build(out_path, mapping_paths, **kwargs):
+    return alignment_engine.build(BASE, REFDIR, out_path, mapping_paths, comment="test",
+                                  copy_individuals=False, jobs=1, **kwargs)
+
+
+def test_unchanged_inputs_skip_the_build(tmp_path, mappings):
+    out_path = tmp_path / "aligned.owl"
+    first = _build(out_path, mappings)
+    assert first is not None and first["changedMappings"] == {}
+    outputs = alignment_build.output_paths(out_path, alignment_build.DEFAULT_FORMATS).values()
+    written = {path: path.stat().st_mtime_ns for path in outputs}
+
+    assert _build(out_path, mappings) is None
+    assert {path: path.stat().st_mtime_ns for path in written} == written
+    assert _build(out_path, mappings, force=True) is not None
+
+
+def test_changed_inputs_or_outputs_rebuild(tmp_path, mappings):
+    out_path = tmp_path / "aligned.owl"
+    _build(out_path, mappings)
+
+    core = json.loads(mappings[0].read_text(encoding="utf-8"))
+    core["mappings"]["actionCores"]["rows"].append(["TestCore"])
+    mappings[0].write_text(json.dumps(core), encoding="utf-8")
+    report = _build(out_path, mappings)
+    assert report["changedMappings"]["actionCores"]["added"] == [["TestCore"]]
+    assert _build(out_path, mappings) is None
+
+    out_path.with_suffix(".nt").write_text("", encoding="utf-8")
+    assert _build(out_path, mappings) is not None
+    assert _build(out_path, mappings, formats=("nt",)) is not None
+    assert not out_path.exists()
+
+
+def test_mapping_tables_reproduce_the_committed_alignment(tmp_path):
+    """run.py's build (individuals copied) must match alignments/twin_or_2_aligned.owl."""
+    out_path = tmp_path / "aligned.owl"
+    alignment_engine.build(
+        BASE, REFDIR, out_path, MAPPINGS,
+        comment="Complete alignment ontology with all individuals from base plus surgical extensions",
+        copy_individuals=True, formats=("xml",), jobs=1,
+    )
+    built = Graph().parse(out_path, format="xml")
+    committed = Graph().parse(ROOT / "alignments" / "twin_or_2_aligned.owl", format="xml")
+    if not isomorphic(built, committed):
+        _, only_built, only_committed = graph_diff(to_isomorphic(built), to_isomorphic(committed))
+        pytest.fail(f"only built: {sorted(only_built)[:5]}; only committed: {sorted(only_committed)[:5]}")
+
+
+def test_copy_individuals_takes_every_triple_touching_a_named_individual():
+    base = Graph().parse(BASE, format="xml")
+    expected = {
+        (s, p, o) for s, p, o in base
+        if (s, RDF.type, OWL.NamedIndividual) in base or (o, RDF.type, OWL.NamedIndividual) in base
+    }
+    copied = Graph()
+    individuals = alignment_engine.copy_individuals_from_base(base, copied)
+
+    assert individuals == set(base.subjects(RDF.type, OWL.NamedIndividual))
+    assert set(copied) == expected
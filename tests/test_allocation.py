@@ -0,0 +1,25 @@
+# tests/test_allocation.py
+import pytest
+
+import flask_server
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    client = app.test_client()
+    response = client.post("/init", json={"procedure": "LegoAssembly"}, headers={"X-Session-ID": "allocation"})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.mark.parametrize("lookahead", ["x", -1, [1]])
+def test_invalid_lookahead_is_rejected(client, lookahead):
+    response = client.post("/allocation", json={"lookahead": lookahead}, headers={"X-Session-ID": "allocation"})
+    assert response.status_code == 400
+    assert "lookahead" in response.get_json()["error"]
+
+
+def test_lookahead_plans(client):
+    response = client.post("/allocation", json={"lookahead": 2}, headers={"X-Session-ID": "allocation"})
+    assert response.status_code == 200
@@ -0,0 +1,28 @@
+# tests/test_autoplay.py
+import pytest
+
+import flask_server
+
+HEADERS = {"X-Session-ID": "autoplay"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    client = app.test_client()
+    assert client.post("/init", json={"procedure": "LegoAssembly"}, headers=HEADERS).status_code == 200
+    return client
+
+
+@pytest.mark.parametrize("interval", ["fast", None, [1], "nan"])
+def test_invalid_interval_is_rejected(client, interval):
+    response = client.post("/autoplay", json={"action": "start", "interval": interval}, headers=HEADERS)
+    assert response.status_code == 400
+    assert "interval" in response.get_json()["error"]
+
+
+def test_interval_is_clamped(client):
+    response = client.post("/autoplay", json={"action": "start", "interval": 1e9}, headers=HEADERS)
+    assert response.get_json()["interval"] == flask_server.AUTOPLAY_MAX_INTERVAL
+    response = client.post("/autoplay", json={"action": "stop"}, headers=HEADERS)
+    assert response.get_json()["running"] is False
@@ -0,0 +1,40 @@
+# tests/test_briefing.py
+import pytest
+
+import flask_server
+from queries import STEP_PROPERTIES, run_step_query, step_briefing
+
+
+def test_one_pass_briefing_matches_the_per_category_lookups(sim):
+    for _ in range(50):
+        found = step_briefing(sim.or_graph, sim.current_steps, sim.property_hierarchy)
+        for name in STEP_PROPERTIES:
+            expected = run_step_query(sim.or_graph, name, sim.current_steps, hierarchy=sim.property_hierarchy)
+            assert set(found[name]) == set(expected), (sim.current_steps, name)
+        if not sim.ongoing_procedure:
+            break
+        sim.execute_step(validate=False)
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    client = app.test_client()
+    assert client.post("/init", json={"procedure": "LegoAssembly"}, headers={"X-Session-ID": "briefing"}).status_code == 200
+    return client
+
+
+def test_briefing_answers_every_question_and_revalidates(client):
+    headers = {"X-Session-ID": "briefing"}
+    first = client.get("/briefing", headers=headers)
+    briefing = first.get_json()
+    sim = flask_server._sessions.get("briefing").sim
+    for category in ("instruments", "actors", "tissues", "capabilities"):
+        assert briefing[category] == sim.get_requirements(category)
+    assert briefing["steps"] == sim.current_steps
+
+    assert client.get("/briefing", headers={**headers, "If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.post("/step", headers=headers).status_code == 200
+    second = client.get("/briefing", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.get_json()["steps"] == sim.current_steps != briefing["steps"]
@@ -0,0 +1,67 @@
+# tests/test_import_resolver.py
+import json
+
+import pytest
+from rdflib import Graph, OWL, URIRef
+
+from import_resolver import DEFAULT_CATALOG, ImportResolver
+
+ONTOLOGIES = DEFAULT_CATALOG.parent
+HI = "http://www.semanticweb.org/vbr240/ontologies/2022/4/untitled-ontology-51"
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return ImportResolver()
+
+
+@pytest.mark.parametrize("iri,name", [
+    ("http://www.w3.org/ns/prov-o", "prov-o.ttl"),
+    ("http://www.w3.org/ns/prov-o#", "prov-o.ttl"),
+    ("http://www.w3.org/ns/prov", "prov-o.ttl"),
+    (HI, "hi.ttl"),
+    (URIRef(HI + "#"), "hi.ttl"),
+])
+def test_catalog_iris_resolve_to_the_ontologies_folder(resolver, iri, name):
+    assert resolver.resolve(iri) == ONTOLOGIES / name
+
+
+def test_existing_file_iri_resolves_to_itself(resolver, tmp_path):
+    local = tmp_path / "my ontology.ttl"
+    local.write_text("", encoding="utf-8")
+    assert resolver.resolve(local.as_uri()) == local
+
+
+@pytest.mark.parametrize("iri", [
+    "file:///home/someone/checkout/ontologies/hi.ttl",
+    "file:///C:/Users/someone/Twin-OR/ontologies/hi.ttl",
+    "file:///C:%5CUsers%5Csomeone%5Contologies%5Chi.ttl",
+])
+def test_missing_file_iri_falls_back_to_the_catalog_file_of_that_name(resolver, iri):
+    assert resolver.resolve(iri) == ONTOLOGIES / "hi.ttl"
+
+
+@pytest.mark.parametrize("iri", [
+    "http://example.org/unknown",
+    "https://www.w3.org/ns/prov-o",
+    "file:///nowhere/unknown.ttl",
+])
+def test_everything_else_stays_unresolved(resolver, iri):
+    assert resolver.resolve(iri) is None
+
+
+def test_closure_follows_resolved_imports_and_reports_the_rest(tmp_path):
+    (tmp_path / "a.ttl").write_text(
+        "<urn:a> a <http://www.w3.org/2002/07/owl#Ontology> ;"
+        " <http://www.w3.org/2002/07/owl#imports> <urn:b>, <http://example.org/remote> .",
+        encoding="utf-8")
+    (tmp_path / "b.ttl").write_text("<urn:b> a <http://www.w3.org/2002/07/owl#Ontology> .", encoding="utf-8")
+    catalog = tmp_path / "catalog.json"
+    catalog.write_text(json.dumps({"imports": {"urn:a": "a.ttl", "urn:b": "b.ttl"}}), encoding="utf-8")
+
+    graph = Graph()
+    graph.add((URIRef("urn:root"), OWL.imports, URIRef("urn:a")))
+    resolved, unresolved = ImportResolver(catalog).closure(graph)
+
+    assert {iri: path for iri, (path, _) in resolved.items()} == {"urn:a": tmp_path / "a.ttl", "urn:b": tmp_path / "b.ttl"}
+    assert unresolved == ["http://example.org/remote"]
@@ -0,0 +1,101 @@
+# tests/test_jobs.py
+import threading
+
+import pytest
+
+import flask_server
+from jobs import JobLimitError, JobManager
+
+
+def _blocking(started, release):
+    def fn(job):
+        started.set()
+        while not release.wait(0.01):
+            job.check_cancelled()
+        return "released"
+    return fn
+
+
+def _finish(job, timeout=10.0):
+    job._future.result(timeout=timeout)
+    return job
+
+
+def test_cancel_stops_a_running_job_at_its_next_check():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    job = manager.submit("s", "run", _blocking(started, release))
+    assert started.wait(5)
+
+    assert manager.cancel(job.job_id) is job
+    assert _finish(job).status == "cancelled"
+    assert job.result is None and job.finished_at is not None
+
+
+def test_cancel_of_a_queued_job_never_runs_it():
+    manager = JobManager(max_workers=1, max_jobs_per_session=4)
+    started, release = threading.Event(), threading.Event()
+    blocker = manager.submit("s", "run", _blocking(started, release))
+    assert started.wait(5)
+
+    ran = threading.Event()
+    queued = manager.submit("s", "run", lambda job: ran.set())
+    assert queued.status == "queued"
+    manager.cancel(queued.job_id)
+    assert queued.status == "cancelled"
+
+    release.set()
+    assert _finish(blocker).status == "succeeded"
+    assert not ran.is_set()
+
+
+def test_cancel_of_a_finished_or_unknown_job_changes_nothing():
+    manager = JobManager()
+    job = _finish(manager.submit("s", "run", lambda job: 42))
+    assert manager.cancel(job.job_id).status == "succeeded"
+    assert job.result == 42
+    assert manager.cancel("missing") is None
+
+
+def test_per_session_limit_counts_only_active_jobs_of_that_session():
+    manager = JobManager(max_workers=4, max_jobs_per_session=2)
+    started, release = threading.Event(), threading.Event()
+    active = [manager.submit("a", "run", _blocking(started, release)) for _ in range(2)]
+
+    with pytest.raises(JobLimitError):
+        manager.submit("a", "run", lambda job: None)
+    other = _finish(manager.submit("b", "run", lambda job: "ok"))
+    assert other.status == "succeeded"
+
+    release.set()
+    for job in active:
+        _finish(job)
+    assert _finish(manager.submit("a", "run", lambda job: "ok")).status == "succeeded"
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    return app.test_client()
+
+
+def test_http_limit_answers_429_and_delete_cancels(client):
+    session_id = "jobs-limit"
+    started, release = threading.Event(), threading.Event()
+    limit = flask_server._jobs.max_jobs_per_session
+    held = [flask_server._jobs.submit(session_id, "run", _blocking(started, release)) for _ in range(limit)]
+    try:
+        response = client.post("/jobs", json={"type": "init"}, headers={"X-Session-ID": session_id})
+        assert response.status_code == 429
+        assert "limit" in response.get_json()["error"]
+
+        assert started.wait(5)
+        cancelled = client.delete(f"/jobs/{held[0].job_id}")
+        assert cancelled.status_code == 200
+        _finish(held[0])
+        assert client.get(f"/jobs/{held[0].job_id}").get_json()["status"] == "cancelled"
+        assert client.delete("/jobs/missing").status_code == 404
+    finally:
+        release.set()
+        for job in held:
+            _finish(job)
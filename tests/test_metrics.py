@@ -0,0 +1,69 @@
+# tests/test_metrics.py
+import re
+
+import pytest
+
+import flask_server
+from metrics import Counter, Histogram, MetricsRegistry
+from OR_simulator import OR, ORSimulator
+from queries import step_uri
+from session_manager import TimedLock
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency", "help", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "/step")
+    assert histogram.render()[2:] == [
+        'latency_bucket{route="/step",le="0.1"} 1',
+        'latency_bucket{route="/step",le="1.0"} 3',
+        'latency_bucket{route="/step",le="+Inf"} 4',
+        'latency_sum{route="/step"} 6.05',
+        'latency_count{route="/step"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("c", "help", ["value"])
+    counter.inc('a"b\\c\nd')
+    assert counter.render()[-1] == 'c{value="a\\"b\\\\c\\nd"} 1.0'
+
+
+@pytest.fixture(scope="module")
+def client():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(ORSimulator, "stage_observer", None)
+        patch.setattr(TimedLock, "observer", None)
+        app = flask_server.create_app(warm_start=False, metrics=True)
+        yield app.test_client()
+
+
+def _sample(text, line_start):
+    match = re.search("^" + re.escape(line_start) + r" (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_routes_are_labelled_by_rule_and_violations_by_nothing(client):
+    headers = {"X-Session-ID": "metrics"}
+    assert client.post("/init", json={"procedure": "LegoAssembly"}, headers=headers).status_code == 200
+    before = client.get("/metrics").get_data(as_text=True)
+
+    client.get("/jobs/not-a-job")
+    sim = flask_server._sessions.get("metrics").sim
+    step = sim.current_steps[0]
+    sim.sensor_data = dict(sim.sensor_data)
+    action = next(sim.or_graph.objects(step_uri(step), OR.stepAction))
+    sim.sensor_data[step] = {"action": "remove", "triples": [
+        {"subject": step, "predicate": "stepAction", "object": str(action).rsplit("/", 1)[-1]}
+    ]}
+    assert client.post("/step", headers=headers).get_json()["violation"]
+
+    response = client.get("/metrics")
+    assert response.content_type == MetricsRegistry.CONTENT_TYPE
+    after = response.get_data(as_text=True)
+    missing = 'or_twin_requests_total{method="GET",route="/jobs/<job_id>",status="404"}'
+    assert _sample(after, missing) == _sample(before, missing) + 1
+    assert "not-a-job" not in after
+    assert _sample(after, "or_twin_violating_states_total") >= _sample(before, "or_twin_violating_states_total") + 1
+    assert _sample(after, 'or_twin_session_violations{session="metrics"}') >= 1
+    assert _sample(after, 'or_twin_stage_duration_seconds_count{stage="validation"}') > 0
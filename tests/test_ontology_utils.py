@@ -0,0 +1,49 @@
+# tests/test_ontology_utils.py
+import logging
+
+from rdflib import RDFS, URIRef
+
+from ontology_utils import materialize
+
+ONTOLOGY = """\
+@prefix ex: <http://example.org/ex#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+ex:A rdfs:subClassOf ex:B .
+ex:a a ex:A .
+"""
+
+
+def test_closure_is_written_whole_and_reused(tmp_path):
+    source = tmp_path / "tiny.ttl"
+    source.write_text(ONTOLOGY, encoding="utf-8")
+
+    _, first = materialize(str(source), "turtle", "rdfs")
+    _, second = materialize(str(source), "turtle", "rdfs")
+
+    assert not first["cached"] and second["cached"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["tiny.rdfs-closure.nt", "tiny.ttl"]
+
+
+def test_pellet_logs_that_it_is_an_alias(tmp_path, caplog):
+    source = tmp_path / "tiny.ttl"
+    source.write_text(ONTOLOGY, encoding="utf-8")
+
+    with caplog.at_level(logging.WARNING, logger="ontology_utils"):
+        _, stats = materialize(str(source), "turtle", "pellet")
+
+    assert stats["reasoner"] == "owlrl"
+    assert "alias" in caplog.text
+
+
+def test_closure_is_recomputed_when_the_source_changes(tmp_path):
+    source = tmp_path / "tiny.ttl"
+    source.write_text(ONTOLOGY, encoding="utf-8")
+    _, first = materialize(str(source), "turtle", "rdfs")
+
+    source.write_text(ONTOLOGY + "ex:C rdfs:subClassOf ex:A .\n", encoding="utf-8")
+    graph, second = materialize(str(source), "turtle", "rdfs")
+    _, third = materialize(str(source), "turtle", "rdfs")
+
+    assert not second["cached"] and third["cached"]
+    assert second["asserted"] == first["asserted"] + 1
+    assert (URIRef("http://example.org/ex#C"), RDFS.subClassOf, URIRef("http://example.org/ex#B")) in graph
@@ -0,0 +1,53 @@
+# tests/test_query_cache.py
+from rdflib import Graph, Literal, Namespace
+from rdflib.plugins.sparql import prepareQuery
+
+from query_cache import QueryCache, query_predicates
+
+X = Namespace("http://example.org/x#")
+COUNT = "SELECT (COUNT(*) AS ?n) WHERE { ?s x:p%s ?o }"
+
+
+def _count(graph, query):
+    return int(next(iter(graph.query(query)))[0])
+
+
+def test_bounded_path_depends_on_its_predicate():
+    assert query_predicates(prepareQuery(COUNT % "+", initNs={"x": X}).algebra) == {X.p}
+
+
+def test_zero_length_path_is_invalidated_by_unrelated_predicate():
+    graph = Graph()
+    graph.add((X.a, X.p, X.b))
+    cache = QueryCache()
+    for modifier in ("*", "?"):
+        query = prepareQuery(COUNT % modifier, initNs={"x": X})
+        cache.put(modifier, _count(graph, query), query_predicates(query.algebra))
+
+    # New nodes reached only through another predicate still match p* / p?
+    graph.add((X.c, X.q, Literal(1)))
+    assert cache.invalidate({X.q}) == 2
+    assert cache.get("*") is None and cache.get("?") is None
+
+
+def _apply(sim, triples):
+    """Run one sensor update that adds ``triples`` (``[subject, predicate, object]``)."""
+    step = sim.current_steps[0]
+    sim.sensor_data[step] = {"action": "add", "triples": [
+        {"subject": s, "predicate": p, "object": o} for s, p, o in triples
+    ]}
+    sim.simulate_robotic_sensor_output_and_update_ontology()
+
+
+def test_step_query_survives_unrelated_steps_and_drops_on_its_predicates(sim):
+    step = sim.current_steps[0]
+    first = sim.step_query("materials")
+    assert sim.query_cache.stats()["misses"] == 1
+
+    _apply(sim, [[step, "targetTissue", "UnrelatedTissue"]])
+    assert sim.step_query("materials") == first
+    assert sim.query_cache.stats()["hits"] == 1
+
+    _apply(sim, [[step, "materialUsed", "NewMaterial"]])
+    assert [str(m).rsplit("/", 1)[-1] for m in sim.step_query("materials")][-1] == "NewMaterial"
+    assert sim.query_cache.stats()["misses"] == 2
@@ -0,0 +1,38 @@
+# tests/test_requirements_index.py
+from ontology_utils import get_label_from_uri
+from OR_simulator import OR
+from requirements_index import REQUIREMENT_PREDICATES, RequirementsIndex
+
+
+def _check(sim):
+    fresh = RequirementsIndex(sim.or_graph)
+    for category in REQUIREMENT_PREDICATES:
+        indexed = sim.get_requirements(category)
+        assert indexed == fresh.lookup(category, sim.current_steps)
+        assert sorted(indexed) == sorted({get_label_from_uri(uri) for uri in sim.step_query(category)})
+
+
+def test_index_matches_the_graph_through_a_whole_procedure(sim):
+    _check(sim)
+    for _ in range(50):
+        if not sim.ongoing_procedure:
+            break
+        sim.execute_step(validate=False)
+        _check(sim)
+
+
+def test_removed_requirement_disappears_unless_a_sibling_predicate_keeps_it(sim):
+    step = sim.current_steps[0]
+    instrument = next(iter(sim.requirements_index._index["instruments"][OR[step]]))
+    predicate = next(p for p in REQUIREMENT_PREDICATES["instruments"] if (OR[step], p, instrument) in sim.or_graph)
+    sibling = next(p for p in REQUIREMENT_PREDICATES["instruments"] if p != predicate)
+    name = get_label_from_uri(instrument)
+
+    sim.or_graph.add((OR[step], sibling, instrument))
+    sim.or_graph.remove((OR[step], predicate, instrument))
+    sim.requirements_index.apply_delta([(OR[step], sibling, instrument)], [(OR[step], predicate, instrument)])
+    assert name in sim.get_requirements("instruments")
+
+    sim.or_graph.remove((OR[step], sibling, instrument))
+    sim.requirements_index.apply_delta([], [(OR[step], sibling, instrument)])
+    assert name not in sim.get_requirements("instruments")
@@ -0,0 +1,86 @@
+# tests/test_response_encoding.py
+import gzip
+import json
+
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import flask_server
+import response_encoding
+from response_encoding import JSON, MSGPACK, compress, negotiate, variant_tag
+
+
+def _negotiate(accept, accept_encoding=""):
+    return negotiate(parse_accept_header(accept, MIMEAccept), parse_accept_header(accept_encoding))
+
+
+def test_negotiate_media_type():
+    assert _negotiate("")[0] == JSON
+    assert _negotiate("*/*")[0] == JSON
+    assert _negotiate("text/html")[0] == JSON
+    if response_encoding.msgpack is not None:
+        assert _negotiate("application/msgpack")[0] == MSGPACK
+        assert _negotiate("application/x-msgpack")[0] == MSGPACK
+        assert _negotiate("application/json;q=0.5, application/msgpack")[0] == MSGPACK
+
+
+def test_negotiate_coding_prefers_brotli_and_honours_q_zero(monkeypatch):
+    assert _negotiate("*/*", "")[1] is None
+    assert _negotiate("*/*", "gzip")[1] == "gzip"
+    assert _negotiate("*/*", "gzip;q=0")[1] is None
+    monkeypatch.setattr(response_encoding, "brotli", object())
+    assert _negotiate("*/*", "gzip, br")[1] == "br"
+    assert _negotiate("*/*", "gzip, br;q=0")[1] == "gzip"
+
+
+def test_small_bodies_are_not_compressed():
+    small = b"x" * (response_encoding.MIN_COMPRESS_SIZE - 1)
+    assert compress(small, "gzip") == (small, None)
+    large = b"x" * response_encoding.MIN_COMPRESS_SIZE
+    body, coding = compress(large, "gzip")
+    assert coding == "gzip" and gzip.decompress(body) == large
+
+
+def test_variant_tags_differ_per_representation():
+    tags = {variant_tag(m, c) for m in (JSON, MSGPACK) for c in (None, "gzip", "br")}
+    assert len(tags) == 6
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    client = app.test_client()
+    response = client.post("/init", json={"procedure": "LegoAssembly"}, headers={"X-Session-ID": "encoding"})
+    assert response.status_code == 200
+    return client
+
+
+def _state(client, **headers):
+    return client.get("/state?report=1", headers={"X-Session-ID": "encoding", **headers})
+
+
+def test_state_is_negotiated_and_varies(client):
+    plain = _state(client)
+    assert plain.content_type == JSON and "Content-Encoding" not in plain.headers
+    assert {"Accept", "Accept-Encoding"} <= set(plain.vary)
+
+    zipped = _state(client, **{"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(zipped.data)) == plain.get_json()
+
+    if response_encoding.msgpack is not None:
+        packed = _state(client, Accept=MSGPACK)
+        assert packed.content_type == MSGPACK
+        assert response_encoding.msgpack.unpackb(packed.data, raw=False) == plain.get_json()
+
+
+def test_etag_names_the_variant(client):
+    plain = _state(client)
+    zipped = _state(client, **{"Accept-Encoding": "gzip"})
+    assert plain.headers["ETag"] != zipped.headers["ETag"]
+
+    assert _state(client, **{"If-None-Match": plain.headers["ETag"]}).status_code == 304
+    assert _state(client, **{"If-None-Match": plain.headers["ETag"], "Accept-Encoding": "gzip"}).status_code == 200
+    revalidated = _state(client, **{"If-None-Match": zipped.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert revalidated.status_code == 304 and revalidated.headers["ETag"] == zipped.headers["ETag"]
@@ -0,0 +1,104 @@
+# tests/test_run.py
+import time
+
+import pytest
+
+import flask_server
+from OR_simulator import OR, STEP_SEQUENCES
+from queries import step_uri
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    return app.test_client()
+
+
+def _init(client, session_id):
+    response = client.post("/init", json={"procedure": "LegoAssembly"}, headers={"X-Session-ID": session_id})
+    assert response.status_code == 200
+
+
+def _wait(client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_async_run_without_steps_matches_sync(client):
+    _init(client, "run-sync")
+    _init(client, "run-async")
+
+    sync = client.post("/run", json={}, headers={"X-Session-ID": "run-sync"}).get_json()
+    submitted = client.post("/run", json={"async": True}, headers={"X-Session-ID": "run-async"})
+    assert submitted.status_code == 202
+    job = _wait(client, submitted.get_json()["job"])
+
+    assert job["status"] == "succeeded"
+    assert sync["executed"] == job["result"]["executed"] == 1
+    assert sync["stoppedBy"] == job["result"]["stoppedBy"] == "steps"
+
+
+def _post_run(client, session_id, body):
+    response = client.post("/run", json=body, headers={"X-Session-ID": session_id})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def _break_step(session_id, step):
+    """Make ``step`` remove its own stepAction, which StepShape requires."""
+    sim = flask_server._sessions.get(session_id).sim
+    sim.sensor_data = dict(sim.sensor_data)
+    action = next(sim.or_graph.objects(step_uri(step), OR.stepAction))
+    sim.sensor_data[step] = {"action": "remove", "triples": [
+        {"subject": step, "predicate": "stepAction", "object": str(action).rsplit("/", 1)[-1]}
+    ]}
+
+
+def test_run_executes_k_steps_in_one_request(client):
+    _init(client, "run-k")
+    result = _post_run(client, "run-k", {"steps": 3})
+
+    assert result["executed"] == 3 and result["stoppedBy"] == "steps"
+    assert [entry["steps"] for entry in result["summary"]] == [["Step_A1_1"], ["Step_A1_2"], ["Step_A2_1"]]
+    assert result["state"]["steps"] == ["Step_A2_2"]
+
+
+def test_run_until_end_stops_at_the_end_of_the_procedure(client):
+    _init(client, "run-end")
+    result = _post_run(client, "run-end", {"until": "end", "validate": False})
+
+    assert result["stoppedBy"] == "end"
+    assert result["executed"] == len(STEP_SEQUENCES["LegoAssembly"])
+    assert _post_run(client, "run-end", {"steps": 1})["executed"] == 0
+
+
+def test_run_until_violation_stops_at_the_failing_step(client):
+    _init(client, "run-violation")
+    _break_step("run-violation", "Step_A2_1")
+    result = _post_run(client, "run-violation", {"until": "violation"})
+
+    assert result["stoppedBy"] == "violation"
+    assert [entry["conforms"] for entry in result["summary"]] == [True, True, False]
+    assert result["state"]["violation"]
+
+
+def test_run_continues_past_violations_when_asked(client):
+    _init(client, "run-continue")
+    _break_step("run-continue", "Step_A2_1")
+    result = _post_run(client, "run-continue", {"until": "end", "continueOnViolation": True})
+
+    assert result["stoppedBy"] == "end"
+    assert result["summary"][2]["conforms"] is False
+
+
+@pytest.mark.parametrize("body", [{"until": "forever"}, {"steps": 0}, {"steps": "many"}])
+def test_run_rejects_bad_parameters(client, body):
+    _init(client, "run-bad")
+    response = client.post("/run", json=body, headers={"X-Session-ID": "run-bad"})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,70 @@
+# tests/test_scheduler.py
+import json
+from pathlib import Path
+
+from rdflib import RDFS
+
+from OR_simulator import OR
+from property_hierarchy import PropertyHierarchy
+from scheduler import DiscreteEventScheduler
+
+SENSOR_DATA = Path(__file__).resolve().parent.parent / "data" / "sensor_data.json"
+
+
+def _durations(procedure):
+    with open(SENSOR_DATA, encoding="utf-8") as fp:
+        steps = json.load(fp)["procedures"][procedure]
+    return {step: float(data["duration"]) for step, data in steps.items() if "duration" in data}
+
+
+def test_events_run_in_simulated_time_order(template):
+    scheduler = DiscreteEventScheduler()
+    late = scheduler.add_room("late", template.clone(), start_time=10.0)
+    early = scheduler.add_room("early", template.clone(), start_time=0.0)
+
+    scheduler.run(max_events=1)
+    assert scheduler.now == 0.0
+    assert (early.steps_executed, late.steps_executed) == (1, 0)
+
+    handled = []
+    handle = scheduler._handle
+    scheduler._handle = lambda room: (handled.append((scheduler.now, room.room_id)), handle(room))
+    scheduler.run(until=30.0)
+
+    assert [at for at, _ in handled] == sorted(at for at, _ in handled)
+    assert ("late", 10.0) in {(room_id, at) for at, room_id in handled}
+    assert all(at <= 30.0 for at, _ in handled)
+
+
+def test_step_durations_come_from_the_sensor_data(template):
+    durations = _durations("LegoAssembly")
+    sim = template.clone()
+    first = list(sim.current_steps)
+    scheduler = DiscreteEventScheduler(default_step_duration=99.0)
+    scheduler.add_room("room", sim)
+
+    scheduler.run(max_events=1)
+    next_at = scheduler._queue[0][0]
+    assert next_at == sum(durations[step] for step in first)
+
+
+def test_rooms_needing_the_same_actor_wait_for_each_other(template):
+    scheduler = DiscreteEventScheduler()
+    first = scheduler.add_room("OR-1", template.clone())
+    second = scheduler.add_room("OR-2", template.clone())
+    shared = scheduler.step_resources(first.sim)
+    assert shared
+
+    scheduler.run(max_events=3)
+    report = scheduler.report()
+    assert second.wait_time > 0 and first.wait_time == 0
+    assert any(report["resources"][r]["conflicts"] for r in shared)
+
+
+def test_sub_properties_of_instrument_properties_are_resources(sim):
+    sim.or_graph.add((OR.usesDevice, RDFS.subPropertyOf, OR.hasInstrument))
+    sim.property_hierarchy = PropertyHierarchy(sim.or_graph)
+    step = sim.current_steps[0]
+    sim.sensor_data[step] = {"triples": [{"subject": step, "predicate": "usesDevice", "object": "Laser"}]}
+
+    assert "Laser" in DiscreteEventScheduler().step_resources(sim)
@@ -0,0 +1,55 @@
+# tests/test_serve.py
+import json
+import multiprocessing
+import socket
+
+import pytest
+from werkzeug.test import Client
+
+import serve
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def worker(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    port, store = _free_port(), str(tmp_path / "sessions.db")
+    processes = []
+
+    def start():
+        process = serve._start_worker(ctx, port, store)
+        processes.append(process)
+        serve._wait_for_port(port, timeout=120)
+        return process
+
+    yield port, start
+    for process in processes:
+        process.terminate()
+        process.join()
+
+
+def test_restarted_worker_rebuilds_the_session_through_the_router(worker):
+    port, start = worker
+    process = start()
+    router = Client(serve.AffinityRouter([port]))
+    headers = {"X-Session-ID": "restart"}
+
+    assert router.post("/init", json={"procedure": "LegoAssembly"}, headers=headers).status_code == 200
+    for _ in range(2):
+        assert router.post("/step", headers=headers).status_code == 200
+    before = json.loads(router.get("/state", headers=headers).data)
+
+    process.kill()
+    process.join()
+    start()
+
+    response = router.get("/state", headers=headers)
+    assert response.status_code == 200
+    after = json.loads(response.data)
+    assert (after["steps"], after["phase"]) == (before["steps"], before["phase"])
+    assert after["version"] > 0
@@ -0,0 +1,68 @@
+# tests/test_session_manager.py
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+from rdflib import RDF
+
+from OR_simulator import OR
+from session_manager import SimulatorSession, SimulatorTemplates
+
+
+def test_templates_share_one_build_and_do_not_block_other_procedures():
+    started, release = Event(), Event()
+    builds = []
+
+    def factory(procedure):
+        builds.append(procedure)
+        if procedure == "slow":
+            started.set()
+            assert release.wait(5)
+        return procedure
+
+    templates = SimulatorTemplates(factory, procedures=lambda: {"slow", "fast"})
+    with ThreadPoolExecutor(4) as pool:
+        slow = [pool.submit(templates.get, "slow") for _ in range(3)]
+        assert started.wait(5)
+        assert templates.get("fast") == "fast"
+        release.set()
+        assert [future.result() for future in slow] == ["slow"] * 3
+
+    assert sorted(builds) == ["fast", "slow"]
+
+
+def test_templates_reject_unknown_procedures():
+    templates = SimulatorTemplates(lambda procedure: procedure, procedures=lambda: {"known"})
+    with pytest.raises(ValueError):
+        templates.get("unknown")
+    assert "unknown" not in templates
+
+
+def test_every_validation_result_gets_a_new_snapshot_key(template):
+    session = SimulatorSession("room", template.clone())
+    versions = {session.validation_version}
+    for _ in range(3):
+        session.validation_details = {"conforms": True, "violations": [], "report": ""}
+        versions.add(session.validation_version)
+    assert len(versions) == 4
+
+
+def test_clones_are_isolated_from_the_template_and_each_other(template):
+    templates = SimulatorTemplates(lambda procedure: template)
+    triples = set(template.or_graph)
+    steps = list(template.current_steps)
+    versions = (template.state_version, template.graph_version)
+    question = template.step_query("actors")
+
+    stepped, idle = templates.clone("LegoAssembly"), templates.clone("LegoAssembly")
+    assert stepped is not idle and stepped.or_graph is not template.or_graph
+    stepped.execute_step(validate=False)
+    stepped.or_graph.add((OR.CloneOnly, RDF.type, OR.Instrument))
+    stepped.current_steps.append("Step_Clone_Only")
+
+    assert stepped.current_steps != steps
+    for sim in (template, idle):
+        assert set(sim.or_graph) == triples
+        assert sim.current_steps == steps
+        assert (sim.state_version, sim.graph_version) == versions
+        assert sim.step_query("actors") == question
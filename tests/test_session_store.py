@@ -0,0 +1,32 @@
+# tests/test_session_store.py
+import sqlite3
+
+from session_store import SessionStore
+
+
+def test_operations_replay_in_append_order(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.reset("room", "LegoAssembly")
+    for count in range(1, 4):
+        assert store.append("room", {"op": "step", "count": count}) == count
+
+    assert store.load("room") == ("LegoAssembly", [{"op": "step", "count": c} for c in (1, 2, 3)])
+    assert store.append("missing", {"op": "validate"}) is None
+
+    store.reset("room", "Laparoscopy")
+    assert store.load("room") == ("Laparoscopy", [])
+    assert store.delete("room") and store.load("room") is None
+
+
+def test_store_with_the_old_layout_is_recreated(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, procedure TEXT NOT NULL, "
+                     "ops TEXT NOT NULL, revision INTEGER NOT NULL, updated_at REAL NOT NULL)")
+        conn.execute("INSERT INTO sessions VALUES ('room', 'LegoAssembly', '[]', 1, 0)")
+    conn.close()
+
+    store = SessionStore(path)
+    assert store.session_ids() == []
+    store.reset("room", "LegoAssembly")
+    assert store.append("room", {"op": "validate"}) == 1
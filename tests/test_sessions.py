@@ -0,0 +1,16 @@
+# tests/test_sessions.py
+import flask_server
+
+
+def test_sessions_lists_rooms_read_under_their_locks():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    client = app.test_client()
+    for session_id in ("free", "held"):
+        assert client.post("/init", json={}, headers={"X-Session-ID": session_id}).status_code == 200
+
+    held = flask_server._sessions.get("held")
+    with held.lock:
+        listed = {s["session"]: s for s in client.get("/sessions").get_json()["sessions"]}
+
+    assert listed["held"] == {"session": "held", "busy": True}
+    assert listed["free"]["steps"] and "queryCache" in listed["free"]
@@ -0,0 +1,84 @@
+# tests/test_sparql.py
+import pytest
+
+import flask_server
+
+HEADERS = {"X-Session-ID": "sparql"}
+LABELS = "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#> SELECT ?s ?l WHERE { ?s rdfs:label ?l } ORDER BY ?s ?l"
+TRIPLES = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+
+
+@pytest.fixture
+def client():
+    app = flask_server.create_app(warm_start=False, metrics=False)
+    client = app.test_client()
+    assert client.post("/init", json={"procedure": "LegoAssembly"}, headers=HEADERS).status_code == 200
+    return client
+
+
+def _page(client, query, rows, cursor=None):
+    body = {"query": query, "maxRows": rows}
+    if cursor:
+        body["cursor"] = cursor
+    return client.post("/sparql", json=body, headers=HEADERS)
+
+
+def _rows(page):
+    return [(b["s"]["value"], b["l"]["value"]) for b in page.get_json()["results"]["bindings"]]
+
+
+def test_pages_concatenate_to_the_full_result(client):
+    full = _rows(_page(client, LABELS, 10000))
+    paged, cursor = [], None
+    while True:
+        page = _page(client, LABELS, 7, cursor)
+        paged += _rows(page)
+        cursor = page.get_json()["next"]
+        if not cursor:
+            break
+    assert paged == full
+
+
+def test_cursor_survives_steps_that_do_not_touch_its_predicates(client):
+    cursor = _page(client, LABELS, 3).get_json()["next"]
+    assert client.post("/step", headers=HEADERS).status_code == 200
+    assert _page(client, LABELS, 3, cursor).status_code == 200
+
+
+def test_cursor_of_an_unbounded_query_expires_on_any_graph_change(client):
+    cursor = _page(client, TRIPLES, 3).get_json()["next"]
+    assert client.post("/step", headers=HEADERS).status_code == 200
+    assert _page(client, TRIPLES, 3, cursor).status_code == 409
+
+
+def test_deep_offsets_are_refused(client, monkeypatch):
+    monkeypatch.setattr(flask_server._sparql, "max_offset", 5)
+    cursor = _page(client, TRIPLES, 10).get_json()["next"]
+    response = _page(client, TRIPLES, 10, cursor)
+    assert response.status_code == 400
+    assert "paging limit" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT * WHERE { SERVICE <http://example.org/sparql> { ?s ?p ?o } }",
+    "SELECT * FROM <http://example.org/data.ttl> WHERE { ?s ?p ?o }",
+    "SELECT * FROM NAMED <http://example.org/data.ttl> WHERE { GRAPH ?g { ?s ?p ?o } }",
+    "SELECT * WHERE { ?s ?p ?o OPTIONAL { SERVICE SILENT <http://example.org/sparql> { ?s ?q ?x } } }",
+])
+def test_network_reaching_queries_are_forbidden(client, query):
+    response = client.post("/sparql", json={"query": query}, headers=HEADERS)
+    assert response.status_code == 403
+    assert "not allowed" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("query", [
+    "INSERT DATA { <urn:a> <urn:b> <urn:c> }",
+    "DELETE WHERE { ?s ?p ?o }",
+    "LOAD <http://example.org/data.ttl>",
+    "CLEAR ALL",
+])
+def test_updates_do_not_parse(client, query):
+    triples = len(flask_server._sessions.get("sparql").sim.or_graph)
+    response = client.post("/sparql", json={"query": query}, headers=HEADERS)
+    assert response.status_code == 400
+    assert len(flask_server._sessions.get("sparql").sim.or_graph) == triples
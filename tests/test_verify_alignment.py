@@ -0,0 +1,81 @@
+# tests/test_verify_alignment.py
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from rdflib import Graph
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "alignments" / "verify_alignment.py"
+
+NS = "http://example.org/or/"
+ONTOLOGY = f"""
+@prefix : <{NS}> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+:Surgeon a :Actor ; :uses :Forceps, :Pen .
+:Forceps a owl:NamedIndividual .
+:Actor a owl:Class .
+:uses a owl:ObjectProperty .
+:Pen :label "pen" .
+"""
+
+
+@pytest.fixture(scope="module")
+def verifier():
+    spec = importlib.util.spec_from_file_location("verify_alignment", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _expectations(tmp_path, min_fraction):
+    path = tmp_path / "expectations.json"
+    path.write_text(json.dumps({
+        "namespace": NS,
+        "checks": {
+            "individuals": {"kind": "individual", "names": ["Surgeon", "Forceps", "Pen", "Scribe"]},
+            "classes": {"kind": "class", "names": ["Actor", "Surgeon"]},
+            "properties": {"kind": "property", "names": ["uses"]},
+        },
+        "describe": ["Surgeon"],
+        "pass": {"checks": ["individuals", "classes"], "minFraction": min_fraction},
+    }), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("suffix,fmt", [(".ttl", "turtle"), (".nt", "nt")])
+def test_report_lists_found_missing_and_relationships(verifier, tmp_path, suffix, fmt):
+    ontology = tmp_path / f"onto{suffix}"
+    Graph().parse(data=ONTOLOGY, format="turtle").serialize(ontology, format=fmt, encoding="utf-8")
+    report = verifier.verify_alignment(ontology, _expectations(tmp_path, 0.5))
+
+    assert report["format"] == fmt and report["triples"] == 7
+    assert report["checks"] == {
+        "individuals": {"kind": "individual", "expected": 4, "found": 2, "missing": ["Pen", "Scribe"]},
+        "classes": {"kind": "class", "expected": 2, "found": 1, "missing": ["Surgeon"]},
+        "properties": {"kind": "property", "expected": 1, "found": 1, "missing": []},
+    }
+    assert report["relationships"] == {"Surgeon": {"count": 3, "first": ["type: Actor", "uses: Forceps", "uses: Pen"]}}
+    assert report["pass"] == {"checks": ["individuals", "classes"], "minFraction": 0.5, "expected": 6, "found": 3}
+    assert report["passed"]
+
+
+def test_main_writes_the_report_and_fails_below_the_threshold(verifier, tmp_path, monkeypatch, capsys):
+    ontology = tmp_path / "onto.ttl"
+    ontology.write_text(ONTOLOGY, encoding="utf-8")
+    out = tmp_path / "report.json"
+    monkeypatch.setattr("sys.argv", ["verify_alignment.py", str(ontology),
+                                     "--expectations", str(_expectations(tmp_path, 0.9)), "--report", str(out)])
+
+    assert verifier.main() == 1
+    assert "FAILED" in capsys.readouterr().out
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert not report["passed"] and report["checks"]["individuals"]["missing"] == ["Pen", "Scribe"]
+
+
+def test_committed_alignment_meets_its_expectations(verifier):
+    report = verifier.verify_alignment(ROOT / "alignments" / "twin_or_2_aligned.owl")
+    rule = report["pass"]
+    assert report["passed"] and rule["found"] >= rule["expected"] * rule["minFraction"]
+    assert not report["checks"]["classes"]["missing"] and not report["checks"]["properties"]["missing"]